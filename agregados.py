@@ -0,0 +1,208 @@
+"""Cubo de conteos de defunciones del que se derivan los datos de todas las figuras.
+
+En lugar de recorrer los ~245 mil registros con un ``groupby`` distinto por
+gráfico, se construye una sola vez un cubo disperso: cada celda es una
+combinación observada de (año, departamento, municipio, mes, sexo, grupo de
+edad, código de causa) con su número de defunciones. Las dimensiones se guardan
+como códigos enteros y cada figura se obtiene sumando celdas del cubo.
+
+Los cubos de distintos periodos se pueden combinar sumando sus celdas
+(``CuboMortalidad.combinar``) y guardar en disco como Arrow IPC, lo que
+permite mantener los agregados de varios años sin volver a leer los registros.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Dimensiones que forman la clave de cada celda.
+DIMENSIONES = ['AÑO', 'COD_DEPARTAMENTO', 'COD_DANE', 'MES', 'SEXO', 'GRUPO_EDAD1', 'COD_MUERTE']
+# Atributos que dependen de una dimensión (los nombres de DIVIPOLA dependen de COD_DANE).
+# No agregan celdas: se toman del primer registro de cada celda.
+ATRIBUTOS = {'MUNICIPIO': 'COD_DANE', 'DEPARTAMENTO': 'COD_DANE'}
+
+
+def _codificar(serie):
+    """Códigos enteros (-1 para faltantes) y categorías de una columna."""
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+    elif not serie.cat.categories.is_monotonic_increasing:
+        # Las categorías que vienen de Arrow quedan en orden de aparición; se ordenan para que
+        # los totales salgan ordenados y los cubos de distintos periodos coincidan.
+        serie = serie.cat.reorder_categories(serie.cat.categories.sort_values())
+    return np.asarray(serie.cat.codes), serie.cat.categories
+
+
+def _entero_minimo(valores, maximo):
+    return valores.astype(np.int16 if maximo < np.iinfo(np.int16).max else np.int32)
+
+
+def _clave_combinada(codigos, bases):
+    """Combina varios arreglos de códigos (>= 0) en una sola clave entera de base mixta."""
+    clave = np.zeros(len(codigos[0]), dtype=np.int64)
+    for cod, base in zip(codigos, bases):
+        clave = clave * base + cod
+    return clave
+
+
+class CuboMortalidad:
+    """Conteos de defunciones por combinación observada de dimensiones.
+
+    ``codigos[dim]`` tiene, para cada celda, el código de la categoría de la
+    dimensión (-1 si el dato falta) y ``categorias[dim]`` las etiquetas
+    correspondientes. ``conteos`` es el número de defunciones de cada celda.
+    """
+
+    def __init__(self, codigos, categorias, conteos):
+        self.codigos = codigos
+        self.categorias = categorias
+        self.conteos = conteos
+
+    @classmethod
+    def _agrupar(cls, codigos_filas, categorias, pesos=None):
+        """Cubo con una celda por combinación distinta de códigos (``pesos`` = conteo de cada fila)."""
+        dimensiones = [d for d in DIMENSIONES if d in codigos_filas]
+        bases = [len(categorias[d]) + 1 for d in dimensiones]
+        if np.prod(bases, dtype=float) >= np.iinfo(np.int64).max:
+            raise ValueError('Demasiadas categorías para combinar las dimensiones en una clave de 64 bits')
+
+        # Se suma 1 a cada código: 0 queda reservado para faltantes.
+        clave = _clave_combinada([codigos_filas[d].astype(np.int64) + 1 for d in dimensiones], bases)
+        claves, primera_fila, inversa = np.unique(clave, return_index=True, return_inverse=True)
+        conteos = np.bincount(inversa, weights=pesos, minlength=len(claves)).astype(np.int64)
+
+        # Se separa la clave de cada celda en los códigos de sus dimensiones.
+        codigos = {}
+        for dim, base in reversed(list(zip(dimensiones, bases))):
+            claves, cod = np.divmod(claves, base)
+            codigos[dim] = _entero_minimo(cod - 1, base)
+        codigos = {d: codigos[d] for d in dimensiones}
+
+        for atributo, dim in ATRIBUTOS.items():
+            if atributo in codigos_filas and dim in codigos:
+                codigos[atributo] = _entero_minimo(codigos_filas[atributo][primera_fila], len(categorias[atributo]) + 1)
+        return cls(codigos, {c: categorias[c] for c in codigos}, conteos)
+
+    @classmethod
+    def desde_registros(cls, mortalidad):
+        """Construye el cubo en una sola pasada vectorizada sobre los registros."""
+        codigos, categorias = {}, {}
+        for columna in DIMENSIONES + list(ATRIBUTOS):
+            if columna in mortalidad.columns:
+                codigos[columna], categorias[columna] = _codificar(mortalidad[columna])
+        return cls._agrupar(codigos, categorias)
+
+    @classmethod
+    def combinar(cls, cubos):
+        """Suma de varios cubos (por ejemplo, uno por año) sin volver a los registros.
+
+        Las categorías de cada dimensión se unen y se ordenan, y los códigos de
+        cada cubo se traducen a las categorías comunes; las celdas con la misma
+        combinación se suman. Las dimensiones que falten en un cubo quedan como
+        faltantes en sus celdas.
+        """
+        cubos = [c for c in cubos if c is not None]
+        if len(cubos) == 1:
+            return cubos[0]
+        columnas = [c for c in DIMENSIONES + list(ATRIBUTOS) if any(c in cubo.codigos for cubo in cubos)]
+        categorias = {c: pd.Index(np.concatenate([cubo.categorias[c].to_numpy() for cubo in cubos
+                                                  if c in cubo.categorias])).unique().sort_values()
+                      for c in columnas}
+        codigos = {}
+        for c in columnas:
+            partes = []
+            for cubo in cubos:
+                if c in cubo.codigos:
+                    # El -1 (faltante) apunta al último elemento, que también es -1.
+                    traduccion = np.append(categorias[c].get_indexer(cubo.categorias[c]), -1)
+                    partes.append(traduccion[cubo.codigos[c]])
+                else:
+                    partes.append(np.full(len(cubo), -1))
+            codigos[c] = np.concatenate(partes)
+        return cls._agrupar(codigos, categorias, pesos=np.concatenate([cubo.conteos for cubo in cubos]))
+
+    # ========== PERSISTENCIA ==========
+    def a_tabla(self):
+        """Tabla de Arrow con una columna de diccionario por dimensión y la columna ``CONTEO``."""
+        columnas = {}
+        for c, cod in self.codigos.items():
+            indices = pa.array(cod.astype(np.int32), mask=cod < 0)
+            columnas[c] = pa.DictionaryArray.from_arrays(indices, pa.array(self.categorias[c].to_numpy()))
+        columnas['CONTEO'] = pa.array(self.conteos)
+        return pa.table(columnas)
+
+    @classmethod
+    def desde_tabla(cls, tabla):
+        codigos, categorias = {}, {}
+        for c in tabla.column_names:
+            if c == 'CONTEO':
+                continue
+            columna = tabla.column(c).combine_chunks()
+            codigos[c] = _entero_minimo(pc.fill_null(columna.indices, -1).to_numpy(), len(columna.dictionary) + 1)
+            categorias[c] = pd.Index(columna.dictionary.to_pandas())
+        return cls(codigos, categorias, tabla.column('CONTEO').to_numpy())
+
+    def guardar(self, ruta):
+        tabla = self.a_tabla()
+        with pa.OSFile(ruta, 'wb') as destino, pa.ipc.new_file(destino, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+
+    @classmethod
+    def cargar(cls, ruta):
+        return cls.desde_tabla(pa.ipc.open_file(pa.memory_map(ruta, 'r')).read_all())
+
+    def huella(self):
+        """SHA-1 de las celdas, sus categorías y sus conteos: cambia si cambia cualquier dato del cubo."""
+        resumen = hashlib.sha1()
+        for c, cod in self.codigos.items():
+            resumen.update(c.encode('utf-8'))
+            resumen.update(np.ascontiguousarray(cod, dtype=np.int32).tobytes())
+            resumen.update('\x1f'.join(map(str, self.categorias[c])).encode('utf-8'))
+        resumen.update(np.ascontiguousarray(self.conteos, dtype=np.int64).tobytes())
+        return resumen.hexdigest()
+
+    def __len__(self):
+        return len(self.conteos)
+
+    @property
+    def dimensiones(self):
+        return list(self.codigos)
+
+    def mascara_categorias(self, dimension, seleccion):
+        """Celdas cuya categoría en ``dimension`` está seleccionada.
+
+        ``seleccion`` es una máscara por categoría (por ejemplo, los códigos de
+        causa de un grupo CIE-10 según ``causas.IndiceCausas``): se evalúa sobre
+        unos pocos miles de categorías y se expande a las celdas con un índice.
+        """
+        seleccion = np.append(np.asarray(seleccion, dtype=bool), False)
+        return seleccion[self.codigos[dimension]]  # El código -1 apunta al False final.
+
+    def totales(self, dimensiones, mascara=None, nombre='Total'):
+        """Suma de defunciones agrupada por las dimensiones dadas.
+
+        Equivale a ``groupby(dimensiones).size()`` sobre los registros: las
+        filas salen ordenadas por categoría y se omiten las combinaciones con
+        datos faltantes o sin defunciones.
+        """
+        codigos = [self.codigos[d] for d in dimensiones]
+        conteos = self.conteos
+        validas = np.logical_and.reduce([c >= 0 for c in codigos]) if codigos else np.ones(len(conteos), bool)
+        if mascara is not None:
+            validas &= mascara
+        codigos = [c[validas] for c in codigos]
+        conteos = conteos[validas]
+
+        bases = [len(self.categorias[d]) for d in dimensiones]
+        claves, inversa = np.unique(_clave_combinada(codigos, bases), return_inverse=True)
+        sumas = np.bincount(inversa, weights=conteos, minlength=len(claves)).astype(np.int64)
+
+        columnas = {}
+        for dim, base in reversed(list(zip(dimensiones, bases))):
+            claves, cod = np.divmod(claves, base)
+            columnas[dim] = self.categorias[dim].take(cod)
+        resultado = pd.DataFrame({d: np.asarray(columnas[d]) for d in dimensiones})
+        resultado[nombre] = sumas
+        return resultado
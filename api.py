@@ -0,0 +1,228 @@
+"""API de solo lectura con los conteos del cubo, para consumidores que no necesitan las figuras.
+
+Sirve los mismos conteos que los gráficos, agrupados por las dimensiones
+pedidas y con los mismos filtros, en JSON o en Arrow IPC (formato de flujo)::
+
+    GET  /api/aggregates?dim=departamento,mes&sexo=2
+    GET  /api/aggregates?dim=municipio&causa=X85-Y09&anio=2019&formato=arrow
+    POST /api/aggregates   {"formato": "json", "consultas": [{"dim": "mes", "sexo": [1]}, ...]}
+
+Dimensiones (``dim``): anio, departamento, municipio, mes, sexo, edad y causa.
+Filtros: anio, departamento, mes, sexo, edad (valores separados por comas o
+el parámetro repetido, ``mes=1,3`` o ``mes=1&mes=3``) y causa (grupos CIE-10
+de tres caracteres o rangos, p. ej. ``X95`` o ``X85-Y09``). Sin ``dim`` se
+devuelve el total. Con ``dim=municipio`` cada fila lleva también el nombre
+del municipio (``nombre_municipio``), el mismo de los gráficos.
+
+Cada respuesta de ``GET`` se guarda serializada y comprimida en una caché LRU
+y lleva un ETag calculado sobre su contenido, así que una consulta repetida
+(o un ``If-None-Match`` con el mismo ETag) no vuelve a sumar el cubo. El
+``POST`` resuelve hasta ``MAX_CONSULTAS_LOTE`` consultas en una sola petición:
+usa las respuestas que ya estén en la caché, pero no guarda las nuevas (un
+lote grande desplazaría todas las de ``GET``). En Arrow, las filas de todas
+las consultas van en una sola tabla con la columna ``consulta`` (posición en
+el lote).
+"""
+import json
+
+import numpy as np
+import pyarrow as pa
+from flask import Blueprint, Response, request
+
+import cache_figuras
+
+# Nombre en la API -> dimensión del cubo.
+DIMENSIONES_API = {'anio': 'AÑO', 'departamento': 'COD_DEPARTAMENTO', 'municipio': 'COD_DANE', 'mes': 'MES',
+                   'sexo': 'SEXO', 'edad': 'GRUPO_EDAD1', 'causa': 'COD_MUERTE'}
+# Filtros que se resuelven con consultas.IndiceFiltros: nombre en la API -> (dimensión, tipo del valor).
+FILTROS_API = {'anio': ('AÑO', int), 'departamento': ('COD_DEPARTAMENTO', str), 'mes': ('MES', int),
+               'sexo': ('SEXO', int), 'edad': ('GRUPO_EDAD1', int)}
+FILTRO_CAUSA = 'causa'
+FORMATOS = {'json': 'application/json', 'arrow': 'application/vnd.apache.arrow.stream'}
+COLUMNA_TOTAL = 'total'
+COLUMNA_NOMBRE_MUNICIPIO = 'nombre_municipio'
+MAX_CONSULTAS_LOTE = 1000
+
+
+class ErrorConsulta(ValueError):
+    """Consulta mal formada; se responde con 400 y el mensaje."""
+
+
+def _valores(valor):
+    """Lista de valores a partir de texto separado por comas o de una lista (de números o de textos así)."""
+    if valor is None:
+        return []
+    if isinstance(valor, (list, tuple)):
+        return [v for elemento in valor for v in _valores(elemento)]
+    return [v.strip() for v in str(valor).split(',') if v.strip()]
+
+
+def _respuesta_error(mensaje, estado=400):
+    return Response(json.dumps({'error': mensaje}, ensure_ascii=False), status=estado, mimetype='application/json')
+
+
+class ApiAgregados:
+    """Consultas de agregados sobre un ``CuboMortalidad`` y las rutas de Flask que las sirven."""
+
+    def __init__(self, cubo, indice_filtros, indice_causas=None, capacidad=cache_figuras.CAPACIDAD_POR_DEFECTO):
+        self.cubo = cubo
+        self.indice_filtros = indice_filtros
+        self.indice_causas = indice_causas
+        self.respuestas = cache_figuras.CacheFiguras(capacidad, nombre='api')
+        self._grupos_causa = None
+        if cubo is not None and indice_causas is not None and 'COD_MUERTE' in cubo.categorias:
+            self._grupos_causa = indice_causas.ids_grupo(cubo.categorias['COD_MUERTE'].astype(str))
+        # Nombre de cada COD_DANE según el cubo (DIVIPOLA); basta una celda por municipio.
+        self._nombres_municipio = {}
+        if cubo is not None and 'COD_DANE' in cubo.codigos and 'MUNICIPIO' in cubo.codigos:
+            validas = np.flatnonzero((cubo.codigos['COD_DANE'] >= 0) & (cubo.codigos['MUNICIPIO'] >= 0))
+            celdas = validas[np.unique(cubo.codigos['COD_DANE'][validas], return_index=True)[1]]
+            self._nombres_municipio = dict(zip(cubo.categorias['COD_DANE'].take(cubo.codigos['COD_DANE'][celdas]),
+                                               cubo.categorias['MUNICIPIO'].take(cubo.codigos['MUNICIPIO'][celdas])))
+
+    # ========== CONSULTAS ==========
+    def normalizar(self, parametros):
+        """Clave canónica ``(dimensiones, filtros)`` de una consulta (dict de parámetros)."""
+        desconocidos = set(parametros) - {'dim', 'formato', FILTRO_CAUSA} - set(FILTROS_API)
+        if desconocidos:
+            raise ErrorConsulta(f"Parámetros desconocidos: {', '.join(sorted(desconocidos))}")
+        dimensiones = tuple(dict.fromkeys(_valores(parametros.get('dim'))))
+        for dim in dimensiones:
+            if dim not in DIMENSIONES_API:
+                raise ErrorConsulta(f"Dimensión desconocida: {dim!r} (válidas: {', '.join(DIMENSIONES_API)})")
+        filtros = []
+        for nombre, (_, convertir) in FILTROS_API.items():
+            try:
+                valores = tuple(sorted({convertir(v) for v in _valores(parametros.get(nombre))}))
+            except ValueError:
+                raise ErrorConsulta(f'Valor no válido en el filtro {nombre!r}') from None
+            filtros.append((nombre, valores))
+        causas = tuple(sorted({v.upper() for v in _valores(parametros.get(FILTRO_CAUSA))}))
+        if causas and self._grupos_causa is None:
+            raise ErrorConsulta('El filtro de causa no está disponible sin el catálogo del Anexo 2')
+        filtros.append((FILTRO_CAUSA, causas))
+        return dimensiones, tuple(filtros)
+
+    def _mascara(self, filtros):
+        filtros = dict(filtros)
+        mascara = self.indice_filtros.filtrar({FILTROS_API[nombre][0]: list(valores)
+                                               for nombre, valores in filtros.items() if nombre in FILTROS_API})
+        if filtros[FILTRO_CAUSA]:
+            seleccion = np.zeros(len(self._grupos_causa), dtype=bool)
+            for rango in filtros[FILTRO_CAUSA]:
+                desde, _, hasta = rango.partition('-')
+                seleccion |= self.indice_causas.seleccion(self._grupos_causa, desde, hasta or desde)
+            causa = self.cubo.mascara_categorias('COD_MUERTE', seleccion)
+            mascara = causa if mascara is None else mascara & causa
+        return mascara
+
+    def calcular(self, clave):
+        """Tabla con una columna por dimensión (nombres de la API), ``nombre_municipio`` y la columna ``total``."""
+        dimensiones, filtros = clave
+        mascara = self._mascara(filtros)
+        faltantes = [d for d in dimensiones if DIMENSIONES_API[d] not in self.cubo.codigos]
+        if faltantes:
+            raise ErrorConsulta(f"Dimensiones sin datos: {', '.join(faltantes)}")
+        if not dimensiones:
+            conteos = self.cubo.conteos if mascara is None else self.cubo.conteos[mascara]
+            return {COLUMNA_TOTAL: [int(conteos.sum())]}
+        totales = self.cubo.totales([DIMENSIONES_API[d] for d in dimensiones], mascara=mascara, nombre=COLUMNA_TOTAL)
+        columnas = {}
+        for d in dimensiones:
+            columnas[d] = totales[DIMENSIONES_API[d]].tolist()
+            if d == 'municipio':
+                columnas[COLUMNA_NOMBRE_MUNICIPIO] = [self._nombres_municipio.get(c) for c in columnas[d]]
+        columnas[COLUMNA_TOTAL] = totales[COLUMNA_TOTAL].tolist()
+        return columnas
+
+    # ========== SERIALIZACIÓN ==========
+    @staticmethod
+    def _documento(clave, columnas):
+        dimensiones, filtros = clave
+        return {'dimensiones': list(dimensiones), 'filtros': {n: list(v) for n, v in filtros if v},
+                'filas': len(columnas[COLUMNA_TOTAL]), 'datos': columnas}
+
+    @staticmethod
+    def _tabla(columnas, consulta=None):
+        tabla = pa.table({c: pa.array(v, type=pa.int64() if c == COLUMNA_TOTAL else None) for c, v in columnas.items()})
+        if consulta is not None:
+            tabla = tabla.add_column(0, 'consulta', pa.array(np.full(tabla.num_rows, consulta, dtype=np.int32)))
+        return tabla
+
+    @staticmethod
+    def _arrow(tabla):
+        sumidero = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sumidero, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+        return sumidero.getvalue().to_pybytes()
+
+    def _json(self, documento):
+        return json.dumps(documento, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def respuesta(self, clave, formato):
+        """Entrada serializada (cuerpo, comprimidos y ETag) de una consulta, desde la caché si ya se pidió."""
+        if formato == 'arrow':
+            construir, serializar = lambda: self._tabla(self.calcular(clave)), self._arrow
+        else:
+            construir, serializar = lambda: self._documento(clave, self.calcular(clave)), self._json
+        return self.respuestas.obtener((formato, clave), construir,
+                                       lambda cuerpo: cache_figuras.entrada_serializada(serializar(cuerpo),
+                                                                                        mimetype=FORMATOS[formato]))
+
+    def lote(self, consultas, formato):
+        """Cuerpo de un lote: las respuestas JSON unidas o una tabla Arrow con todas las filas.
+
+        Las consultas que no están en la caché se calculan sin guardarlas.
+        """
+        claves = [self.normalizar(consulta) for consulta in consultas]
+        if formato == 'arrow':
+            tablas = [self._tabla(self.calcular(clave), consulta=i) for i, clave in enumerate(claves)]
+            return self._arrow(pa.concat_tables(tablas, promote_options='default'))
+        partes = []
+        for clave in claves:
+            guardada = self.respuestas.buscar(('json', clave))
+            partes.append(guardada.json if guardada is not None else self._json(self._documento(clave, self.calcular(clave))))
+        return b'{"resultados":[' + b','.join(partes) + b']}'
+
+    # ========== RUTAS ==========
+    def blueprint(self):
+        api = Blueprint('api', __name__, url_prefix='/api')
+
+        @api.route('/aggregates', methods=['GET'])
+        def consultar():
+            if self.cubo is None:
+                return _respuesta_error('No hay datos cargados', 503)
+            formato = request.args.get('formato', 'json')
+            if formato not in FORMATOS:
+                return _respuesta_error(f"Formato no válido: {formato!r} (json o arrow)")
+            try:
+                # Un parámetro repetido (?mes=1&mes=3) suma sus valores a los separados por comas.
+                parametros = {nombre: request.args.getlist(nombre) for nombre in request.args if nombre != 'formato'}
+                entrada = self.respuesta(self.normalizar(parametros), formato)
+            except ErrorConsulta as e:
+                return _respuesta_error(str(e))
+            return cache_figuras.responder(entrada, request)
+
+        @api.route('/aggregates', methods=['POST'])
+        def consultar_lote():
+            if self.cubo is None:
+                return _respuesta_error('No hay datos cargados', 503)
+            cuerpo = request.get_json(silent=True)
+            if not isinstance(cuerpo, dict) or not isinstance(cuerpo.get('consultas'), list):
+                return _respuesta_error('Se espera un objeto JSON con la lista "consultas"')
+            formato = cuerpo.get('formato', 'json')
+            if formato not in FORMATOS:
+                return _respuesta_error(f"Formato no válido: {formato!r} (json o arrow)")
+            if len(cuerpo['consultas']) > MAX_CONSULTAS_LOTE:
+                return _respuesta_error(f'Como máximo {MAX_CONSULTAS_LOTE} consultas por lote')
+            if not all(isinstance(c, dict) for c in cuerpo['consultas']):
+                return _respuesta_error('Cada consulta debe ser un objeto JSON')
+            try:
+                contenido = self.lote(cuerpo['consultas'], formato)
+            except ErrorConsulta as e:
+                return _respuesta_error(str(e))
+            # El lote no se guarda en la caché (cada consulta sí), pero lleva ETag y compresión igual.
+            entrada = cache_figuras.entrada_serializada(contenido, mimetype=FORMATOS[formato])
+            return cache_figuras.responder(entrada, request, max_age=0)
+
+        return api
@@ -1,9 +1,21 @@
 import dash
-from dash import dcc, html, dash_table, Input, Output
+from dash import dcc, html, dash_table, ClientsideFunction, Input, Output
+from flask import abort, request
+from urllib.parse import urlencode
+import json
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import json
+import agregados
+import api
+import cache_figuras
+import causas
+import consultas
+import datos
+import historico
+import ingesta
+import metricas
+import rankings
 
 # --- Definición de la Paleta de Colores Temática ---
 color_fondo_principal = '#1E1E1E'
@@ -20,37 +32,94 @@ map_color_scale_simple = [[0, color_fondo_elementos], [1, color_acento_amarillo]
 
 # ========== CARGA DE DATOS ==========
 # Se intenta cargar los datos desde los archivos Excel y GeoJSON.
-# Es importante que estos archivos estén en la carpeta 'data/' o se ajuste la ruta.
+# Es importante que estos archivos estén en la carpeta 'data/' o se ajuste la ruta (MORTALIDAD_DATOS).
+# Los Excel se leen a través de la caché Parquet del módulo 'datos', que se reconstruye sola si cambian.
+# Con MORTALIDAD_MODO_CARGA=mmap el conjunto preprocesado se mapea en memoria y lo comparten los workers.
+# Si hay particiones de varios años (ingesta.py), el cubo se actualiza con las particiones nuevas
+# y no se cargan los registros; si no, se usa el Anexo 1 de 2019. Antes se vuelven a ingerir las
+# fuentes que cambiaron desde la última ingesta (por ejemplo, un Anexo 1 reemplazado).
+# Cada etapa del arranque se mide y se expone en /metrics (mortalidad_arranque_segundos).
+etapas_arranque = metricas.EtapasArranque()
 try:
-    mortalidad = pd.read_excel('data/Anexo1.NoFetal2019_CE_15-03-23.xlsx', sheet_name='No_Fetales_2019')
-    codigos_muerte_raw = pd.read_excel('data/Anexo2.CodigosDeMuerte_CE_15-03-23.xlsx', sheet_name=None)
-    divipola = pd.read_excel('data/Anexo3.Divipola_CE_15-03-23.xlsx')
-    with open('data/departamentos_colombia__plotly.geojson', encoding='utf-8') as f:
-        geojson_departamentos = json.load(f)
+    try:
+        for fuente, filas_por_anio in ingesta.actualizar_fuentes().items():
+            print(f"Se volvió a ingerir {fuente} ({sum(filas_por_anio.values())} filas) porque cambió desde la última ingesta.")
+    except Exception as e:
+        print(f"Advertencia: no se pudieron volver a ingerir las fuentes modificadas: {e}. Se usan las particiones existentes.")
+    cubo = historico.actualizar()
+    mortalidad = datos.cargar_mortalidad_preprocesada() if cubo is None else pd.DataFrame()
+    codigos_muerte_raw = datos.cargar_codigos_muerte()
+    divipola = datos.cargar_divipola()
+    # Polígonos simplificados por nivel de detalle (bytes GeoJSON); los nombres y códigos se leen del más fino.
+    geometrias = datos.cargar_geojson_simplificado()
+    geojson_departamentos = json.loads(geometrias['principal'])
 except FileNotFoundError as e:
     # Manejo de error si no se encuentran los archivos de datos.
     print(f"Error: No se encontró el archivo de datos: {e.filename}. Se usarán DataFrames vacíos.")
+    cubo = None
     mortalidad = pd.DataFrame()
     codigos_muerte_raw = {}
     divipola = pd.DataFrame()
+    geometrias = {}
     geojson_departamentos = {"type": "FeatureCollection", "features": []}
 except Exception as e:
     print(f"Ocurrió un error al cargar los datos: {e}. Se usarán DataFrames vacíos.")
+    cubo = None
     mortalidad = pd.DataFrame()
     codigos_muerte_raw = {}
     divipola = pd.DataFrame()
+    geometrias = {}
     geojson_departamentos = {"type": "FeatureCollection", "features": []}
 
+etapas_arranque.terminar('carga')
 
 # ========== PREPROCESAMIENTO DE DATOS ==========
 # Se realizan varias operaciones para preparar los datos para la visualización.
 
-# Procesamiento de códigos de departamento y cálculo de muertes por departamento.
-if not mortalidad.empty:
-    mortalidad['COD_DEPARTAMENTO'] = mortalidad['COD_DEPARTAMENTO'].astype(str).str.zfill(2)
-    dep_muertes = mortalidad.groupby('COD_DEPARTAMENTO').size().reset_index(name='Total_Muertes')
+# Los códigos de departamento (rellenados a dos dígitos) y los nombres de municipios y departamentos
+# de DIVIPOLA ya vienen resueltos por datos.preprocesar_mortalidad.
+# Asegurar que las columnas existan si los DataFrames originales estaban vacíos.
+if 'MUNICIPIO' not in mortalidad.columns: mortalidad['MUNICIPIO'] = None
+if 'DEPARTAMENTO' not in mortalidad.columns: mortalidad['DEPARTAMENTO'] = None
+
+# Cubo de conteos: una sola pasada sobre los registros. Los datos de cada figura se obtienen
+# sumando celdas del cubo en lugar de hacer un groupby sobre todos los registros.
+if cubo is None and not mortalidad.empty:
+    cubo = agregados.CuboMortalidad.desde_registros(mortalidad)
+# Después del cubo ya no se usan los registros: se liberan para que cada worker no guarde su copia.
+del mortalidad
+# Índices por dimensión para resolver los filtros sobre las celdas del cubo.
+indice_filtros = consultas.IndiceFiltros(cubo) if cubo is not None else None
+
+# Jerarquía CIE-10 del Anexo 2: grupo de tres caracteres (id entero) de cada código de causa del cubo.
+# Los grupos de causas (homicidios, agresiones X85-Y09) se seleccionan comparando esos enteros.
+try:
+    indice_causas = causas.IndiceCausas.desde_anexo(codigos_muerte_raw)
+except (KeyError, ValueError) as e:
+    print(f"No se pudo leer el catálogo de causas del Anexo 2: {e}. Las tablas mostrarán solo los códigos.")
+    indice_causas = None
+if cubo is not None and 'COD_MUERTE' in cubo.dimensiones and indice_causas is not None:
+    grupos_causa = indice_causas.ids_grupo(cubo.categorias['COD_MUERTE'].astype(str))
+    homicidios_celdas = cubo.mascara_categorias('COD_MUERTE', indice_causas.seleccion(grupos_causa, *causas.HOMICIDIOS_ARMA_FUEGO))
+elif cubo is not None and 'COD_MUERTE' in cubo.dimensiones:
+    homicidios_celdas = cubo.mascara_categorias(
+        'COD_MUERTE', cubo.categorias['COD_MUERTE'].astype(str).str.startswith(causas.HOMICIDIOS_ARMA_FUEGO[0]))
 else:
-    dep_muertes = pd.DataFrame(columns=['COD_DEPARTAMENTO', 'Total_Muertes'])
+    homicidios_celdas = None
+
+# Rankings de municipios por COD_DANE: incluyen los municipios de DIVIPOLA sin defunciones y no suman
+# municipios que comparten nombre. Los K primeros se eligen con selección parcial, sin ordenar todos.
+if cubo is not None and 'COD_DANE' in cubo.dimensiones:
+    ranking_municipios = rankings.RankingMunicipios(cubo, divipola)
+    ranking_homicidios = (rankings.RankingMunicipios(cubo, divipola, seleccion=homicidios_celdas)
+                          if homicidios_celdas is not None else None)
+else:
+    ranking_municipios = ranking_homicidios = None
+
+# Años cargados, para los títulos ("2019" o "2015-2023").
+anios_cargados = sorted(int(a) for a in cubo.categorias['AÑO']) if cubo is not None and 'AÑO' in cubo.categorias else []
+periodo = (f'{anios_cargados[0]}-{anios_cargados[-1]}' if len(anios_cargados) > 1
+           else str(anios_cargados[0]) if anios_cargados else '2019')
 
 # Procesamiento de datos geográficos para el mapa.
 if geojson_departamentos and geojson_departamentos['features']:
@@ -61,26 +130,102 @@ if geojson_departamentos and geojson_departamentos['features']:
 else:
     geo_departamentos_df = pd.DataFrame(columns=['DPTO_CCDGO', 'DPTO_CNMBR'])
 
-# Unión de datos de muertes con datos geográficos.
-df_mapa = geo_departamentos_df.merge(dep_muertes, left_on='DPTO_CCDGO', right_on='COD_DEPARTAMENTO', how='left')
-df_mapa['Total_Muertes'] = df_mapa['Total_Muertes'].fillna(0)
-
-# Unión de datos de mortalidad con información de DIVIPOLA para obtener nombres de municipios y departamentos.
-if not mortalidad.empty and not divipola.empty and 'COD_DANE' in mortalidad.columns and 'COD_DANE' in divipola.columns:
-    mortalidad['COD_DANE'] = mortalidad['COD_DANE'].astype(str)
-    divipola['COD_DANE'] = divipola['COD_DANE'].astype(str)
-    mortalidad = mortalidad.merge(divipola[['COD_DANE', 'MUNICIPIO', 'DEPARTAMENTO']], on='COD_DANE', how='left', suffixes=('', '_divipola'))
-    # Consolidar columnas de municipio y departamento si hay duplicados por el merge.
-    if 'MUNICIPIO_divipola' in mortalidad.columns:
-        mortalidad['MUNICIPIO'] = mortalidad['MUNICIPIO_divipola']
-        mortalidad.drop(columns=['MUNICIPIO_divipola'], inplace=True)
-    if 'DEPARTAMENTO_divipola' in mortalidad.columns:
-        mortalidad['DEPARTAMENTO'] = mortalidad['DEPARTAMENTO_divipola']
-        mortalidad.drop(columns=['DEPARTAMENTO_divipola'], inplace=True)
-else:
-    # Asegurar que las columnas existan si los DataFrames originales estaban vacíos.
-    if 'MUNICIPIO' not in mortalidad.columns: mortalidad['MUNICIPIO'] = None
-    if 'DEPARTAMENTO' not in mortalidad.columns: mortalidad['DEPARTAMENTO'] = None
+# La geometría no se incrusta en las figuras: cada trazo del mapa apunta a la URL de su nivel de
+# detalle y el navegador descarga el GeoJSON una sola vez (la URL lleva el hash del contenido).
+geometrias_serializadas = {nivel: cache_figuras.entrada_serializada(cuerpo) for nivel, cuerpo in geometrias.items()}
+
+def url_geojson(nivel):
+    entrada = geometrias_serializadas.get(nivel)
+    if entrada is None:
+        return {"type": "FeatureCollection", "features": []}
+    version = entrada.etag.strip('"')[:12]
+    return f'/geo/{version}/departamentos-{nivel}.geojson'
+
+# Cada función calcula los datos de una visualización. 'mascara' selecciona las celdas del cubo
+# que cumplen los filtros activos (None = todas).
+
+# Cálculo de muertes por departamento y unión con datos geográficos.
+def calcular_df_mapa(mascara=None):
+    if cubo is not None and 'COD_DEPARTAMENTO' in cubo.dimensiones:
+        dep_muertes = cubo.totales(['COD_DEPARTAMENTO'], mascara=mascara, nombre='Total_Muertes')
+    else:
+        dep_muertes = pd.DataFrame(columns=['COD_DEPARTAMENTO', 'Total_Muertes'])
+    df = geo_departamentos_df.merge(dep_muertes, left_on='DPTO_CCDGO', right_on='COD_DEPARTAMENTO', how='left')
+    df['Total_Muertes'] = df['Total_Muertes'].fillna(0)
+    return df
+
+def calcular_muertes_mes(mascara=None):
+    if cubo is not None and 'MES' in cubo.dimensiones:
+        return cubo.totales(['MES'], mascara=mascara, nombre='Muertes')
+    return pd.DataFrame({'MES': [], 'Muertes': []})
+
+# Serie mensual de todos los años con su media móvil y su variación interanual.
+def calcular_tendencia(mascara=None):
+    if cubo is not None and 'AÑO' in cubo.dimensiones and 'MES' in cubo.dimensiones:
+        return historico.serie_mensual(cubo, mascara)
+    return pd.DataFrame({'Muertes': [], 'Media_movil': [], 'Variacion_interanual': []}, index=pd.DatetimeIndex([]))
+
+# Puesto de cada municipio en un ranking, con los empates, para el texto al pasar el cursor.
+def textos_puesto(ranking_df):
+    return [f'Puesto {p}' + (f' (empate con {e} municipio{"s" if e > 1 else ""} más)' if e else '')
+            for p, e in zip(ranking_df['POSICION'], ranking_df['EMPATES'])]
+
+def calcular_top_violentas(mascara=None):
+    if ranking_homicidios is not None:
+        violentas_df = ranking_homicidios.mayores(5, mascara, nombre='Homicidios')
+    else:
+        violentas_df = pd.DataFrame({'MUNICIPIO': [], 'Homicidios': [], 'POSICION': [], 'EMPATES': []})
+    return violentas_df.assign(PUESTO=textos_puesto(violentas_df))
+
+# Los municipios sin defunciones no caben en la torta (sus porciones serían nulas): el ranking se
+# hace entre los que tienen al menos una y los demás se cuentan en el título de la torta. Con filtro de
+# departamento solo cuentan los municipios de esos departamentos.
+def calcular_menos_muertes(mascara=None, departamentos=None):
+    if ranking_municipios is not None:
+        muertes_ciudad_df = ranking_municipios.menores(10, mascara, minimo=1, departamentos=departamentos)
+    else:
+        muertes_ciudad_df = pd.DataFrame({'MUNICIPIO': [], 'Total': [], 'POSICION': [], 'EMPATES': []})
+    return muertes_ciudad_df.assign(PUESTO=textos_puesto(muertes_ciudad_df))
+
+def titulo_sin_defunciones(mascara=None, departamentos=None):
+    sin_defunciones = ranking_municipios.sin_defunciones(mascara, departamentos) if ranking_municipios is not None else 0
+    texto = f'{sin_defunciones} municipio{"s" if sin_defunciones != 1 else ""} sin defunciones' if sin_defunciones else ''
+    return dict(text=texto, position='bottom center', font=dict(size=11, color=color_texto_secundario))
+
+def calcular_top_causas(mascara=None):
+    if cubo is not None and 'COD_MUERTE' in cubo.dimensiones:
+        causas_df = cubo.totales(['COD_MUERTE'], mascara=mascara)
+        causas_df = causas_df.sort_values(by='Total', ascending=False).head(10)
+        causas_df.insert(1, 'DESCRIPCION', indice_causas.describir(causas_df['COD_MUERTE'].astype(str))
+                         if indice_causas is not None else '')
+        return causas_df
+    return pd.DataFrame({'COD_MUERTE': [], 'DESCRIPCION': [], 'Total': []})
+
+def calcular_edad(mascara=None):
+    if cubo is not None and 'GRUPO_EDAD1' in cubo.dimensiones:
+        return cubo.totales(['GRUPO_EDAD1'], mascara=mascara, nombre='Muertes')
+    return None
+
+def calcular_sexo_dep(mascara=None):
+    if cubo is not None and 'DEPARTAMENTO' in cubo.dimensiones and 'SEXO' in cubo.dimensiones:
+        sexo_dep_df = cubo.totales(['DEPARTAMENTO', 'SEXO'], mascara=mascara)
+        sexo_dep_df['SEXO'] = sexo_dep_df['SEXO'].map({1: 'Hombre', 2: 'Mujer', '1':'Hombre', '2':'Mujer'}).fillna('No especificado')
+        return sexo_dep_df
+    return pd.DataFrame({'DEPARTAMENTO':[], 'SEXO':[], 'Total':[]})
+
+# Agregados de las figuras base (sin filtros); su cálculo cuenta en la etapa de preprocesamiento.
+df_mapa = calcular_df_mapa()
+muertes_mes_df = calcular_muertes_mes()
+tendencia_df = calcular_tendencia()
+top_5_violentas = calcular_top_violentas()
+menos_muertes_df = calcular_menos_muertes()
+titulo_menos_muertes = titulo_sin_defunciones()
+top_causas_principal_df = calcular_top_causas()
+top_causas_preview_df = top_causas_principal_df.head(3)
+edad_df = calcular_edad()
+sexo_dep_df = calcular_sexo_dep()
+
+etapas_arranque.terminar('preprocesamiento')
 
 # ========== DEFINICIÓN DE FIGURAS DE PLOTLY CON TEMA OSCURO ==========
 # Se crean las figuras base para cada visualización.
@@ -89,7 +234,7 @@ else:
 
 # --- Figura: Mapa de Coropletas ---
 mapa = px.choropleth(
-    df_mapa, geojson=geojson_departamentos, locations='DPTO_CCDGO',
+    df_mapa, geojson=url_geojson('miniatura'), locations='DPTO_CCDGO',
     featureidkey='properties.DPTO_CCDGO', color='Total_Muertes',
     color_continuous_scale=map_color_scale_simple,
     labels={'Total_Muertes': 'Total de Muertes'}, hover_name='DPTO_CNMBR',
@@ -106,10 +251,6 @@ mapa.update_layout(
 )
 
 # --- Figura: Líneas de Muertes por Mes ---
-if not mortalidad.empty and 'MES' in mortalidad.columns:
-    muertes_mes_df = mortalidad.groupby('MES').size().reset_index(name='Muertes')
-else:
-    muertes_mes_df = pd.DataFrame({'MES': [], 'Muertes': []})
 lineas = px.line(muertes_mes_df, x='MES', y='Muertes', markers=True, template='plotly_dark')
 lineas.update_traces(line_color=color_acento_amarillo, marker_color=color_acento_amarillo)
 lineas.update_layout(
@@ -119,15 +260,27 @@ lineas.update_layout(
     yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
 )
 
+# --- Figura: Tendencia Mensual, Media Móvil y Variación Interanual ---
+tendencia = go.Figure([
+    go.Scatter(x=tendencia_df.index, y=tendencia_df['Muertes'], name='Muertes por mes', mode='lines',
+               line_color=color_acento_amarillo),
+    go.Scatter(x=tendencia_df.index, y=tendencia_df['Media_movil'], name=f'Media móvil ({historico.VENTANA_MOVIL} meses)',
+               mode='lines', line=dict(color=color_texto_principal, dash='dash')),
+    go.Bar(x=tendencia_df.index, y=tendencia_df['Variacion_interanual'], name='Variación interanual (%)', yaxis='y2',
+           marker_color=color_acento_rojo, opacity=0.5),
+])
+tendencia.update_layout(
+    template='plotly_dark', paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+    font_color=color_texto_principal, legend_font_color=color_texto_principal,
+    xaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
+    yaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
+    yaxis2=dict(overlaying='y', side='right', showgrid=False, ticksuffix='%', zeroline=False)
+)
+
 # --- Figura: Barras de Ciudades Violentas ---
-if not mortalidad.empty and 'COD_MUERTE' in mortalidad.columns and 'MUNICIPIO' in mortalidad.columns:
-    homicidios = mortalidad[mortalidad['COD_MUERTE'].str.startswith('X95', na=False)]
-    violentas_df = homicidios.groupby('MUNICIPIO').size().reset_index(name='Homicidios')
-    top_5_violentas = violentas_df.sort_values(by='Homicidios', ascending=False).head(5)
-else:
-    top_5_violentas = pd.DataFrame({'MUNICIPIO': [], 'Homicidios': []})
-barras_violentas = px.bar(top_5_violentas, x='MUNICIPIO', y='Homicidios', template='plotly_dark')
-barras_violentas.update_traces(marker_color=color_acento_rojo)
+barras_violentas = px.bar(top_5_violentas, x='MUNICIPIO', y='Homicidios', custom_data=['PUESTO'], template='plotly_dark')
+barras_violentas.update_traces(marker_color=color_acento_rojo,
+                               hovertemplate='%{x}<br>Homicidios: %{y}<br>%{customdata[0]}<extra></extra>')
 barras_violentas.update_layout(
     paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
     font_color=color_texto_principal,
@@ -136,27 +289,16 @@ barras_violentas.update_layout(
 )
 
 # --- Figura: Gráfico de Torta de Ciudades Menos Mortales ---
-if not mortalidad.empty and 'MUNICIPIO' in mortalidad.columns:
-    muertes_ciudad_df = mortalidad.groupby('MUNICIPIO').size().reset_index(name='Total')
-    menos_muertes_df = muertes_ciudad_df.sort_values(by='Total').head(10)
-else:
-    menos_muertes_df = pd.DataFrame({'MUNICIPIO': [], 'Total': []})
 pie = px.pie(menos_muertes_df, names='MUNICIPIO', values='Total', template='plotly_dark',
              color_discrete_sequence=[color_acento_azul, color_acento_amarillo, '#007A6C', '#FF8C00', '#708090'])
+pie.update_traces(text=menos_muertes_df['PUESTO'], textinfo='percent', title=titulo_menos_muertes,
+                  hovertemplate='%{label}<br>Muertes: %{value}<br>%{text}<extra></extra>')
 pie.update_layout(
     paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
     font_color=color_texto_principal, legend_font_color=color_texto_principal
 )
 
 # --- Tablas: Causas de Muerte ---
-if not mortalidad.empty and 'COD_MUERTE' in mortalidad.columns:
-    causas_df = mortalidad.groupby('COD_MUERTE').size().reset_index(name='Total')
-    top_causas_principal_df = causas_df.sort_values(by='Total', ascending=False).head(10)
-    top_causas_preview_df = top_causas_principal_df.head(3)
-else:
-    top_causas_principal_df = pd.DataFrame({'COD_MUERTE': [], 'Total': []})
-    top_causas_preview_df = pd.DataFrame({'COD_MUERTE': [], 'Total': []})
-
 # Estilos para las tablas en tema oscuro.
 table_style_dark = {
     'style_table':{'overflowX': 'auto', 'backgroundColor': color_fondo_elementos, 'width': '100%'}, # Asegurar ancho
@@ -179,22 +321,28 @@ preview_table_style_dark = {
     'style_data': {'borderBottom': f'1px solid {color_borde_elementos}'}
 }
 
-tabla_principal_causas = dash_table.DataTable(
-    id='tabla-causas-principal',
-    columns=[{'name': 'Código', 'id': 'COD_MUERTE'}, {'name': 'Total', 'id': 'Total'}],
-    data=top_causas_principal_df.to_dict('records'),
-    **table_style_dark
-)
+def crear_tabla_principal_causas(top_causas_df):
+    return dash_table.DataTable(
+        id='tabla-causas-principal',
+        columns=[{'name': 'Código', 'id': 'COD_MUERTE'}, {'name': 'Causa', 'id': 'DESCRIPCION'},
+                 {'name': 'Total', 'id': 'Total'}],
+        data=top_causas_df.to_dict('records'),
+        **table_style_dark
+    )
+
+tabla_principal_causas = crear_tabla_principal_causas(top_causas_principal_df)
 preview_tabla_causas = dash_table.DataTable(
     id='preview-tabla-causas',
-    columns=[{'name': 'Cód.', 'id': 'COD_MUERTE'}, {'name': 'Cant.', 'id': 'Total'}],
+    columns=[{'name': 'Cód.', 'id': 'COD_MUERTE'}, {'name': 'Causa', 'id': 'DESCRIPCION'},
+             {'name': 'Cant.', 'id': 'Total'}],
     data=top_causas_preview_df.to_dict('records'),
     **preview_table_style_dark
 )
 
 # --- Figura: Histograma de Muertes por Edad ---
-if not mortalidad.empty and 'GRUPO_EDAD1' in mortalidad.columns:
-    histograma = px.histogram(mortalidad, x='GRUPO_EDAD1', template='plotly_dark')
+# Se grafican los totales por grupo de edad (histfunc='sum') en lugar de pasar todos los registros.
+if edad_df is not None:
+    histograma = px.histogram(edad_df, x='GRUPO_EDAD1', y='Muertes', histfunc='sum', template='plotly_dark')
 else:
     histograma = px.histogram(pd.DataFrame({'GRUPO_EDAD1':[]}), x='GRUPO_EDAD1', template='plotly_dark')
 histograma.update_traces(marker_color=color_acento_azul)
@@ -206,11 +354,6 @@ histograma.update_layout(
 )
 
 # --- Figura: Barras de Muertes por Sexo y Departamento ---
-if not mortalidad.empty and 'DEPARTAMENTO' in mortalidad.columns and 'SEXO' in mortalidad.columns:
-    sexo_dep_df = mortalidad.groupby(['DEPARTAMENTO', 'SEXO']).size().reset_index(name='Total')
-    sexo_dep_df['SEXO'] = sexo_dep_df['SEXO'].map({1: 'Hombre', 2: 'Mujer', '1':'Hombre', '2':'Mujer'}).fillna('No especificado')
-else:
-    sexo_dep_df = pd.DataFrame({'DEPARTAMENTO':[], 'SEXO':[], 'Total':[]})
 barras_sexo = px.bar(sexo_dep_df, x='DEPARTAMENTO', y='Total', color='SEXO', template='plotly_dark',
                      color_discrete_map={'Hombre': color_acento_azul, 'Mujer': color_acento_amarillo, 'No especificado': '#777777'})
 barras_sexo.update_layout(
@@ -220,9 +363,184 @@ barras_sexo.update_layout(
     yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
 )
 
+# ========== DATOS DE LAS TRAZAS SEGÚN LOS FILTROS ==========
+# Al filtrar no se vuelven a construir las figuras con Plotly Express (decenas de ms cada una):
+# se reutiliza la figura base y solo se reemplazan los datos de sus trazas.
+# Cada función devuelve una lista con los cambios para cada traza de la figura base. 'departamentos' es
+# el filtro de departamento que dio la máscara (lo usa la torta para contar municipios sin defunciones).
+
+def trazas_mapa(mascara, departamentos=None):
+    return [{'z': calcular_df_mapa(mascara)['Total_Muertes'].to_numpy()}]
+
+def trazas_mes(mascara, departamentos=None):
+    df = calcular_muertes_mes(mascara)
+    return [{'x': df['MES'].to_numpy(), 'y': df['Muertes'].to_numpy()}]
+
+def trazas_tendencia(mascara, departamentos=None):
+    df = calcular_tendencia(mascara)
+    return [{'x': df.index.to_numpy(), 'y': df[col].to_numpy()} for col in ('Muertes', 'Media_movil', 'Variacion_interanual')]
+
+def trazas_violencia(mascara, departamentos=None):
+    df = calcular_top_violentas(mascara)
+    return [{'x': df['MUNICIPIO'].to_numpy(), 'y': df['Homicidios'].to_numpy(), 'customdata': df[['PUESTO']].to_numpy()}]
+
+def trazas_menos(mascara, departamentos=None):
+    df = calcular_menos_muertes(mascara, departamentos)
+    return [{'labels': df['MUNICIPIO'].to_numpy(), 'values': df['Total'].to_numpy(), 'text': df['PUESTO'].to_numpy(),
+             'title': titulo_sin_defunciones(mascara, departamentos)}]
+
+def trazas_edad(mascara, departamentos=None):
+    df = calcular_edad(mascara)
+    return [{'x': df['GRUPO_EDAD1'].to_numpy(), 'y': df['Muertes'].to_numpy()}] if df is not None else [{}]
+
+def trazas_sexo(mascara, departamentos=None):
+    # px.bar crea una traza por sexo; las que no tengan datos con el filtro quedan vacías.
+    grupos = {nombre: df for nombre, df in calcular_sexo_dep(mascara).groupby('SEXO')}
+    vacio = pd.DataFrame({'DEPARTAMENTO': [], 'Total': []})
+    return [{'x': grupos.get(traza.name, vacio)['DEPARTAMENTO'].to_numpy(),
+             'y': grupos.get(traza.name, vacio)['Total'].to_numpy()} for traza in barras_sexo.data]
+
+def figura_filtrada(figura_base, cambios_trazas):
+    """Copia superficial de la figura base (en formato dict) con los datos de las trazas reemplazados."""
+    return {'data': [dict(traza, **cambios) for traza, cambios in zip(figura_base['data'], cambios_trazas)],
+            'layout': figura_base['layout']}
+
+# ========== OPCIONES DE LOS FILTROS ==========
+nombres_meses = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+                 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+def opciones_filtro(dimension, etiqueta):
+    """Opciones de un Dropdown con las categorías de una dimensión del cubo."""
+    if indice_filtros is None or dimension not in indice_filtros.dimensiones:
+        return []
+    return [{'label': etiqueta(valor), 'value': valor} for valor in cubo.categorias[dimension].tolist()]
+
+nombres_departamentos = dict(zip(geo_departamentos_df['DPTO_CCDGO'], geo_departamentos_df['DPTO_CNMBR']))
+opciones_departamento = sorted(opciones_filtro('COD_DEPARTAMENTO', lambda v: nombres_departamentos.get(v, v)),
+                               key=lambda o: o['label'])
+opciones_mes = opciones_filtro('MES', lambda v: nombres_meses[v - 1] if 1 <= v <= 12 else str(v))
+opciones_sexo = opciones_filtro('SEXO', lambda v: {1: 'Hombre', 2: 'Mujer'}.get(v, 'No especificado'))
+opciones_edad = opciones_filtro('GRUPO_EDAD1', str)
+opciones_anio = opciones_filtro('AÑO', str)
+
+def filtro_dropdown(component_id, placeholder, opciones):
+    return dcc.Dropdown(id=component_id, options=opciones, multi=True, placeholder=placeholder,
+                        className='filtro-dropdown')
+
+def mascara_filtros(departamentos=None, meses=None, sexos=None, grupos_edad=None, anios=None):
+    """Celdas del cubo que cumplen los filtros seleccionados (None si no hay filtros activos)."""
+    if indice_filtros is None:
+        return None
+    return indice_filtros.filtrar({'COD_DEPARTAMENTO': departamentos, 'MES': meses,
+                                   'SEXO': sexos, 'GRUPO_EDAD1': grupos_edad, 'AÑO': anios})
+
+# ========== AJUSTES DE LAS MINIATURAS ==========
+# Las figuras base quedan con el estilo de las miniaturas; la vista principal parte de ellas.
+mapa.update_layout(margin=dict(l=0,r=0,t=0,b=0), showlegend=False, title_text=None, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+tendencia.update_layout(margin=dict(l=15,r=5,t=5,b=15), showlegend=False, title_text=None, xaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), yaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), yaxis2=dict(showticklabels=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+lineas.update_layout(margin=dict(l=15,r=5,t=5,b=15), showlegend=False, title_text=None, xaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), yaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+barras_violentas.update_layout(margin=dict(l=15,r=5,t=5,b=20), showlegend=False, title_text=None, xaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False, tickangle=0), yaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False),paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+pie.update_layout(margin=dict(l=0,r=0,t=0,b=0), showlegend=False, title_text=None, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+histograma.update_layout(margin=dict(l=15,r=5,t=5,b=15), showlegend=False, title_text=None, bargap=0.2, xaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), yaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+barras_sexo.update_layout(margin=dict(l=15,r=5,t=5,b=15), showlegend=False, title_text=None, xaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), yaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+
+# ========== ESTILO DE LAS VISTAS PRINCIPALES ==========
+def aplicar_estilo_principal(graph_fig_to_show, component_id):
+    """Ajustes de layout de un gráfico en la vista principal (a partir de la figura de la miniatura)."""
+    # Ajustes generales de layout para los gráficos en la vista principal.
+    graph_fig_to_show.update_layout(
+        title_text=None, # No se usa el título interno de Plotly, se usa el H2.
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font_color=color_texto_principal,
+        legend_font_color=color_texto_secundario,
+        # Se definen configuraciones base para los ejes.
+        xaxis=dict(showticklabels=True, gridcolor='rgba(255,255,255,0.1)', title_font_color=color_texto_secundario, tickfont_color=color_texto_secundario),
+        yaxis=dict(showticklabels=True, gridcolor='rgba(255,255,255,0.1)', title_font_color=color_texto_secundario, tickfont_color=color_texto_secundario),
+        # Permitir que el gráfico se ajuste automáticamente a su contenedor.
+        # No se define una altura fija aquí, se espera que el CSS o el estilo del dcc.Graph lo manejen.
+        # height=None, # Podría ser explícito para forzar autosize si hay problemas.
+        autosize=True
+    )
+    # Ajustes específicos por tipo de gráfico (títulos de ejes, leyendas, etc.)
+    if component_id == 'main-mapa-graph':
+        graph_fig_to_show.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
+    elif component_id == 'main-mes-graph':
+         graph_fig_to_show.update_layout(xaxis_title="Mes", yaxis_title="Número de muertes")
+    elif component_id == 'main-violencia-graph':
+         graph_fig_to_show.update_layout(xaxis_title="Ciudad", yaxis_title="Número de homicidios", xaxis_tickangle=-45)
+    elif component_id == 'main-menos-graph':
+         graph_fig_to_show.update_layout(showlegend=True, legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5))
+    elif component_id == 'main-edad-graph':
+         graph_fig_to_show.update_layout(xaxis_title="Grupo de Edad", yaxis_title="Número de muertes", bargap=0.1)
+    elif component_id == 'main-tendencia-graph':
+         graph_fig_to_show.update_layout(xaxis_title="Mes", yaxis_title="Número de muertes", yaxis2=dict(showticklabels=True, title="Variación interanual"), showlegend=True, legend=dict(orientation="h", yanchor="bottom", y=-0.3, xanchor="center", x=0.5))
+    elif component_id == 'main-sexo-graph':
+         graph_fig_to_show.update_layout(xaxis_title="Departamento", yaxis_title="Número de muertes", xaxis_tickangle=-45, showlegend=True, legend=dict(orientation="h", yanchor="bottom", y=-0.3, xanchor="center", x=0.5))
+    return graph_fig_to_show
+
+# Vistas con gráfico: ruta -> (título, id del gráfico principal, id de la miniatura, figura base, datos de las trazas).
+vistas_graficos = {
+    '/mapa': ('1. Mapa de muertes por departamento', 'main-mapa-graph', 'preview-mapa', mapa, trazas_mapa),
+    '/mes': ('2. Total de muertes por mes', 'main-mes-graph', 'preview-mes', lineas, trazas_mes),
+    '/violencia': ('3. 5 ciudades más violentas (homicidios)', 'main-violencia-graph', 'preview-violencia', barras_violentas, trazas_violencia),
+    '/menos': ('4. 10 ciudades con menor mortalidad', 'main-menos-graph', 'preview-menos', pie, trazas_menos),
+    '/edad': ('6. Histograma de muertes por edad', 'main-edad-graph', 'preview-edad', histograma, trazas_edad),
+    '/sexo': ('7. Muertes por sexo en cada departamento', 'main-sexo-graph', 'preview-sexo', barras_sexo, trazas_sexo),
+    '/tendencia': (f'8. Tendencia mensual {periodo}: media móvil y variación interanual', 'main-tendencia-graph', 'preview-tendencia', tendencia, trazas_tendencia),
+}
+# Figuras en formato dict, listas para reemplazar los datos de sus trazas. Las de la vista principal
+# se construyen una vez a partir de la miniatura, como antes se hacía en cada navegación.
+figuras_preview = {ruta: vista[3].to_plotly_json() for ruta, vista in vistas_graficos.items()}
+figuras_principales = {ruta: aplicar_estilo_principal(go.Figure(vista[3]), vista[1]).to_plotly_json()
+                       for ruta, vista in vistas_graficos.items()}
+# La miniatura del mapa usa la geometría gruesa y la vista principal la fina.
+if figuras_principales['/mapa']['data']:
+    figuras_principales['/mapa']['data'][0]['geojson'] = url_geojson('principal')
+etapas_arranque.terminar('figuras')
+
+
+# ========== CACHÉ DE FIGURAS SERIALIZADAS ==========
+# Cada figura (vista, miniatura o principal, y filtros) se serializa a JSON y se comprime una sola vez.
+# El navegador la pide a /figuras/<vista>.json y el servidor responde con los bytes guardados,
+# sin copiar la figura ni volver a serializarla en cada navegación.
+figuras_serializadas = cache_figuras.CacheFiguras()
+metricas.registrar_cache(figuras_serializadas)
+
+# Parámetro de la URL y tipo de valor de cada filtro, en el orden de mascara_filtros.
+parametros_filtros = [('departamento', str), ('mes', int), ('sexo', int), ('edad', int), ('anio', int)]
+# Valores válidos de cada filtro (las categorías del cubo que ofrecen los dropdowns).
+valores_filtros = [{o['value'] for o in opciones}
+                   for opciones in (opciones_departamento, opciones_mes, opciones_sexo, opciones_edad, opciones_anio)]
+# Versión de los datos en las URL de las figuras: al cambiar el cubo (nueva ingesta) cambian las URL
+# y el navegador no reutiliza figuras viejas que tenga guardadas.
+version_datos = cubo.huella()[:12] if cubo is not None else 'sin-datos'
+
+def normalizar_filtros(departamentos=None, meses=None, sexos=None, grupos_edad=None, anios=None):
+    """Filtros en forma canónica (tuplas ordenadas y sin repetidos), para usarlos como clave de caché y en URLs.
+
+    Los valores que no están en el cubo se descartan: no cambian la figura y cada combinación
+    distinta ocuparía una entrada de la caché.
+    """
+    return tuple(tuple(sorted({v for v in valores if v in validos})) if valores else ()
+                 for valores, validos in zip((departamentos, meses, sexos, grupos_edad, anios), valores_filtros))
+
+def url_figura(ruta, tipo, filtros=((), (), (), (), ())):
+    parametros = [('v', version_datos), ('tipo', tipo)] + [(nombre, ','.join(str(v) for v in valores))
+                                                           for (nombre, _), valores in zip(parametros_filtros, filtros) if valores]
+    return f'/figuras{ruta}.json?' + urlencode(parametros)
+
+def construir_figura(ruta, tipo, filtros):
+    figura = (figuras_principales if tipo == 'principal' else figuras_preview)[ruta]
+    mascara = mascara_filtros(*filtros)
+    return figura if mascara is None else figura_filtrada(figura, vistas_graficos[ruta][4](mascara, departamentos=filtros[0]))
+
 # ========== INICIALIZACIÓN DE LA APP DASH ==========
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
 server = app.server # Necesario para el despliegue con Gunicorn
+# Latencia y bytes de cada petición y la ruta /metrics (formato de Prometheus). Las figuras se
+# distinguen por vista: /figuras/mapa.json, /figuras/mes.json...
+metricas.instrumentar(server, rutas_detalladas=['/figuras/<vista>.json'])
 
 # ========== LAYOUT GENERAL DE LA APLICACIÓN ==========
 # Se define la estructura HTML de la página.
@@ -230,98 +548,127 @@ server = app.server # Necesario para el despliegue con Gunicorn
 app.layout = html.Div([
     dcc.Location(id='url', refresh=False), # Componente para manejar la URL y la navegación
     html.Div([
-        html.H2("Visualización Mortalidad Colombia 2019", style={'textAlign': 'center', 'color': color_acento_amarillo})
+        html.H2(f"Visualización Mortalidad Colombia {periodo}", style={'textAlign': 'center', 'color': color_acento_amarillo})
     ], className='sidebar'),
 
+    # Filtros cruzados: se aplican a todas las miniaturas y a la vista principal.
+    html.Div([
+        filtro_dropdown('filtro-departamento', 'Departamento', opciones_departamento),
+        filtro_dropdown('filtro-mes', 'Mes', opciones_mes),
+        filtro_dropdown('filtro-sexo', 'Sexo', opciones_sexo),
+        filtro_dropdown('filtro-edad', 'Grupo de edad', opciones_edad),
+        filtro_dropdown('filtro-anio', 'Año', opciones_anio),
+    ], className='filtros-container'),
+
     # Contenedor para las tarjetas de previsualización de los gráficos.
     html.Div([
-        dcc.Link([html.Div([dcc.Graph(id='preview-mapa',figure=mapa.update_layout(margin=dict(l=0,r=0,t=0,b=0), showlegend=False, title_text=None, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)'),config={'displayModeBar': False},style={'height': '160px', 'width': '100%'},),html.Div("Mapa de Muertes", className='preview-title')], className='preview-card-content')], href='/mapa', className='preview-card-link'),
-        dcc.Link([html.Div([dcc.Graph(id='preview-mes',figure=lineas.update_layout(margin=dict(l=15,r=5,t=5,b=15), showlegend=False, title_text=None, xaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), yaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)') ,config={'displayModeBar': False}, style={'height': '160px', 'width': '100%'}),html.Div("Muertes por Mes", className='preview-title')], className='preview-card-content')], href='/mes', className='preview-card-link'),
-        dcc.Link([html.Div([dcc.Graph(id='preview-violencia',figure=barras_violentas.update_layout(margin=dict(l=15,r=5,t=5,b=20), showlegend=False, title_text=None, xaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False, tickangle=0), yaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False),paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)'),config={'displayModeBar': False}, style={'height': '160px', 'width': '100%'}),html.Div("Ciudades Violentas", className='preview-title')], className='preview-card-content')], href='/violencia', className='preview-card-link'),
-        dcc.Link([html.Div([dcc.Graph(id='preview-menos',figure=pie.update_layout(margin=dict(l=0,r=0,t=0,b=0), showlegend=False, title_text=None, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)'),config={'displayModeBar': False}, style={'height': '160px', 'width': '100%'}),html.Div("Ciudades Seguras", className='preview-title')], className='preview-card-content')], href='/menos', className='preview-card-link'),
+        dcc.Link([html.Div([dcc.Graph(id='preview-mapa',config={'displayModeBar': False}, style={'height': '160px', 'width': '100%'}),dcc.Store(id='fuente-preview-mapa', data=url_figura('/mapa', 'preview')),html.Div("Mapa de Muertes", className='preview-title')], className='preview-card-content')], href='/mapa', className='preview-card-link'),
+        dcc.Link([html.Div([dcc.Graph(id='preview-mes',config={'displayModeBar': False}, style={'height': '160px', 'width': '100%'}),dcc.Store(id='fuente-preview-mes', data=url_figura('/mes', 'preview')),html.Div("Muertes por Mes", className='preview-title')], className='preview-card-content')], href='/mes', className='preview-card-link'),
+        dcc.Link([html.Div([dcc.Graph(id='preview-violencia',config={'displayModeBar': False}, style={'height': '160px', 'width': '100%'}),dcc.Store(id='fuente-preview-violencia', data=url_figura('/violencia', 'preview')),html.Div("Ciudades Violentas", className='preview-title')], className='preview-card-content')], href='/violencia', className='preview-card-link'),
+        dcc.Link([html.Div([dcc.Graph(id='preview-menos',config={'displayModeBar': False}, style={'height': '160px', 'width': '100%'}),dcc.Store(id='fuente-preview-menos', data=url_figura('/menos', 'preview')),html.Div("Ciudades Seguras", className='preview-title')], className='preview-card-content')], href='/menos', className='preview-card-link'),
         dcc.Link([html.Div([html.Div(preview_tabla_causas, style={'height': '160px', 'padding': '5px', 'boxSizing': 'border-box', 'overflow': 'hidden', 'width':'100%'}),html.Div("Causas de Muerte", className='preview-title')], className='preview-card-content')], href='/causas', className='preview-card-link'),
-        dcc.Link([html.Div([dcc.Graph(id='preview-edad',figure=histograma.update_layout(margin=dict(l=15,r=5,t=5,b=15), showlegend=False, title_text=None, bargap=0.2, xaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), yaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)'), config={'displayModeBar': False}, style={'height': '160px', 'width': '100%'}),html.Div("Muertes por Edad", className='preview-title')], className='preview-card-content')], href='/edad', className='preview-card-link'),
-        dcc.Link([html.Div([dcc.Graph(id='preview-sexo',figure=barras_sexo.update_layout(margin=dict(l=15,r=5,t=5,b=15), showlegend=False, title_text=None, xaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), yaxis=dict(showticklabels=False, title=None, showgrid=False, zeroline=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)'), config={'displayModeBar': False}, style={'height': '160px', 'width': '100%'}),html.Div("Muertes por Sexo", className='preview-title')], className='preview-card-content')], href='/sexo', className='preview-card-link'),
+        dcc.Link([html.Div([dcc.Graph(id='preview-edad',config={'displayModeBar': False}, style={'height': '160px', 'width': '100%'}),dcc.Store(id='fuente-preview-edad', data=url_figura('/edad', 'preview')),html.Div("Muertes por Edad", className='preview-title')], className='preview-card-content')], href='/edad', className='preview-card-link'),
+        dcc.Link([html.Div([dcc.Graph(id='preview-sexo',config={'displayModeBar': False}, style={'height': '160px', 'width': '100%'}),dcc.Store(id='fuente-preview-sexo', data=url_figura('/sexo', 'preview')),html.Div("Muertes por Sexo", className='preview-title')], className='preview-card-content')], href='/sexo', className='preview-card-link'),
+        dcc.Link([html.Div([dcc.Graph(id='preview-tendencia',config={'displayModeBar': False}, style={'height': '160px', 'width': '100%'}),dcc.Store(id='fuente-preview-tendencia', data=url_figura('/tendencia', 'preview')),html.Div("Tendencia entre Años", className='preview-title')], className='preview-card-content')], href='/tendencia', className='preview-card-link'),
     ], className='preview-container'),
 
     # Contenedor donde se renderizará el contenido de cada página/vista.
     html.Div(id='page-content', className='content')
 ], style={'maxWidth': '100%', 'overflowX': 'hidden'}) # Control del ancho general y desbordamiento
 
-# ========== CALLBACK PARA LA NAVEGACIÓN Y RENDERIZADO DE PÁGINAS ==========
-# Este callback actualiza el contenido de 'page-content' según la URL.
-@app.callback(Output('page-content', 'children'), Input('url', 'pathname'))
-def display_page(pathname):
+# ========== RUTA QUE SIRVE LAS FIGURAS SERIALIZADAS ==========
+@server.route('/figuras/<vista>.json')
+def servir_figura(vista):
+    ruta, tipo = f'/{vista}', request.args.get('tipo', 'principal')
+    if ruta not in vistas_graficos or tipo not in ('principal', 'preview'):
+        abort(404)
+    try:
+        filtros = normalizar_filtros(*([convertir(v) for v in request.args.get(nombre, '').split(',') if v]
+                                       for nombre, convertir in parametros_filtros))
+    except ValueError:
+        abort(400)
+    entrada = figuras_serializadas.obtener((ruta, tipo) + filtros, lambda: construir_figura(ruta, tipo, filtros))
+    # Una URL con otra versión de los datos (una página abierta antes de reiniciar) se revalida siempre.
+    max_age = 300 if request.args.get('v') == version_datos else 0
+    return cache_figuras.responder(entrada, request, max_age=max_age)
+
+# ========== RUTA QUE SIRVE LA GEOMETRÍA DEL MAPA ==========
+# El contenido de cada URL no cambia (el hash cambia con él), así que se cachea por un año sin revalidar.
+@server.route('/geo/<version>/departamentos-<nivel>.geojson')
+def servir_geojson(version, nivel):
+    if url_geojson(nivel) != f'/geo/{version}/departamentos-{nivel}.geojson':
+        abort(404)
+    return cache_figuras.responder(geometrias_serializadas[nivel], request, max_age=31536000, inmutable=True)
+
+# ========== API DE AGREGADOS ==========
+# Conteos del cubo en JSON o Arrow para consumidores que no necesitan las figuras (/api/aggregates).
+api_agregados = api.ApiAgregados(cubo, indice_filtros, indice_causas)
+server.register_blueprint(api_agregados.blueprint())
+metricas.registrar_cache(api_agregados.respuestas)
+
+# ========== CALLBACKS PARA LA NAVEGACIÓN, LOS FILTROS Y EL RENDERIZADO DE PÁGINAS ==========
+entradas_filtros = [Input('filtro-departamento', 'value'), Input('filtro-mes', 'value'),
+                    Input('filtro-sexo', 'value'), Input('filtro-edad', 'value'), Input('filtro-anio', 'value')]
+
+# Este callback actualiza el contenido de 'page-content' según la URL y los filtros.
+@app.callback(Output('page-content', 'children'), Input('url', 'pathname'), *entradas_filtros)
+@metricas.cronometrado('display_page', vista=lambda pathname, *filtros: pathname if pathname in vistas_graficos or pathname == '/causas' else 'inicio')
+def display_page(pathname, departamentos=None, meses=None, sexos=None, grupos_edad=None, anios=None):
     # Función auxiliar para crear un contenedor estándar para cada gráfico/tabla principal.
     def graph_container(title_H2, graph_component_original, component_id=None, is_table=False):
-        graph_fig_to_show = go.Figure(graph_component_original) if isinstance(graph_component_original, go.Figure) else graph_component_original
-
-        if isinstance(graph_fig_to_show, go.Figure):
-            # Ajustes generales de layout para los gráficos en la vista principal.
-            graph_fig_to_show.update_layout(
-                title_text=None, # No se usa el título interno de Plotly, se usa el H2.
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color=color_texto_principal,
-                legend_font_color=color_texto_secundario,
-                # Se definen configuraciones base para los ejes.
-                xaxis=dict(showticklabels=True, gridcolor='rgba(255,255,255,0.1)', title_font_color=color_texto_secundario, tickfont_color=color_texto_secundario),
-                yaxis=dict(showticklabels=True, gridcolor='rgba(255,255,255,0.1)', title_font_color=color_texto_secundario, tickfont_color=color_texto_secundario),
-                # Permitir que el gráfico se ajuste automáticamente a su contenedor.
-                # No se define una altura fija aquí, se espera que el CSS o el estilo del dcc.Graph lo manejen.
-                # height=None, # Podría ser explícito para forzar autosize si hay problemas.
-                autosize=True
-            )
-            # Ajustes específicos por tipo de gráfico (títulos de ejes, leyendas, etc.)
-            if component_id == 'main-mapa-graph':
-                graph_fig_to_show.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
-            elif component_id == 'main-mes-graph':
-                 graph_fig_to_show.update_layout(xaxis_title="Mes", yaxis_title="Número de muertes")
-            elif component_id == 'main-violencia-graph':
-                 graph_fig_to_show.update_layout(xaxis_title="Ciudad", yaxis_title="Número de homicidios", xaxis_tickangle=-45)
-            elif component_id == 'main-menos-graph':
-                 graph_fig_to_show.update_layout(showlegend=True, legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5))
-            elif component_id == 'main-edad-graph':
-                 graph_fig_to_show.update_layout(xaxis_title="Grupo de Edad", yaxis_title="Número de muertes", bargap=0.1)
-            elif component_id == 'main-sexo-graph':
-                 graph_fig_to_show.update_layout(xaxis_title="Departamento", yaxis_title="Número de muertes", xaxis_tickangle=-45, showlegend=True, legend=dict(orientation="h", yanchor="bottom", y=-0.3, xanchor="center", x=0.5))
-
-            # Se crea el componente dcc.Graph. Se puede añadir un estilo para altura relativa si es necesario.
-            graph_component_to_render = dcc.Graph(
-                figure=graph_fig_to_show,
-                id=component_id if component_id else title_H2.replace(" ", "-").lower(),
-                style={'height': '65vh'} # Altura relativa al viewport para gráficos principales
-            )
+        if not is_table:
+            # Se crea el componente dcc.Graph; su figura la carga el navegador desde la URL del dcc.Store.
+            graph_id = component_id if component_id else title_H2.replace(" ", "-").lower()
+            graph_component_to_render = [
+                dcc.Graph(id=graph_id, style={'height': '65vh'}), # Altura relativa al viewport para gráficos principales
+                dcc.Store(id=f'fuente-{graph_id}', data=graph_component_original)
+            ]
         else: # Para tablas
-            graph_component_to_render = graph_fig_to_show
+            graph_component_to_render = graph_component_original
 
         return html.Div([
             html.H2(title_H2, style={'marginBottom': '20px', 'color': color_acento_amarillo, 'fontFamily': 'Arial, sans-serif'}),
             html.Div(graph_component_to_render, className='graph-container-main')
         ], className='content-container')
 
-    # Rutas para cada visualización. Se clonan las figuras base para evitar modificaciones accidentales.
-    if pathname == '/mapa':
-        return graph_container('1. Mapa de muertes por departamento', go.Figure(mapa), component_id='main-mapa-graph')
-    elif pathname == '/mes':
-        return graph_container('2. Total de muertes por mes', go.Figure(lineas), component_id='main-mes-graph')
-    elif pathname == '/violencia':
-        return graph_container('3. 5 ciudades más violentas (homicidios)', go.Figure(barras_violentas), component_id='main-violencia-graph')
-    elif pathname == '/menos':
-        return graph_container('4. 10 ciudades con menor mortalidad', go.Figure(pie), component_id='main-menos-graph')
+    # Rutas para cada visualización. La figura se sirve desde la caché de figuras serializadas.
+    if pathname in vistas_graficos:
+        titulo, component_id = vistas_graficos[pathname][:2]
+        filtros = normalizar_filtros(departamentos, meses, sexos, grupos_edad, anios)
+        return graph_container(titulo, url_figura(pathname, 'principal', filtros), component_id=component_id)
     elif pathname == '/causas':
-        return graph_container('5. Top 10 causas de muerte', tabla_principal_causas, is_table=True)
-    elif pathname == '/edad':
-        return graph_container('6. Histograma de muertes por edad', go.Figure(histograma), component_id='main-edad-graph')
-    elif pathname == '/sexo':
-        return graph_container('7. Muertes por sexo en cada departamento', go.Figure(barras_sexo), component_id='main-sexo-graph')
+        mascara = mascara_filtros(departamentos, meses, sexos, grupos_edad, anios)
+        tabla = tabla_principal_causas if mascara is None else crear_tabla_principal_causas(calcular_top_causas(mascara))
+        return graph_container('5. Top 10 causas de muerte', tabla, is_table=True)
     else: # Página de bienvenida por defecto
         return html.Div([
-            html.H1("Análisis de Mortalidad en Colombia 2019", style={'textAlign': 'center', 'marginTop': '50px', 'color': color_acento_amarillo, 'fontFamily': 'Arial, sans-serif', 'fontSize':'2em'}),
+            html.H1(f"Análisis de Mortalidad en Colombia {periodo}", style={'textAlign': 'center', 'marginTop': '50px', 'color': color_acento_amarillo, 'fontFamily': 'Arial, sans-serif', 'fontSize':'2em'}),
             html.P("Seleccione una visualización del menú superior o haga clic en cualquiera de las miniaturas arriba.", style={'textAlign': 'center', 'color': color_texto_principal, 'fontSize': '1.1em', 'fontFamily': 'Arial, sans-serif', 'marginTop':'20px'})
         ], className='welcome-container', style={'padding': '20px', 'minHeight': '60vh'})
 
+# Este callback actualiza las miniaturas cuando cambian los filtros: cambia la URL de cada figura
+# (el navegador la pide a la caché) y recalcula la tabla de causas.
+@app.callback(
+    [Output(f'fuente-{vista[2]}', 'data') for vista in vistas_graficos.values()] + [Output('preview-tabla-causas', 'data')],
+    *entradas_filtros, prevent_initial_call=True
+)
+@metricas.cronometrado('actualizar_previews')
+def actualizar_previews(departamentos=None, meses=None, sexos=None, grupos_edad=None, anios=None):
+    filtros = normalizar_filtros(departamentos, meses, sexos, grupos_edad, anios)
+    urls = [url_figura(ruta, 'preview', filtros) for ruta in vistas_graficos]
+    mascara = mascara_filtros(departamentos, meses, sexos, grupos_edad, anios)
+    top_causas_df = top_causas_preview_df if mascara is None else calcular_top_causas(mascara).head(3)
+    return urls + [top_causas_df.to_dict('records')]
+
+# Carga en el navegador de cada figura (miniaturas y vistas principales) desde su URL (assets/figuras.js).
+for _, component_id, preview_id, _, _ in vistas_graficos.values():
+    for graph_id in (component_id, preview_id):
+        app.clientside_callback(ClientsideFunction('figuras', 'cargar'),
+                                Output(graph_id, 'figure'), Input(f'fuente-{graph_id}', 'data'))
+etapas_arranque.terminar('servidor')
+etapas_arranque.total()
+
 # ========== EJECUCIÓN DE LA APLICACIÓN ==========
 if __name__ == '__main__':
     # Ejecutar el servidor Dash. 'debug=True' es útil para desarrollo.
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
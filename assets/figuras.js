@@ -0,0 +1,18 @@
+// assets/figuras.js - Carga de figuras ya serializadas desde el servidor.
+// Los dcc.Store 'fuente-*' guardan la URL de la figura (según la vista y los filtros);
+// el navegador la pide a /figuras/<vista>.json, que responde desde la caché del servidor.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    figuras: {
+        cargar: function (url) {
+            if (!url) {
+                return window.dash_clientside.no_update;
+            }
+            return fetch(url).then(function (respuesta) {
+                if (!respuesta.ok) {
+                    throw new Error('No se pudo cargar la figura: ' + url);
+                }
+                return respuesta.json();
+            });
+        }
+    }
+});
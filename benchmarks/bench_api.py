@@ -0,0 +1,105 @@
+"""Latencia y rendimiento de la API de agregados (``/api/aggregates``).
+
+Importa app.py y, con consultas aleatorias (una o dos dimensiones y algunos
+filtros), mide con el cliente de pruebas de Flask:
+
+- ``GET`` sin caché (suma del cubo y serialización) y desde la caché;
+- ``GET`` condicional con ``If-None-Match`` (respuesta 304);
+- ``POST`` por lotes, en JSON y en Arrow, expresado en consultas por minuto;
+- bytes de cada formato sin comprimir y con gzip.
+
+Se ejecuta desde la raíz::
+
+    python benchmarks/bench_api.py --consultas 500 --lote 100
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from urllib.parse import urlencode
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(RAIZ)
+
+import api  # noqa: E402
+import app  # noqa: E402
+from estadisticas import percentiles  # noqa: E402
+
+DIMENSIONES = ['anio', 'departamento', 'municipio', 'mes', 'sexo', 'edad']
+
+
+def consulta_aleatoria(generador):
+    consulta = {'dim': ','.join(generador.sample(DIMENSIONES, generador.randint(1, 2)))}
+    opciones = {'departamento': app.opciones_departamento, 'mes': app.opciones_mes, 'sexo': app.opciones_sexo,
+                'edad': app.opciones_edad, 'anio': app.opciones_anio}
+    for nombre in generador.sample([n for n, o in opciones.items() if o], generador.randint(0, 2)):
+        valores = generador.sample(opciones[nombre], generador.randint(1, min(3, len(opciones[nombre]))))
+        consulta[nombre] = ','.join(str(o['value']) for o in valores)
+    if generador.random() < 0.2:
+        consulta['causa'] = generador.choice(['X95', 'X85-Y09', 'I20-I25'])
+    return consulta
+
+
+def medir(peticion):
+    inicio = time.perf_counter()
+    respuesta = peticion()
+    return (time.perf_counter() - inicio) * 1000, respuesta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--consultas', type=int, default=500)
+    parser.add_argument('--lote', type=int, default=100)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    if app.cubo is None:
+        sys.exit('No hay datos cargados para consultar la API.')
+
+    generador = random.Random(args.semilla)
+    consultas = [consulta_aleatoria(generador) for _ in range(args.consultas)]
+    cliente = app.server.test_client()
+    tiempos = {'get_sin_cache': [], 'get_cache': [], 'get_304': []}
+    tamanos = {formato: {'bytes': 0, 'bytes_gzip': 0} for formato in api.FORMATOS}
+
+    for consulta in consultas:
+        for formato in api.FORMATOS:
+            url = '/api/aggregates?' + urlencode(dict(consulta, formato=formato))
+            duracion, respuesta = medir(lambda: cliente.get(url))
+            assert respuesta.status_code == 200, (url, respuesta.data)
+            entrada = app.api_agregados.respuesta(app.api_agregados.normalizar(dict(consulta)), formato)
+            tamanos[formato]['bytes'] += len(entrada.json)
+            tamanos[formato]['bytes_gzip'] += len(entrada.gzip)
+            if formato == 'json':
+                tiempos['get_sin_cache'].append(duracion)
+                tiempos['get_cache'].append(medir(lambda: cliente.get(url, headers={'Accept-Encoding': 'gzip'}))[0])
+                etag = respuesta.headers['ETag']
+                duracion, respuesta = medir(lambda: cliente.get(url, headers={'If-None-Match': etag}))
+                assert respuesta.status_code == 304
+                tiempos['get_304'].append(duracion)
+
+    # Los lotes se miden con la caché vacía, como los pediría un cliente nuevo.
+    lotes = {}
+    for formato in api.FORMATOS:
+        app.api_agregados.respuestas.limpiar()
+        inicio = time.perf_counter()
+        for i in range(0, len(consultas), args.lote):
+            cuerpo = {'formato': formato, 'consultas': consultas[i:i + args.lote]}
+            respuesta = cliente.post('/api/aggregates', data=json.dumps(cuerpo), content_type='application/json',
+                                     headers={'Accept-Encoding': 'gzip'})
+            assert respuesta.status_code == 200, respuesta.data
+        duracion = time.perf_counter() - inicio
+        lotes[formato] = {'tamano_lote': args.lote, 'segundos': round(duracion, 3),
+                          'consultas_por_minuto': round(len(consultas) / duracion * 60)}
+
+    resultado = {'celdas_cubo': len(app.cubo), 'consultas': len(consultas),
+                 'latencia_get': {nombre: percentiles(valores) for nombre, valores in tiempos.items()},
+                 'lotes_post': lotes, 'bytes_totales': tamanos, 'cache': app.api_agregados.respuestas.estadisticas()}
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == '__main__':
+    main()
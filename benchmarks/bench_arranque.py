@@ -0,0 +1,82 @@
+"""Compara la lectura de los Excel de la carpeta de datos con la de su caché Parquet.
+
+Para cada archivo que lee app.py (Anexo 1, 2 y 3) mide solo la carga del
+conjunto:
+
+- ``excel``: ``pd.read_excel`` sobre el archivo de origen;
+- ``cache``: ``datos.cargar_excel`` con la caché vigente (lee los Parquet);
+- ``cache_primera_carga_s``: construir la caché desde el Excel.
+
+No incluye el resto del arranque (geometría, conjunto preprocesado, figuras),
+que también usa cachés propias y se mide en ``bench_carga.py``. Se ejecuta
+desde la raíz del repositorio::
+
+    python benchmarks/bench_arranque.py --repeticiones 3
+
+Con ``MORTALIDAD_DATOS`` se puede apuntar a otra carpeta de datos.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
+
+import datos  # noqa: E402
+
+# Archivo -> hoja, como los lee datos.py.
+ARCHIVOS = {datos.ARCHIVO_MORTALIDAD: datos.HOJA_MORTALIDAD, datos.ARCHIVO_CODIGOS: None,
+            datos.ARCHIVO_DIVIPOLA: 0}
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def resumen(tiempos):
+    return {'mediana_s': round(statistics.median(tiempos), 3), 'min_s': round(min(tiempos), 3),
+            'max_s': round(max(tiempos), 3), 'muestras': len(tiempos)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+    if datos.CACHE_DESACTIVADA:
+        sys.exit('MORTALIDAD_SIN_CACHE está activo: la caché no se puede medir.')
+
+    resultado = {}
+    for nombre, hoja in ARCHIVOS.items():
+        ruta = datos.ruta_datos(nombre)
+        if not os.path.exists(ruta):
+            continue
+        excel = medir(lambda: pd.read_excel(ruta, sheet_name=hoja), args.repeticiones)
+        inicio = time.perf_counter()
+        datos.construir_cache(nombre, sheet_name=hoja)
+        construccion = time.perf_counter() - inicio
+        cache = medir(lambda: datos.cargar_excel(nombre, sheet_name=hoja), args.repeticiones)
+        resultado[nombre] = {'excel': resumen(excel), 'cache_primera_carga_s': round(construccion, 3),
+                             'cache': resumen(cache),
+                             'aceleracion': round(statistics.median(excel) / statistics.median(cache), 2)}
+    if not resultado:
+        sys.exit(f'No hay archivos de datos en {datos.DIRECTORIO_DATOS}.')
+    excel_total = sum(r['excel']['mediana_s'] for r in resultado.values())
+    cache_total = sum(r['cache']['mediana_s'] for r in resultado.values())
+    resultado['total'] = {'excel_s': round(excel_total, 3), 'cache_s': round(cache_total, 3),
+                          'aceleracion': round(excel_total / cache_total, 2) if cache_total else None}
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,397 @@
+"""Suite de carga: arranque, memoria y latencia por ruta con 1x, 10x y 50x los datos de 2019.
+
+Para cada escala genera (una sola vez, con semilla fija) archivos sintéticos
+de ``sinteticos.py`` con ``escala`` años de ``FILAS_POR_ANIO`` defunciones
+cada uno, los ingiere en una caché nueva y mide lo de abajo. Las escalas
+crecen en años, no en densidad: 1x es solo 2019, 10x es 2010-2019 y 50x es
+1970-2019, así que los números de 10x y 50x no son de un único año con más
+defunciones (el filtro de año, por ejemplo, selecciona una fracción menor).
+
+- ``ingesta``: tiempo y RSS máximo de ``ingesta.py`` (particiones y cubo);
+- ``arranque``: importar app.py en un proceso nuevo (primera vez y mediana de
+  las siguientes), RSS máximo, duración de cada etapa del arranque y de cada
+  agregado del preprocesamiento (``calcular_*``, índices y rankings);
+- ``carga``: Gunicorn en local con ``gunicorn.conf.py`` y varios clientes
+  concurrentes que recorren todas las rutas con filtros al azar. Por ruta se
+  informan los percentiles de ``display_page`` (el callback de Dash) y de la
+  figura que el navegador pide después (``/figuras/<vista>.json``), además de
+  peticiones por segundo, errores y la memoria del master y de los workers.
+
+El resultado es un JSON con el commit, para comparar dos ejecuciones::
+
+    python benchmarks/bench_carga.py --escalas 1,10,50 --salida carga.json
+    python benchmarks/bench_carga.py --escalas 1,10 --comparar carga.json
+
+Con ``--comparar`` se listan los tiempos y memorias que empeoraron más que
+``--tolerancia`` y el proceso termina con código 1 si hay alguno. Las dos
+ejecuciones deben usar los mismos parámetros (se informan los que difieren).
+"""
+import argparse
+import concurrent.futures
+import gzip
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from urllib.parse import urlencode
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datos  # noqa: E402
+import memoria  # noqa: E402
+import sinteticos  # noqa: E402
+from bench_memoria_workers import esperar_servidor  # noqa: E402
+from estadisticas import percentiles  # noqa: E402
+
+ESCALAS = [1, 10, 50]
+ULTIMO_ANIO = 2019
+RUTAS = ['/mapa', '/mes', '/violencia', '/menos', '/causas', '/edad', '/sexo', '/tendencia']
+AGREGADOS = ['calcular_df_mapa', 'calcular_muertes_mes', 'calcular_tendencia', 'calcular_top_violentas',
+             'calcular_menos_muertes', 'calcular_top_causas', 'calcular_edad', 'calcular_sexo_dep']
+# Archivos de la carpeta de datos que necesita cada escenario (el Anexo 1 lo reemplazan las particiones).
+ARCHIVOS_DATOS = [datos.ARCHIVO_CODIGOS, datos.ARCHIVO_DIVIPOLA, datos.ARCHIVO_GEOJSON]
+# Filtros del dashboard: id del dropdown y dimensión de la API con sus valores.
+FILTROS = {'filtro-departamento': 'departamento', 'filtro-mes': 'mes', 'filtro-sexo': 'sexo',
+           'filtro-edad': 'edad', 'filtro-anio': 'anio'}
+# Diferencia mínima para contar una regresión, según la unidad de la métrica. Los máximos de latencia
+# (una sola petición) y el tiempo de generar los archivos no se comparan.
+DIFERENCIA_MINIMA = {'_ms': 1.0, '_s': 0.05, '_mb': 5.0}
+NO_COMPARADAS = ('max_ms', 'generacion_s')
+
+
+# ========== MEDICIONES EN UN PROCESO NUEVO ==========
+def medir_en_proceso(modo, entorno, argumentos=()):
+    """Ejecuta un modo de este script en un proceso nuevo y devuelve su JSON y su tiempo total."""
+    inicio = time.perf_counter()
+    salida = subprocess.run([sys.executable, os.path.abspath(__file__), '--medir', modo, *argumentos],
+                            cwd=RAIZ, env=entorno, check=True, capture_output=True, text=True).stdout
+    resultado = json.loads(salida.strip().splitlines()[-1])
+    resultado['proceso_s'] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+def medir_ingesta(rutas):
+    import historico
+    import ingesta
+
+    inicio = time.perf_counter()
+    filas = sum(sum(anios.values()) for anios in ingesta.ingerir(rutas, forzar=True).values())
+    particiones_s = time.perf_counter() - inicio
+    cubo = historico.actualizar()
+    return {'filas': filas, 'particiones_s': round(particiones_s, 3),
+            'cubo_s': round(time.perf_counter() - inicio - particiones_s, 3), 'celdas_cubo': len(cubo)}
+
+
+def medir_arranque(repeticiones):
+    inicio = time.perf_counter()
+    import app
+    importacion = time.perf_counter() - inicio
+    import consultas
+    import metricas
+    import rankings
+
+    funciones = {nombre: getattr(app, nombre) for nombre in AGREGADOS}
+    funciones['indice_filtros'] = lambda: consultas.IndiceFiltros(app.cubo)
+    funciones['ranking_municipios'] = lambda: rankings.RankingMunicipios(app.cubo, app.divipola)
+    funciones['ranking_homicidios'] = lambda: rankings.RankingMunicipios(app.cubo, app.divipola,
+                                                                         seleccion=app.homicidios_celdas)
+    agregados = {}
+    for nombre, funcion in funciones.items():
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        agregados[f'{nombre}_ms'] = round(statistics.median(tiempos), 2)
+    return {'importacion_s': round(importacion, 3), 'celdas_cubo': len(app.cubo),
+            'registros': int(app.cubo.conteos.sum()),
+            'etapas': {f'{clave[0]}_s': valor for clave, valor in metricas.ARRANQUE.valores.items()},
+            'agregados': agregados}
+
+
+def medir(modo, argumentos):
+    resultado = medir_ingesta(argumentos) if modo == 'ingesta' else medir_arranque(int(argumentos[0]))
+    # En Linux ru_maxrss está en KiB.
+    resultado['rss_max_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    print(json.dumps(resultado))
+
+
+# ========== ESCENARIOS ==========
+def preparar_escenario(escala, directorio, semilla, regenerar):
+    """Carpeta de datos, archivos anuales y caché vacía de una escala; devuelve el entorno y las rutas."""
+    carpeta_datos = os.path.join(directorio, 'datos')
+    carpeta_anual = os.path.join(directorio, 'anual')
+    os.makedirs(carpeta_datos, exist_ok=True)
+    for nombre in ARCHIVOS_DATOS:
+        destino = os.path.join(carpeta_datos, nombre)
+        if not os.path.lexists(destino):
+            os.symlink(os.path.abspath(datos.ruta_datos(nombre)), destino)
+
+    # Los archivos generados se reutilizan mientras no cambien los parámetros.
+    anios = list(range(ULTIMO_ANIO - escala + 1, ULTIMO_ANIO + 1))
+    parametros = {'anios': anios, 'filas': sinteticos.FILAS_POR_ANIO, 'semilla': semilla}
+    ruta_parametros = os.path.join(carpeta_anual, 'parametros.json')
+    generacion = 0.0
+    try:
+        with open(ruta_parametros, encoding='utf-8') as f:
+            vigentes = json.load(f) == parametros
+    except (OSError, ValueError):
+        vigentes = False
+    if regenerar or not vigentes:
+        shutil.rmtree(carpeta_anual, ignore_errors=True)
+        inicio = time.perf_counter()
+        sinteticos.generar_anios(anios, sinteticos.FILAS_POR_ANIO, carpeta_anual, 'csv', semilla)
+        generacion = time.perf_counter() - inicio
+        with open(ruta_parametros, 'w', encoding='utf-8') as f:
+            json.dump(parametros, f)
+    rutas = [os.path.join(carpeta_anual, f'NoFetal{anio}.csv') for anio in anios]
+
+    # La caché se reconstruye en cada ejecución para medir la ingesta completa.
+    cache = os.path.join(directorio, 'cache')
+    shutil.rmtree(cache, ignore_errors=True)
+    entorno = dict(os.environ, MORTALIDAD_DATOS=carpeta_datos, MORTALIDAD_CACHE=cache,
+                   MORTALIDAD_ANUAL=carpeta_anual)
+    entorno.pop('MORTALIDAD_METRICAS_DIR', None)
+    return entorno, rutas, {'anios': len(anios), 'filas': len(anios) * sinteticos.FILAS_POR_ANIO,
+                            'generacion_s': round(generacion, 2)}
+
+
+# ========== CARGA CONCURRENTE CONTRA GUNICORN ==========
+def _pedir(url, cuerpo=None):
+    """Tiempo (ms) y cuerpo (descomprimido) de una petición; lanza una excepción si no responde 200."""
+    cabeceras = {'Accept-Encoding': 'gzip'}
+    if cuerpo is not None:
+        cabeceras['Content-Type'] = 'application/json'
+        cuerpo = json.dumps(cuerpo).encode('utf-8')
+    inicio = time.perf_counter()
+    with urllib.request.urlopen(urllib.request.Request(url, data=cuerpo, headers=cabeceras), timeout=60) as respuesta:
+        contenido = respuesta.read()
+        comprimido = respuesta.headers.get('Content-Encoding') == 'gzip'
+    duracion = (time.perf_counter() - inicio) * 1000
+    return duracion, gzip.decompress(contenido) if comprimido else contenido
+
+
+def opciones_filtros(base):
+    """Valores de cada filtro según los datos cargados (desde la API de agregados)."""
+    opciones = {}
+    for componente, dimension in FILTROS.items():
+        documento = json.loads(_pedir(f'{base}/api/aggregates?' + urlencode({'dim': dimension}))[1])
+        opciones[componente] = documento['datos'][dimension]
+    return opciones
+
+
+def peticion_display_page(ruta, filtros):
+    """Cuerpo de la petición que hace Dash al cambiar la URL (callback ``display_page``)."""
+    entradas = [{'id': 'url', 'property': 'pathname', 'value': ruta}]
+    entradas += [{'id': componente, 'property': 'value', 'value': filtros.get(componente)} for componente in FILTROS]
+    return {'output': 'page-content.children', 'outputs': {'id': 'page-content', 'property': 'children'},
+            'inputs': entradas, 'changedPropIds': ['url.pathname'], 'state': []}
+
+
+def url_figura(respuesta):
+    """URL de la figura principal dentro de la respuesta de ``display_page`` (None en /causas)."""
+    pendientes = [json.loads(respuesta)]
+    while pendientes:
+        valor = pendientes.pop()
+        if isinstance(valor, dict):
+            pendientes.extend(valor.values())
+        elif isinstance(valor, list):
+            pendientes.extend(valor)
+        elif isinstance(valor, str) and valor.startswith('/figuras/'):
+            return valor
+    return None
+
+
+def visitas(opciones, peticiones, sin_filtros, semilla):
+    """Lista mezclada de (ruta, filtros): ``peticiones`` por ruta, una parte sin filtros."""
+    generador = random.Random(semilla)
+    disponibles = [c for c, valores in opciones.items() if valores]
+    resultado = []
+    for ruta in RUTAS:
+        for _ in range(peticiones):
+            filtros = {}
+            if disponibles and generador.random() >= sin_filtros:
+                for componente in generador.sample(disponibles, generador.randint(1, len(disponibles))):
+                    valores = opciones[componente]
+                    filtros[componente] = generador.sample(valores, generador.randint(1, min(3, len(valores))))
+            resultado.append((ruta, filtros))
+    generador.shuffle(resultado)
+    return resultado
+
+
+def medir_carga(entorno, args):
+    comando = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{args.puerto}']
+    if args.workers:
+        comando += ['-w', str(args.workers)]
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(comando + ['app:server'], cwd=RAIZ, env=entorno,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{args.puerto}'
+    try:
+        esperar_servidor(base + '/', proceso, args.timeout)
+        listo = time.perf_counter() - inicio
+        opciones = opciones_filtros(base)
+        tiempos = {ruta: {'display_page': [], 'figura': []} for ruta in RUTAS}
+        errores = []
+        bloqueo = threading.Lock()
+
+        def visitar(ruta, filtros):
+            try:
+                duracion, respuesta = _pedir(base + '/_dash-update-component', peticion_display_page(ruta, filtros))
+                figura = url_figura(respuesta)
+                duracion_figura = _pedir(base + figura)[0] if figura else None
+            except Exception as e:  # noqa: BLE001 (se cuentan todos los fallos)
+                with bloqueo:
+                    errores.append(f'{ruta}: {e}')
+                return
+            with bloqueo:
+                tiempos[ruta]['display_page'].append(duracion)
+                if duracion_figura is not None:
+                    tiempos[ruta]['figura'].append(duracion_figura)
+
+        lista = visitas(opciones, args.peticiones, args.sin_filtros, args.semilla)
+        inicio = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(args.concurrencia) as clientes:
+            list(clientes.map(lambda visita: visitar(*visita), lista))
+        duracion = time.perf_counter() - inicio
+
+        trabajadores = memoria.procesos_hijos(proceso.pid)
+        memoria_workers = [dict(memoria.reporte_memoria(pid), pico_rss_mb=memoria.pico_rss(pid)) for pid in trabajadores]
+        memoria_master = dict(memoria.reporte_memoria(proceso.pid), pico_rss_mb=memoria.pico_rss(proceso.pid))
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+
+    return {
+        'workers': len(trabajadores), 'concurrencia': args.concurrencia, 'listo_s': round(listo, 2),
+        'visitas': len(lista), 'visitas_por_segundo': round(len(lista) / duracion, 1),
+        'errores': len(errores), 'ejemplos_errores': errores[:5],
+        'rutas': {ruta: {nombre: percentiles(valores) for nombre, valores in medidas.items() if valores}
+                  for ruta, medidas in tiempos.items()},
+        'memoria': {'master': memoria_master, 'workers': memoria_workers,
+                    'pss_total_mb': round(memoria_master.get('pss_mb', 0)
+                                          + sum(w.get('pss_mb', 0) for w in memoria_workers), 1),
+                    'pico_rss_worker_mb': max((w['pico_rss_mb'] or 0 for w in memoria_workers), default=0)},
+    }
+
+
+def medir_escala(escala, args):
+    directorio = os.path.join(args.trabajo, f'x{escala}')
+    entorno, rutas, resultado = preparar_escenario(escala, directorio, args.semilla, args.regenerar)
+    print(f'x{escala}: {resultado["filas"]} filas en {len(rutas)} archivos', file=sys.stderr)
+    resultado['ingesta'] = medir_en_proceso('ingesta', entorno, rutas)
+    # La primera importación construye las cachés de la carpeta (geometría, catálogos en Parquet).
+    resultado['arranque'] = {'primera': medir_en_proceso('arranque', entorno, [str(args.repeticiones)])}
+    siguientes = [medir_en_proceso('arranque', entorno, [str(args.repeticiones)]) for _ in range(args.arranques)]
+    resultado['arranque'].update({
+        'mediana_proceso_s': round(statistics.median(s['proceso_s'] for s in siguientes), 3),
+        'mediana_importacion_s': round(statistics.median(s['importacion_s'] for s in siguientes), 3),
+        'rss_max_mb': max(s['rss_max_mb'] for s in siguientes),
+        'etapas': siguientes[-1]['etapas'],
+        'agregados': {nombre: round(statistics.median(s['agregados'][nombre] for s in siguientes), 2)
+                      for nombre in siguientes[-1]['agregados']},
+    })
+    print(f'x{escala}: ingesta y arranque medidos; carga con {args.concurrencia} clientes', file=sys.stderr)
+    resultado['carga'] = medir_carga(entorno, args)
+    return resultado
+
+
+# ========== COMPARACIÓN ENTRE EJECUCIONES ==========
+def _aplanar(valor, prefijo=''):
+    if isinstance(valor, dict):
+        for clave, interno in valor.items():
+            yield from _aplanar(interno, f'{prefijo}.{clave}' if prefijo else str(clave))
+    elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        yield prefijo, valor
+
+
+def regresiones(anterior, actual, tolerancia):
+    """Tiempos (``_ms``, ``_s``) y memorias (``_mb``) que crecieron más que ``tolerancia`` (fracción)."""
+    previos = dict(_aplanar(anterior.get('escalas', {})))
+    resultado = []
+    for clave, valor in _aplanar(actual['escalas']):
+        sufijo = next((s for s in DIFERENCIA_MINIMA if clave.endswith(s)), None)
+        if sufijo is None or clave not in previos or clave.endswith(NO_COMPARADAS):
+            continue
+        antes = previos[clave]
+        if valor > antes * (1 + tolerancia) and valor - antes >= DIFERENCIA_MINIMA[sufijo]:
+            resultado.append({'metrica': clave, 'anterior': antes, 'actual': valor,
+                              'cambio': round(valor / antes - 1, 3) if antes else None})
+    return resultado
+
+
+def version():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=RAIZ, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'cpus': os.cpu_count()}
+
+
+def lista_escalas(texto):
+    return [int(e) for e in texto.split(',') if e.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--escalas', type=lista_escalas, default=ESCALAS, help='años sintéticos hasta 2019, p. ej. 1,10,50')
+    parser.add_argument('--trabajo', default=os.path.join(tempfile.gettempdir(), 'mortalidad-carga'),
+                        help='carpeta de los escenarios (los archivos generados se reutilizan)')
+    parser.add_argument('--regenerar', action='store_true', help='volver a generar los archivos sintéticos')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--arranques', type=int, default=3, help='importaciones de app.py después de la primera')
+    parser.add_argument('--repeticiones', type=int, default=5, help='repeticiones de cada agregado')
+    parser.add_argument('--workers', type=int, default=0, help='workers de Gunicorn (0 = gunicorn.conf.py)')
+    parser.add_argument('--concurrencia', type=int, default=8, help='clientes simultáneos')
+    parser.add_argument('--peticiones', type=int, default=50, help='visitas por ruta')
+    parser.add_argument('--sin-filtros', type=float, default=0.2, help='fracción de visitas sin filtros')
+    parser.add_argument('--puerto', type=int, default=8766)
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--salida', help='archivo donde guardar el JSON (además de imprimirlo)')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior')
+    parser.add_argument('--tolerancia', type=float, default=0.20, help='aumento relativo permitido')
+    parser.add_argument('--medir', help=argparse.SUPPRESS)
+    args, extra = parser.parse_known_args()
+    if args.medir:
+        os.chdir(RAIZ)
+        medir(args.medir, extra)
+        return
+    if extra:
+        parser.error(f"argumentos no reconocidos: {' '.join(extra)}")
+
+    os.chdir(RAIZ)
+    resultado = {'version': version(), 'parametros': {k: v for k, v in vars(args).items()
+                                                      if k not in ('medir', 'salida', 'comparar')},
+                 'escalas': {f'x{escala}': medir_escala(escala, args) for escala in args.escalas}}
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        # Las latencias solo son comparables con los mismos parámetros de carga.
+        distintos = sorted(k for k, v in resultado['parametros'].items() if anterior.get('parametros', {}).get(k) != v)
+        resultado['comparacion'] = {'commit_anterior': anterior.get('version', {}).get('commit'),
+                                    'parametros_distintos': distintos,
+                                    'regresiones': regresiones(anterior, resultado, args.tolerancia)}
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    print(texto)
+    if args.comparar and resultado['comparacion']['regresiones']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Selección de grupos de causas CIE-10: ``str.startswith`` frente al índice de ``causas``.
+
+Con registros sintéticos (``sinteticos.py``) y el catálogo del Anexo 2 mide,
+para los homicidios con arma de fuego (``X95``) y para todas las agresiones
+(``X85``-``Y09``):
+
+- ``registros_texto``: ``str.startswith`` sobre la columna de texto de los
+  registros (el camino original del gráfico de homicidios);
+- ``registros_categoria``: lo mismo sobre la columna categórica;
+- ``cubo_texto``: ``str.startswith`` sobre las categorías del cubo y expansión
+  a las celdas;
+- ``cubo_indice``: el camino actual, dos comparaciones sobre los
+  identificadores enteros de grupo y expansión a las celdas.
+
+Para el rango de agresiones, ``startswith`` recibe la tupla de los grupos del
+rango. Se comprueba que todos los caminos seleccionen las mismas defunciones.
+
+Se ejecuta desde la raíz::
+
+    python benchmarks/bench_causas.py --filas 250000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(RAIZ)
+
+import causas  # noqa: E402
+import datos  # noqa: E402
+import sinteticos  # noqa: E402
+from agregados import CuboMortalidad  # noqa: E402
+
+SELECCIONES = {'homicidios_X95': causas.HOMICIDIOS_ARMA_FUEGO, 'agresiones_X85_Y09': causas.AGRESIONES}
+
+
+def cronometrar(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return resultado, round(float(np.median(tiempos)), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=sinteticos.FILAS_POR_ANIO)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    registros = sinteticos.generar_registros(args.filas, 2019)
+    texto = registros['COD_MUERTE'].astype(str)
+    categoria = texto.astype('category')
+    cubo = CuboMortalidad.desde_registros(registros.assign(COD_MUERTE=categoria))
+
+    inicio = time.perf_counter()
+    indice = causas.IndiceCausas.desde_anexo(datos.cargar_codigos_muerte())
+    construccion_ms = (time.perf_counter() - inicio) * 1000
+    codigos_cubo = cubo.categorias['COD_MUERTE'].astype(str)
+    grupos_cubo, clasificacion_ms = cronometrar(lambda: indice.ids_grupo(codigos_cubo), args.repeticiones)
+
+    resultado = {'filas': args.filas, 'celdas_cubo': len(cubo), 'codigos_catalogo': len(indice),
+                 'grupos_catalogo': len(indice.grupos), 'construccion_indice_ms': round(construccion_ms, 1),
+                 'clasificacion_codigos_cubo_ms': clasificacion_ms, 'selecciones': {}}
+    for nombre, (desde, hasta) in SELECCIONES.items():
+        prefijos = tuple(indice.grupos[slice(*indice.rango(desde, hasta))])
+        caminos = {
+            'registros_texto': lambda: texto.str.startswith(prefijos).to_numpy(),
+            'registros_categoria': lambda: categoria.str.startswith(prefijos).to_numpy(dtype=bool),
+            'cubo_texto': lambda: cubo.mascara_categorias('COD_MUERTE', codigos_cubo.str.startswith(prefijos)),
+            'cubo_indice': lambda: cubo.mascara_categorias('COD_MUERTE', indice.seleccion(grupos_cubo, desde, hasta)),
+        }
+        medicion, defunciones = {}, set()
+        for camino, funcion in caminos.items():
+            mascara, medicion[camino] = cronometrar(funcion, args.repeticiones)
+            defunciones.add(int(mascara.sum() if camino.startswith('registros') else cubo.conteos[mascara].sum()))
+        assert len(defunciones) == 1, (nombre, defunciones)
+        medicion['defunciones'] = defunciones.pop()
+        medicion['aceleracion_frente_a_registros_texto'] = round(
+            medicion['registros_texto'] / max(medicion['cubo_indice'], 1e-3), 1)
+        resultado['selecciones'][nombre] = {'grupos': len(prefijos), 'mediana_ms': medicion}
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == '__main__':
+    main()
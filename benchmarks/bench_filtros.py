@@ -0,0 +1,97 @@
+"""Latencia de los callbacks y de las figuras al cambiar los filtros cruzados.
+
+Importa app.py y, para combinaciones aleatorias de filtros, mide:
+
+- ``display_page`` (cada ruta) y ``actualizar_previews``, incluida la
+  serialización a JSON que hace Dash antes de responder;
+- la petición de cada figura a ``/figuras/<vista>.json``, primero sin caché
+  (se construye y serializa) y luego desde la caché.
+
+Se ejecuta desde la raíz::
+
+    python benchmarks/bench_filtros.py --consultas 200
+
+El objetivo es un p95 menor a 100 ms por cambio de filtro.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from plotly.io.json import to_json_plotly
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(RAIZ)
+
+import app  # noqa: E402
+from estadisticas import percentiles  # noqa: E402
+
+OBJETIVO_P95_MS = 100
+RUTAS = list(app.vistas_graficos) + ['/causas']
+
+
+def filtros_aleatorios(generador):
+    """Entre uno y cinco filtros activos, cada uno con algunos valores al azar."""
+    opciones = {'departamentos': app.opciones_departamento, 'meses': app.opciones_mes,
+                'sexos': app.opciones_sexo, 'grupos_edad': app.opciones_edad, 'anios': app.opciones_anio}
+    disponibles = [k for k, v in opciones.items() if v]
+    activos = generador.sample(disponibles, generador.randint(1, len(disponibles)))
+    return {k: [o['value'] for o in generador.sample(opciones[k], generador.randint(1, min(3, len(opciones[k]))))]
+            for k in activos}
+
+
+def medir(funcion, *args, **kwargs):
+    inicio = time.perf_counter()
+    to_json_plotly(funcion(*args, **kwargs))
+    return (time.perf_counter() - inicio) * 1000
+
+
+def medir_peticion(cliente, url):
+    inicio = time.perf_counter()
+    respuesta = cliente.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert respuesta.status_code == 200, url
+    return (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--consultas', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    if app.indice_filtros is None:
+        sys.exit('No hay datos de mortalidad cargados; no se puede medir el filtrado.')
+
+    generador = random.Random(args.semilla)
+    cliente = app.server.test_client()
+    app.figuras_serializadas.limpiar()
+    tiempos = {ruta: [] for ruta in RUTAS}
+    tiempos['previews'] = []
+    figuras = {f'{tipo}:{ruta}:{estado}': [] for ruta in app.vistas_graficos
+               for tipo in ('principal', 'preview') for estado in ('sin_cache', 'con_cache')}
+    for _ in range(args.consultas):
+        filtros = filtros_aleatorios(generador)
+        tiempos['previews'].append(medir(app.actualizar_previews, **filtros))
+        for ruta in RUTAS:
+            tiempos[ruta].append(medir(app.display_page, ruta, **filtros))
+        normalizados = app.normalizar_filtros(**filtros)
+        for ruta in app.vistas_graficos:
+            for tipo in ('principal', 'preview'):
+                url = app.url_figura(ruta, tipo, normalizados)
+                figuras[f'{tipo}:{ruta}:sin_cache'].append(medir_peticion(cliente, url))
+                figuras[f'{tipo}:{ruta}:con_cache'].append(medir_peticion(cliente, url))
+
+    resultado = {'celdas_cubo': len(app.cubo), 'registros': int(app.cubo.conteos.sum()),
+                 'callbacks': {nombre: percentiles(t) for nombre, t in tiempos.items()},
+                 'figuras': {nombre: percentiles(t) for nombre, t in figuras.items()},
+                 'cache_figuras': app.figuras_serializadas.estadisticas()}
+    resultado['cumple_objetivo_p95'] = all(r['p95_ms'] < OBJETIVO_P95_MS for grupo in ('callbacks', 'figuras')
+                                           for r in resultado[grupo].values())
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Tamaño de la geometría del mapa y de sus figuras, antes y después de simplificarla.
+
+Compara el GeoJSON original incrustado en cada figura del mapa con las
+variantes simplificadas y cuantizadas de ``geometria`` servidas aparte:
+
+- bytes (sin comprimir y con gzip) y vértices de cada nivel;
+- bytes y tiempo de serialización de la miniatura y de la vista principal
+  del mapa, con la geometría incrustada y con la URL;
+- bytes que descarga el navegador al abrir ``/mapa`` por primera vez.
+
+El tiempo de dibujo en el navegador no se puede medir sin un navegador; crece
+con el número de vértices que plotly.js proyecta y convierte en trazados SVG,
+por eso se informa la reducción de vértices como aproximación.
+
+Se ejecuta desde la raíz::
+
+    python benchmarks/bench_geometria.py
+"""
+import argparse
+import copy
+import gzip
+import json
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
+
+from plotly.io.json import to_json_plotly  # noqa: E402
+
+import datos  # noqa: E402
+import geometria  # noqa: E402
+
+
+def tamanos(cuerpo):
+    return {'bytes': len(cuerpo), 'bytes_gzip': len(gzip.compress(cuerpo, compresslevel=6))}
+
+
+def serializar_figura(figura, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        cuerpo = to_json_plotly(figura).encode('utf-8')
+    return dict(tamanos(cuerpo), serializacion_ms=round((time.perf_counter() - inicio) * 1000 / repeticiones, 3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    original = datos.cargar_geojson()
+    cuerpo_original = geometria.serializar(original)
+    resultado = {'original': dict(tamanos(cuerpo_original), vertices=geometria.vertices(original)), 'niveles': {}}
+    for nivel, (rejilla, tolerancia) in geometria.NIVELES.items():
+        inicio = time.perf_counter()
+        simplificado = geometria.simplificar(original, rejilla, tolerancia)
+        duracion = (time.perf_counter() - inicio) * 1000
+        resultado['niveles'][nivel] = dict(tamanos(geometria.serializar(simplificado)), rejilla=rejilla,
+                                           tolerancia=tolerancia, vertices=geometria.vertices(simplificado),
+                                           reduccion_vertices=round(1 - geometria.vertices(simplificado)
+                                                                    / geometria.vertices(original), 4),
+                                           simplificacion_ms=round(duracion, 1))
+
+    import app  # Se importa aquí para no contar su carga en los tiempos anteriores.
+
+    figuras = {}
+    for tipo, figura in (('miniatura', app.figuras_preview['/mapa']), ('principal', app.figuras_principales['/mapa'])):
+        incrustada = copy.deepcopy(figura)
+        incrustada['data'][0]['geojson'] = original
+        figuras[tipo] = {'incrustada': serializar_figura(incrustada, args.repeticiones),
+                         'con_url': serializar_figura(figura, args.repeticiones)}
+    resultado['figuras_mapa'] = figuras
+
+    # Primera visita a /mapa: antes, la geometría completa viajaba en la miniatura y otra vez en la
+    # vista principal; ahora cada figura lleva una URL y cada nivel se descarga una sola vez.
+    antes = sum(f['incrustada']['bytes_gzip'] for f in figuras.values())
+    despues = (sum(f['con_url']['bytes_gzip'] for f in figuras.values())
+               + sum(n['bytes_gzip'] for n in resultado['niveles'].values()))
+    resultado['primera_visita_mapa_gzip'] = {'antes': antes, 'despues': despues,
+                                             'ahorro': round(1 - despues / antes, 4)}
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == '__main__':
+    main()
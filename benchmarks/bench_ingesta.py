@@ -0,0 +1,86 @@
+"""Pico de memoria y tiempo de la ingesta por bloques según el número de años.
+
+Genera archivos sintéticos de un año cada uno (``sinteticos.py``) y, para
+1, 3 y 9 años, mide en un proceso nuevo:
+
+- ``bloques``: la ingesta de ``ingesta.py`` (bloques y particiones Parquet);
+- ``completa``: leer cada archivo entero con pandas, preprocesarlo y
+  concatenarlo, como haría el camino de ``pd.read_excel`` con varios años.
+
+Se informa el RSS máximo del proceso (``ru_maxrss``). Con la ingesta por
+bloques debe mantenerse casi constante al crecer el número de años.
+
+Se ejecuta desde la raíz::
+
+    python benchmarks/bench_ingesta.py --filas 250000 --formato csv
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import sinteticos  # noqa: E402
+
+PASOS = [1, 3, 9]
+
+
+def medir_en_proceso(modo, rutas, cache):
+    """Ejecuta un modo en un proceso nuevo y devuelve su tiempo y su RSS máximo."""
+    entorno = dict(os.environ, MORTALIDAD_CACHE=cache)
+    salida = subprocess.run([sys.executable, os.path.abspath(__file__), '--medir', modo] + rutas,
+                            cwd=RAIZ, env=entorno, check=True, capture_output=True, text=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def medir(modo, rutas):
+    import datos
+    import ingesta
+
+    inicio = time.perf_counter()
+    if modo == 'bloques':
+        filas = sum(sum(anios.values()) for anios in ingesta.ingerir(rutas, forzar=True).values())
+    else:
+        import pandas as pd
+        divipola = datos.cargar_divipola()
+        leer = lambda r: pd.read_csv(r) if r.endswith('.csv') else pd.read_excel(r)  # noqa: E731
+        filas = len(pd.concat([datos.preprocesar_mortalidad(leer(r), divipola) for r in rutas]))
+    duracion = time.perf_counter() - inicio
+    # En Linux ru_maxrss está en KiB.
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'filas': filas, 'tiempo_s': round(duracion, 2), 'rss_max_mb': round(pico, 1)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=sinteticos.FILAS_POR_ANIO, help='filas por año')
+    parser.add_argument('--formato', choices=['csv', 'xlsx'], default='csv')
+    parser.add_argument('--pasos', type=lambda t: [int(n) for n in t.split(',')], default=PASOS,
+                        help='números de años a medir, p. ej. 1,3,9')
+    parser.add_argument('--medir', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.medir:
+        return medir(args.medir[0], args.medir[1:])
+
+    resultado = {'filas_por_anio': args.filas, 'formato': args.formato, 'mediciones': {}}
+    with tempfile.TemporaryDirectory() as temporal:
+        anios = list(range(2015, 2015 + max(args.pasos)))
+        rutas = sinteticos.generar_anios(anios, args.filas, os.path.join(temporal, 'anual'), args.formato)
+        for n in args.pasos:
+            resultado['mediciones'][n] = {
+                modo: medir_en_proceso(modo, rutas[:n], os.path.join(temporal, f'cache_{modo}_{n}'))
+                for modo in ('bloques', 'completa')}
+    bloques = [m['bloques']['rss_max_mb'] for m in resultado['mediciones'].values()]
+    resultado['crecimiento_rss_bloques_mb'] = round(max(bloques) - min(bloques), 1)
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == '__main__':
+    main()
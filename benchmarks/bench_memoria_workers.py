@@ -0,0 +1,88 @@
+"""Memoria por worker de Gunicorn según el modo de carga de los datos.
+
+Levanta Gunicorn en local con cada configuración, espera a que los workers
+respondan y lee RSS/PSS/USS de cada proceso. Se ejecuta desde la raíz::
+
+    python benchmarks/bench_memoria_workers.py --workers 4
+
+Configuraciones comparadas:
+
+- ``memoria``: cada worker importa app.py y preprocesa su propia copia (sin preload).
+- ``mmap``: la configuración de despliegue (gunicorn.conf.py), con preload y
+  el conjunto preprocesado mapeado en memoria.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import memoria  # noqa: E402
+
+
+def esperar_servidor(url, proceso, timeout):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError('Gunicorn terminó antes de quedar listo')
+        try:
+            urllib.request.urlopen(url, timeout=5).read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f'{url} no respondió en {timeout} s')
+
+
+def medir(modo, archivo_config, workers, puerto, timeout):
+    entorno = dict(os.environ, MORTALIDAD_MODO_CARGA=modo)
+    comando = [sys.executable, '-m', 'gunicorn', '-c', archivo_config, '-w', str(workers),
+               '-b', f'127.0.0.1:{puerto}', 'app:server']
+    proceso = subprocess.Popen(comando, cwd=RAIZ, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f'http://127.0.0.1:{puerto}/'
+        esperar_servidor(url, proceso, timeout)
+        # Esperar a que todos los workers hayan cargado la app y repartir algunas peticiones.
+        while len(memoria.procesos_hijos(proceso.pid)) < workers:
+            time.sleep(0.5)
+        time.sleep(2)
+        for _ in range(workers * 4):
+            urllib.request.urlopen(url + '_dash-layout', timeout=30).read()
+        trabajadores = [memoria.reporte_memoria(pid) for pid in memoria.procesos_hijos(proceso.pid)]
+        master = memoria.reporte_memoria(proceso.pid)
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+
+    pss_total = master.get('pss_mb', 0) + sum(t.get('pss_mb', 0) for t in trabajadores)
+    uss_medio = sum(t.get('uss_mb', 0) for t in trabajadores) / max(len(trabajadores), 1)
+    return {'master': master, 'workers': trabajadores, 'pss_total_mb': round(pss_total, 1),
+            'uss_medio_worker_mb': round(uss_medio, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as sin_preload:
+        sin_preload.write('')
+    try:
+        resultado = {
+            'memoria': medir('memoria', sin_preload.name, args.workers, args.puerto, args.timeout),
+            'mmap': medir('mmap', os.path.join(RAIZ, 'gunicorn.conf.py'), args.workers, args.puerto, args.timeout),
+        }
+    finally:
+        os.unlink(sin_preload.name)
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Rankings de municipios: ``groupby`` + ``sort_values().head()`` frente a ``rankings``.
+
+Importa app.py y, para combinaciones aleatorias de filtros, mide el top 5 de
+homicidios y los 10 municipios con menos defunciones:
+
+- ``ordenando``: el camino anterior, totales del cubo por nombre de municipio
+  y orden completo de la tabla;
+- ``seleccion_parcial``: ``RankingMunicipios`` (``bincount`` por municipio y
+  ``argpartition``).
+
+También informa cuántos municipios sin defunciones y cuántos empates en el
+último puesto quedaban fuera de la tabla ordenada.
+
+Se ejecuta desde la raíz (con ``MORTALIDAD_CACHE`` apuntando a una caché con
+varios años para medir el caso grande)::
+
+    python benchmarks/bench_rankings.py --consultas 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(RAIZ)
+
+import app  # noqa: E402
+from bench_filtros import filtros_aleatorios  # noqa: E402
+from estadisticas import percentiles  # noqa: E402
+
+
+def ordenando(mascara, departamentos=None):
+    # El orden completo solo ve los municipios con celdas bajo la máscara: no necesita el filtro de departamento.
+    homicidios = app.homicidios_celdas if mascara is None else app.homicidios_celdas & mascara
+    violentas = app.cubo.totales(['MUNICIPIO'], mascara=homicidios, nombre='Homicidios')
+    violentas = violentas.sort_values(by='Homicidios', ascending=False).head(5)
+    menos = app.cubo.totales(['MUNICIPIO'], mascara=mascara).sort_values(by='Total').head(10)
+    return violentas, menos
+
+
+def seleccion_parcial(mascara, departamentos=None):
+    return (app.ranking_homicidios.mayores(5, mascara, nombre='Homicidios', departamentos=departamentos),
+            app.ranking_municipios.menores(10, mascara, minimo=1, departamentos=departamentos))
+
+
+def medir(funcion, mascara, departamentos):
+    inicio = time.perf_counter()
+    funcion(mascara, departamentos)
+    return (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--consultas', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    if app.ranking_municipios is None or app.ranking_homicidios is None:
+        sys.exit('No hay datos cargados para calcular los rankings.')
+
+    generador = random.Random(args.semilla)
+    # Cada consulta lleva su máscara y el filtro de departamento, que acota el universo de municipios.
+    consultas = [(None, None)]
+    for _ in range(args.consultas):
+        filtros = filtros_aleatorios(generador)
+        consultas.append((app.mascara_filtros(**filtros), filtros.get('departamentos')))
+    tiempos = {nombre: [] for nombre in ('ordenando', 'seleccion_parcial')}
+    sin_defunciones, empates_fuera = [], []
+    for mascara, departamentos in consultas:
+        tiempos['ordenando'].append(medir(ordenando, mascara, departamentos))
+        tiempos['seleccion_parcial'].append(medir(seleccion_parcial, mascara, departamentos))
+        sin_defunciones.append(app.ranking_municipios.sin_defunciones(mascara, departamentos=departamentos))
+        menores = app.ranking_municipios.menores(10, mascara, minimo=1, departamentos=departamentos)
+        if len(menores):
+            ultimo = menores.iloc[-1]
+            empates_fuera.append(int(ultimo['EMPATES'] - (menores['Total'] == ultimo['Total']).sum() + 1))
+
+    resultado = {
+        'celdas_cubo': len(app.cubo), 'municipios': len(app.ranking_municipios), 'consultas': len(consultas),
+        'latencia': {nombre: percentiles(valores) for nombre, valores in tiempos.items()},
+        'municipios_sin_defunciones': {'sin_filtros': sin_defunciones[0],
+                                       'mediana_con_filtros': float(np.median(sin_defunciones[1:]))},
+        'empates_fuera_del_top_10_menores': {'mediana': float(np.median(empates_fuera)) if empates_fuera else 0},
+    }
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == '__main__':
+    main()
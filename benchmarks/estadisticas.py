@@ -0,0 +1,12 @@
+"""Resúmenes de latencia que comparten los benchmarks."""
+import numpy as np
+
+
+def percentiles(tiempos):
+    """p50, p95, p99 y máximo (en ms) de una lista de tiempos en milisegundos."""
+    if not tiempos:
+        return {'muestras': 0}
+    return {'p50_ms': round(float(np.percentile(tiempos, 50)), 2),
+            'p95_ms': round(float(np.percentile(tiempos, 95)), 2),
+            'p99_ms': round(float(np.percentile(tiempos, 99)), 2),
+            'max_ms': round(max(tiempos), 2), 'muestras': len(tiempos)}
@@ -0,0 +1,179 @@
+"""Archivos sintéticos con el formato del Anexo 1 (defunciones no fetales) para los benchmarks.
+
+Los municipios y los códigos CIE-10 se toman de DIVIPOLA (Anexo 3) y del
+catálogo de causas (Anexo 2) de la carpeta de datos, así que los archivos se
+pueden ingerir y unir como los reales. Si el Anexo 1 real está en la carpeta
+de datos, cada año se genera remuestreando sus registros (con reemplazo), de
+modo que municipios, causas, edades y meses conservan su distribución
+conjunta. Si no está, las frecuencias se aproximan:
+
+- municipios: ley de Zipf con las ciudades más pobladas primero, después las
+  demás capitales de departamento (código de municipio 001) y el resto;
+- causas: la participación aproximada de cada capítulo CIE-10 en las
+  defunciones del país (circulatorias, tumores, respiratorias...), repartida
+  dentro del capítulo con una ley de Zipf, y un 4,5 % de homicidios con arma de
+  fuego (X95).
+
+Uso como script::
+
+    python benchmarks/sinteticos.py --filas 250000 --anios 2015-2023 --destino /tmp/anual
+"""
+import argparse
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import datos  # noqa: E402
+
+# Tamaño aproximado de una publicación anual del DANE.
+FILAS_POR_ANIO = 250_000
+PATRON_CODIGO = re.compile(r'^[A-Z]\d{3}$')
+COLUMNAS = ['COD_DANE', 'COD_DEPARTAMENTO', 'COD_MUNICIPIO', 'AÑO', 'MES', 'SEXO', 'GRUPO_EDAD1', 'COD_MUERTE']
+# Participación aproximada de cada capítulo CIE-10 (primera letra del código) en las defunciones no
+# fetales; las letras que no aparecen se reparten el resto.
+PARTICIPACION_CAPITULOS = {'I': 0.30, 'C': 0.19, 'J': 0.11, 'E': 0.05, 'K': 0.04, 'N': 0.03, 'R': 0.03,
+                           'V': 0.03, 'A': 0.02, 'D': 0.02, 'G': 0.02, 'W': 0.02, 'X': 0.02, 'B': 0.01,
+                           'F': 0.01, 'P': 0.01, 'Q': 0.01, 'Y': 0.01}
+PARTICIPACION_HOMICIDIOS = 0.045
+EXPONENTE_ZIPF = 1.1
+# Ciudades más pobladas (censo 2018), de mayor a menor: Bogotá, Medellín, Cali, Barranquilla, Cartagena,
+# Cúcuta, Soacha, Soledad, Bucaramanga, Bello, Villavicencio, Ibagué, Santa Marta, Valledupar...
+CIUDADES_PRINCIPALES = (11001, 5001, 76001, 8001, 13001, 54001, 25754, 8758, 68001, 5088, 50001, 73001,
+                        47001, 20001, 17001, 66001, 23001, 52001)
+
+
+def catalogos():
+    """Municipios de DIVIPOLA y códigos CIE-10 de cuatro caracteres del Anexo 2."""
+    divipola = datos.cargar_divipola()[['COD_DANE', 'COD_DEPARTAMENTO', 'COD_MUNICIPIO']]
+    codigos = pd.concat(datos.cargar_codigos_muerte().values()).astype(str).stack()
+    codigos = np.unique([c.strip() for c in codigos if PATRON_CODIGO.match(c.strip())] + ['X959'])
+    return divipola, codigos
+
+
+def registros_reales():
+    """Registros del Anexo 1 de la carpeta de datos (columnas del generador), o None si no está."""
+    if not os.path.exists(datos.ruta_datos(datos.ARCHIVO_MORTALIDAD)):
+        return None
+    registros = datos.cargar_mortalidad()
+    faltantes = set(COLUMNAS) - set(registros.columns)
+    return None if faltantes else registros[COLUMNAS].astype({'COD_MUERTE': str})
+
+
+def _zipf(rangos):
+    pesos = 1.0 / np.asarray(rangos, dtype=float) ** EXPONENTE_ZIPF
+    return pesos / pesos.sum()
+
+
+def pesos_municipios(divipola):
+    """Probabilidad de cada municipio: Zipf con las ciudades principales, las capitales y el resto, en ese orden."""
+    codigos = divipola['COD_DANE'].to_numpy()
+    principal = pd.Series(codigos).map({c: i for i, c in enumerate(CIUDADES_PRINCIPALES)})
+    principal = principal.fillna(len(CIUDADES_PRINCIPALES)).to_numpy()
+    capital = divipola['COD_MUNICIPIO'].to_numpy() == 1
+    orden = np.lexsort((codigos, ~capital, principal))
+    pesos = np.empty(len(divipola))
+    pesos[orden] = _zipf(np.arange(1, len(divipola) + 1))
+    return pesos
+
+
+def pesos_causas(codigos):
+    """Probabilidad de cada código: la participación de su capítulo repartida con una ley de Zipf.
+
+    El orden de los códigos dentro del capítulo es una permutación fija, así
+    que los más frecuentes son los mismos en todos los años.
+    """
+    letras = np.array([c[0] for c in codigos])
+    homicidio = np.array([c.startswith('X95') for c in codigos])
+    otras = sorted(set(letras) - set(PARTICIPACION_CAPITULOS))
+    resto = max(1 - sum(PARTICIPACION_CAPITULOS.values()) - PARTICIPACION_HOMICIDIOS, 0)
+    permutacion = np.random.default_rng(0).permutation(len(codigos))
+    pesos = np.zeros(len(codigos))
+    for letra in set(letras):
+        indices = np.flatnonzero((letras == letra) & ~homicidio)
+        if len(indices):
+            participacion = PARTICIPACION_CAPITULOS.get(letra, resto / max(len(otras), 1))
+            rangos = np.argsort(np.argsort(permutacion[indices])) + 1
+            pesos[indices] = participacion * _zipf(rangos)
+    pesos[homicidio] = PARTICIPACION_HOMICIDIOS / max(homicidio.sum(), 1)
+    return pesos / pesos.sum()
+
+
+def generar_registros(filas, anio, semilla=0, catalogo=None, muestra=None):
+    """DataFrame con ``filas`` defunciones del año ``anio`` y las columnas del Anexo 1.
+
+    Con ``muestra`` (p. ej. ``registros_reales()``) las filas se remuestrean de
+    esos registros; si no, se generan con las frecuencias aproximadas.
+    """
+    generador = np.random.default_rng([semilla, anio])
+    if muestra is not None and len(muestra):
+        registros = muestra.iloc[generador.integers(0, len(muestra), filas)].reset_index(drop=True)
+        return registros.assign(**{'AÑO': anio})[COLUMNAS]
+    divipola, codigos = catalogo if catalogo is not None else catalogos()
+    municipio = generador.choice(len(divipola), filas, p=pesos_municipios(divipola))
+    causa = generador.choice(codigos, filas, p=pesos_causas(codigos))
+    edades = np.arange(29)
+    pesos_edad = np.exp(edades / 8.0)
+    return pd.DataFrame({
+        'COD_DANE': divipola['COD_DANE'].to_numpy()[municipio],
+        'COD_DEPARTAMENTO': divipola['COD_DEPARTAMENTO'].to_numpy()[municipio],
+        'COD_MUNICIPIO': divipola['COD_MUNICIPIO'].to_numpy()[municipio],
+        'AÑO': anio,
+        'MES': generador.integers(1, 13, filas),
+        'SEXO': generador.choice([1, 2, 3], filas, p=[0.55, 0.44, 0.01]),
+        'GRUPO_EDAD1': generador.choice(edades, filas, p=pesos_edad / pesos_edad.sum()),
+        'COD_MUERTE': causa,
+    })
+
+
+def escribir(df, ruta):
+    """Guarda en CSV o Excel según la extensión (la hoja se llama como en el Anexo 1)."""
+    if ruta.endswith('.csv'):
+        df.to_csv(ruta, index=False)
+    else:
+        anio = int(df['AÑO'].iloc[0]) if len(df) else 0
+        df.to_excel(ruta, sheet_name=f'No_Fetales_{anio}', index=False)
+    return ruta
+
+
+def generar_anios(anios, filas, destino, formato='csv', semilla=0, remuestrear=True):
+    """Un archivo por año en ``destino``; devuelve sus rutas.
+
+    Con ``remuestrear`` se parte del Anexo 1 real si está en la carpeta de datos.
+    """
+    os.makedirs(destino, exist_ok=True)
+    catalogo = catalogos()
+    muestra = registros_reales() if remuestrear else None
+    return [escribir(generar_registros(filas, anio, semilla, catalogo, muestra),
+                     os.path.join(destino, f'NoFetal{anio}.{formato}')) for anio in anios]
+
+
+def rango_anios(texto):
+    inicio, _, fin = texto.partition('-')
+    return list(range(int(inicio), int(fin or inicio) + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=FILAS_POR_ANIO, help='filas por año')
+    parser.add_argument('--anios', type=rango_anios, default=rango_anios('2019'), help='p. ej. 2015-2023')
+    parser.add_argument('--formato', choices=['csv', 'xlsx'], default='csv')
+    parser.add_argument('--destino', required=True)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--sin-remuestreo', action='store_true',
+                        help='usar las frecuencias aproximadas aunque esté el Anexo 1 real')
+    args = parser.parse_args()
+    destino = os.path.abspath(args.destino)
+    os.chdir(RAIZ)
+    for ruta in generar_anios(args.anios, args.filas, destino, args.formato, args.semilla,
+                              remuestrear=not args.sin_remuestreo):
+        print(ruta)
+
+
+if __name__ == '__main__':
+    main()
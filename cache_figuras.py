@@ -0,0 +1,140 @@
+"""Caché de figuras ya serializadas a JSON (y comprimidas) para servirlas sin recalcular.
+
+Cada figura se identifica por su vista, el tipo (miniatura o vista principal)
+y el estado de los filtros. La primera petición la construye y la serializa;
+las siguientes devuelven los mismos bytes. Las entradas menos usadas se
+descartan cuando se supera la capacidad (LRU).
+
+Los cuerpos se guardan también comprimidos con gzip y, si está instalado el
+paquete ``brotli``, con brotli; ``responder`` elige según ``Accept-Encoding``.
+"""
+import collections
+import gzip
+import hashlib
+import os
+import threading
+import time
+
+from flask import Response
+from plotly.io.json import to_json_plotly
+
+import metricas
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin brotli se sirve gzip.
+    brotli = None
+
+CAPACIDAD_POR_DEFECTO = int(os.environ.get('MORTALIDAD_CACHE_FIGURAS', 256))
+# Calidad de brotli: las figuras filtradas se comprimen al pedirlas, así que se prefiere rapidez.
+CALIDAD_BROTLI = 5
+
+# Cuerpo (JSON u otro formato), el mismo cuerpo comprimido con gzip y con brotli (o None), su ETag
+# y su tipo MIME.
+FiguraSerializada = collections.namedtuple('FiguraSerializada', ['json', 'gzip', 'etag', 'brotli', 'mimetype'],
+                                           defaults=(None, 'application/json'))
+
+
+def entrada_serializada(cuerpo, comprimir=True, mimetype='application/json'):
+    """Entrada lista para ``responder`` a partir de bytes ya serializados."""
+    comprimido = gzip.compress(cuerpo, compresslevel=6) if comprimir else None
+    comprimido_br = brotli.compress(cuerpo, quality=CALIDAD_BROTLI) if comprimir and brotli is not None else None
+    return FiguraSerializada(cuerpo, comprimido, '"%s"' % hashlib.sha1(cuerpo).hexdigest()[:20],
+                             comprimido_br, mimetype)
+
+
+class CacheFiguras:
+    """Caché LRU de figuras serializadas, con contadores de aciertos y fallos.
+
+    ``nombre`` identifica la caché en las métricas (``metricas.py``).
+    """
+
+    def __init__(self, capacidad=CAPACIDAD_POR_DEFECTO, comprimir=True, nombre='figuras'):
+        self.nombre = nombre
+        self.capacidad = capacidad
+        self.comprimir = comprimir
+        self._entradas = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.descartes = 0
+
+    def serializar(self, figura):
+        return entrada_serializada(to_json_plotly(figura).encode('utf-8'), self.comprimir)
+
+    def obtener(self, clave, construir, serializar=None):
+        """Entrada de ``clave``; si no está, se construye con ``construir()`` y se guarda.
+
+        ``serializar`` convierte lo construido en una entrada (por defecto, una
+        figura a JSON); sirve para guardar otros contenidos en la misma caché.
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada
+            self.fallos += 1
+
+        # Se construye fuera del lock: dos peticiones simultáneas pueden construir la misma figura,
+        # pero ninguna bloquea a las que piden figuras ya guardadas.
+        inicio = time.perf_counter()
+        entrada = (serializar or self.serializar)(construir())
+        metricas.CONSTRUCCION_CACHE.observar(time.perf_counter() - inicio, cache=self.nombre)
+        with self._lock:
+            self._entradas[clave] = entrada
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+                self.descartes += 1
+        return entrada
+
+    def buscar(self, clave):
+        """Entrada de ``clave`` si ya está guardada (None si no); no construye ni guarda nada."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+            return entrada
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._entradas),
+                'capacidad': self.capacidad,
+                'bytes_json': sum(len(e.json) for e in self._entradas.values()),
+                'bytes_gzip': sum(len(e.gzip) for e in self._entradas.values() if e.gzip is not None),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'descartes': self.descartes,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else None,
+            }
+
+
+def _acepta(peticion, codificacion):
+    return peticion.accept_encodings[codificacion] > 0
+
+
+def responder(entrada, peticion, max_age=300, inmutable=False):
+    """Respuesta HTTP para una figura: 304 si el ETag coincide y brotli o gzip si el cliente los acepta.
+
+    Con ``inmutable`` el navegador no vuelve a validar la respuesta mientras
+    no expire; se usa para recursos cuya URL cambia cuando cambia el contenido.
+    """
+    control = f'public, max-age={max_age}' + (', immutable' if inmutable else '')
+    encabezados = {'ETag': entrada.etag, 'Cache-Control': control, 'Vary': 'Accept-Encoding'}
+    if entrada.etag in peticion.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=encabezados)
+    if entrada.brotli is not None and _acepta(peticion, 'br'):
+        encabezados['Content-Encoding'] = 'br'
+        return Response(entrada.brotli, mimetype=entrada.mimetype, headers=encabezados)
+    if entrada.gzip is not None and _acepta(peticion, 'gzip'):
+        encabezados['Content-Encoding'] = 'gzip'
+        return Response(entrada.gzip, mimetype=entrada.mimetype, headers=encabezados)
+    return Response(entrada.json, mimetype=entrada.mimetype, headers=encabezados)
@@ -0,0 +1,125 @@
+"""Índice de la jerarquía de causas CIE-10 del catálogo del DANE (Anexo 2).
+
+El catálogo tiene tres niveles: capítulo (1-22), grupo de tres caracteres
+(p. ej. ``X95``, agresión con disparo de armas de fuego) y código de cuatro
+caracteres (``X954``). El índice guarda cada nivel como un arreglo ordenado y
+da a cada código, grupo y capítulo un identificador entero. Como el orden de
+los códigos CIE-10 coincide con su orden alfabético, un rango de grupos como
+las agresiones ``X85``-``Y09`` es un intervalo contiguo de identificadores: se
+selecciona con dos comparaciones de enteros en lugar de comparar textos.
+
+Los códigos de los registros que no están en el catálogo se clasifican por sus
+tres primeros caracteres; si tampoco está el grupo, quedan con -1.
+"""
+import numpy as np
+import pandas as pd
+
+HOJA_CATALOGO = 'Final'
+# Encabezados del Anexo 2 y nombres con los que se usan aquí.
+COLUMNAS_CATALOGO = {
+    'Capítulo': 'CAPITULO',
+    'Nombre capítulo': 'NOMBRE_CAPITULO',
+    'Código de la CIE-10 tres caracteres': 'GRUPO',
+    'Descripción  de códigos mortalidad a tres caracteres': 'DESCRIPCION_GRUPO',
+    'Código de la CIE-10 cuatro caracteres': 'CODIGO',
+    'Descripcion  de códigos mortalidad a cuatro caracteres': 'DESCRIPCION',
+}
+LONGITUD_GRUPO = 3
+# Grupos de causas que usa el dashboard (inclusive en ambos extremos).
+HOMICIDIOS_ARMA_FUEGO = ('X95', 'X95')
+AGRESIONES = ('X85', 'Y09')
+
+
+def _texto(serie):
+    return serie.astype(str).str.strip()
+
+
+def catalogo(hojas):
+    """Tabla del catálogo con las columnas de ``COLUMNAS_CATALOGO``, una fila por código de cuatro caracteres.
+
+    ``hojas`` es el resultado de ``datos.cargar_codigos_muerte()``. Las filas
+    de título que preceden al encabezado se descartan.
+    """
+    hoja = hojas[HOJA_CATALOGO]
+    encabezado = hoja.index[hoja.iloc[:, 0].astype(str).str.strip() == 'Capítulo']
+    if len(encabezado) == 0:
+        raise ValueError(f"No se encontró el encabezado 'Capítulo' en la hoja {HOJA_CATALOGO!r} del Anexo 2")
+    inicio = hoja.index.get_loc(encabezado[0])
+    tabla = hoja.iloc[inicio + 1:].copy()
+    tabla.columns = [COLUMNAS_CATALOGO.get(str(c).strip(), str(c).strip()) for c in hoja.iloc[inicio]]
+    tabla = tabla[list(COLUMNAS_CATALOGO.values())].dropna(subset=['CODIGO', 'GRUPO'])
+    for columna in ('GRUPO', 'CODIGO', 'NOMBRE_CAPITULO', 'DESCRIPCION_GRUPO', 'DESCRIPCION'):
+        tabla[columna] = _texto(tabla[columna])
+    tabla['CAPITULO'] = pd.to_numeric(tabla['CAPITULO'], errors='coerce').fillna(-1).astype(np.int16)
+    return tabla.drop_duplicates('CODIGO').sort_values('CODIGO').reset_index(drop=True)
+
+
+class IndiceCausas:
+    """Códigos, grupos y capítulos CIE-10 como arreglos ordenados con identificadores enteros.
+
+    ``codigos`` y ``grupos`` están ordenados; ``grupo_codigo[i]`` es el
+    identificador del grupo del código ``i`` y ``capitulo_grupo[g]`` el capítulo
+    del grupo ``g``.
+    """
+
+    def __init__(self, tabla):
+        self.codigos = tabla['CODIGO'].to_numpy(dtype=str)
+        self.descripciones = tabla['DESCRIPCION'].to_numpy(dtype=object)
+        grupos = tabla.drop_duplicates('GRUPO').sort_values('GRUPO')
+        self.grupos = grupos['GRUPO'].to_numpy(dtype=str)
+        self.descripciones_grupo = grupos['DESCRIPCION_GRUPO'].to_numpy(dtype=object)
+        self.capitulo_grupo = grupos['CAPITULO'].to_numpy()
+        self.nombres_capitulo = dict(zip(tabla['CAPITULO'], tabla['NOMBRE_CAPITULO']))
+        self.grupo_codigo = np.searchsorted(self.grupos, tabla['GRUPO'].to_numpy(dtype=str)).astype(np.int16)
+
+    @classmethod
+    def desde_anexo(cls, hojas):
+        """Índice a partir de las hojas del Anexo 2 (``datos.cargar_codigos_muerte()``)."""
+        return cls(catalogo(hojas))
+
+    def __len__(self):
+        return len(self.codigos)
+
+    @staticmethod
+    def _buscar(ordenados, valores):
+        """Posición de cada valor en el arreglo ordenado, o -1 si no está."""
+        posiciones = np.searchsorted(ordenados, valores)
+        encontrados = posiciones < len(ordenados)
+        encontrados[encontrados] = ordenados[posiciones[encontrados]] == valores[encontrados]
+        return np.where(encontrados, posiciones, -1)
+
+    def ids_codigo(self, codigos):
+        """Identificador de cada código de cuatro caracteres (-1 si no está en el catálogo)."""
+        return self._buscar(self.codigos, np.asarray(codigos, dtype=str))
+
+    def ids_grupo(self, codigos):
+        """Identificador del grupo de tres caracteres de cada código (-1 si el grupo no existe)."""
+        codigos = np.asarray(codigos, dtype=str)
+        por_codigo = self.ids_codigo(codigos)
+        grupos = np.where(por_codigo >= 0, self.grupo_codigo[por_codigo],
+                          self._buscar(self.grupos, codigos.astype(f'<U{LONGITUD_GRUPO}')))
+        return grupos.astype(np.int16)
+
+    def ids_capitulo(self, codigos):
+        """Capítulo (1-22) de cada código (-1 si el grupo no existe)."""
+        grupos = self.ids_grupo(codigos)
+        return np.where(grupos >= 0, np.append(self.capitulo_grupo, -1)[grupos], -1)
+
+    def rango(self, desde, hasta=None):
+        """Intervalo ``[inicio, fin)`` de identificadores de los grupos entre ``desde`` y ``hasta`` (inclusive)."""
+        inicio = int(np.searchsorted(self.grupos, desde, side='left'))
+        fin = int(np.searchsorted(self.grupos, hasta or desde, side='right'))
+        return inicio, max(inicio, fin)
+
+    def seleccion(self, ids_grupo, desde, hasta=None):
+        """Máscara de los identificadores de grupo que caen en el rango ``desde``-``hasta``."""
+        inicio, fin = self.rango(desde, hasta)
+        return (ids_grupo >= inicio) & (ids_grupo < fin)
+
+    def describir(self, codigos):
+        """Descripción de cada código: la del código de cuatro caracteres o, si no está, la de su grupo."""
+        codigos = np.asarray(codigos, dtype=str)
+        por_codigo = self.ids_codigo(codigos)
+        por_grupo = self.ids_grupo(codigos)
+        descripcion = np.where(por_grupo >= 0, np.append(self.descripciones_grupo, '')[por_grupo], '')
+        return np.where(por_codigo >= 0, np.append(self.descripciones, '')[por_codigo], descripcion)
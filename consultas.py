@@ -0,0 +1,55 @@
+"""Capa de consultas para el filtrado cruzado del dashboard.
+
+Los filtros (departamento, mes, sexo, grupo de edad, año) se resuelven sobre las
+celdas del cubo de ``agregados``, no sobre los registros. Para cada dimensión
+filtrable se precomputa un índice invertido: las posiciones de las celdas
+ordenadas por código y el tramo que ocupa cada categoría. Seleccionar valores
+es entonces tomar tramos contiguos de ese arreglo, sin comparar celda por celda.
+"""
+import numpy as np
+
+DIMENSIONES_FILTRO = ['COD_DEPARTAMENTO', 'MES', 'SEXO', 'GRUPO_EDAD1', 'AÑO']
+
+
+class IndiceFiltros:
+    """Índices invertidos por dimensión sobre las celdas de un ``CuboMortalidad``."""
+
+    def __init__(self, cubo, dimensiones=DIMENSIONES_FILTRO):
+        self.cubo = cubo
+        self._indices = {}
+        for dim in dimensiones:
+            if dim not in cubo.codigos:
+                continue
+            codigos = cubo.codigos[dim]
+            orden = np.argsort(codigos, kind='stable').astype(np.int32)
+            # limites[c + 1]:limites[c + 2] es el tramo de 'orden' con el código c (-1 = faltante).
+            limites = np.searchsorted(codigos[orden], np.arange(-1, len(cubo.categorias[dim]) + 1))
+            self._indices[dim] = (orden, limites)
+
+    @property
+    def dimensiones(self):
+        return list(self._indices)
+
+    def celdas(self, dimension, valores):
+        """Posiciones de las celdas cuya categoría en ``dimension`` está entre ``valores``."""
+        orden, limites = self._indices[dimension]
+        codigos = self.cubo.categorias[dimension].get_indexer(list(valores))
+        tramos = [orden[limites[c + 1]:limites[c + 2]] for c in codigos if c >= 0]
+        return np.concatenate(tramos) if tramos else np.empty(0, dtype=np.int32)
+
+    def filtrar(self, filtros):
+        """Máscara de las celdas que cumplen todos los filtros.
+
+        ``filtros`` asocia cada dimensión con la lista de valores aceptados; las
+        listas vacías o ``None`` no filtran. Devuelve ``None`` si no hay ningún
+        filtro activo, para que quien llama pueda usar los datos sin filtrar.
+        """
+        activos = [(dim, valores) for dim, valores in filtros.items() if valores and dim in self._indices]
+        if not activos:
+            return None
+        mascara = np.ones(len(self.cubo), dtype=bool)
+        for dim, valores in activos:
+            seleccion = np.zeros(len(self.cubo), dtype=bool)
+            seleccion[self.celdas(dim, valores)] = True
+            mascara &= seleccion
+        return mascara
@@ -0,0 +1,421 @@
+"""Carga de los archivos de datos del dashboard con caché columnar en disco.
+
+Leer los libros de Excel con openpyxl es lento (decenas de segundos para el
+Anexo 1) y cada worker de Gunicorn lo repetía al importar ``app.py``. Este
+módulo convierte cada libro una sola vez a Parquet, con tipos categóricos en
+las columnas de códigos, y en las siguientes cargas lee directamente el
+Parquet. La caché se invalida sola cuando cambia el archivo de origen.
+
+Además, el conjunto ya preprocesado (códigos normalizados y nombres de
+DIVIPOLA unidos) puede materializarse como archivo Arrow IPC sin compresión.
+En el modo de carga ``mmap`` cada worker lo mapea en memoria y construye el
+DataFrame sin copiar los datos, de modo que todos los procesos comparten las
+mismas páginas del archivo.
+
+Los polígonos de los departamentos se simplifican y cuantizan (módulo
+``geometria``) en varios niveles de detalle, que también se guardan en la
+caché listos para enviar al navegador.
+
+Uso como etapa de ingesta (por ejemplo en el *Build Command* del despliegue)::
+
+    python datos.py
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+import geometria
+
+# ========== RUTAS Y CONFIGURACIÓN ==========
+# La carpeta de datos y la de caché se pueden cambiar con variables de entorno.
+DIRECTORIO_DATOS = os.environ.get('MORTALIDAD_DATOS', 'data')
+DIRECTORIO_CACHE = os.environ.get('MORTALIDAD_CACHE', os.path.join(DIRECTORIO_DATOS, 'cache'))
+# Con MORTALIDAD_SIN_CACHE=1 se leen siempre los Excel (útil para comparar tiempos).
+CACHE_DESACTIVADA = os.environ.get('MORTALIDAD_SIN_CACHE', '') not in ('', '0')
+# 'memoria': cada proceso preprocesa y guarda su propia copia del conjunto.
+# 'mmap': se mapea en memoria el conjunto preprocesado, compartido entre workers.
+MODO_CARGA = os.environ.get('MORTALIDAD_MODO_CARGA', 'memoria')
+
+ARCHIVO_MORTALIDAD = 'Anexo1.NoFetal2019_CE_15-03-23.xlsx'
+HOJA_MORTALIDAD = 'No_Fetales_2019'
+ARCHIVO_CODIGOS = 'Anexo2.CodigosDeMuerte_CE_15-03-23.xlsx'
+ARCHIVO_DIVIPOLA = 'Anexo3.Divipola_CE_15-03-23.xlsx'
+ARCHIVO_GEOJSON = 'departamentos_colombia__plotly.geojson'
+
+# Columnas de códigos que se guardan como categóricas en la caché.
+COLUMNAS_CATEGORICAS = ['COD_DEPARTAMENTO', 'COD_DANE', 'COD_MUERTE', 'SEXO', 'GRUPO_EDAD1']
+# Columnas de texto del conjunto preprocesado; como categóricas no quedan objetos 'str' por fila.
+COLUMNAS_TEXTO_PREPROCESADAS = ['COD_DEPARTAMENTO', 'COD_DANE', 'MUNICIPIO', 'DEPARTAMENTO']
+
+# Ancho de los códigos DIVIPOLA normalizados y columnas que se toman de DIVIPOLA.
+ANCHO_CODIGOS = {'COD_DEPARTAMENTO': 2, 'COD_DANE': 5}
+COLUMNAS_DIVIPOLA = ['MUNICIPIO', 'DEPARTAMENTO']
+
+ARCHIVO_PREPROCESADO = 'mortalidad_preprocesada.arrow'
+
+# Se incrementa cuando cambia el formato de la caché para forzar su reconstrucción.
+VERSION_CACHE = 2
+
+
+def ruta_datos(nombre_archivo):
+    """Devuelve la ruta de un archivo dentro de la carpeta de datos."""
+    return os.path.join(DIRECTORIO_DATOS, nombre_archivo)
+
+
+# ========== HUELLA DEL ARCHIVO DE ORIGEN ==========
+def _hash_archivo(ruta):
+    h = hashlib.sha1()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def huella_archivo(ruta):
+    """Tamaño, fecha de modificación y hash SHA-1 del archivo de origen."""
+    st = os.stat(ruta)  # Lanza FileNotFoundError con 'filename' si no existe.
+    return {'tamano': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha1': _hash_archivo(ruta)}
+
+
+def _huella_vigente(ruta, huella):
+    """Indica si una huella guardada corresponde al archivo de origen actual.
+
+    Primero se compara tamaño y fecha de modificación (barato). Si la fecha
+    cambió pero el tamaño coincide, se compara el hash para no reconstruir la
+    caché cuando el archivo solo fue copiado o "tocado".
+    """
+    st = os.stat(ruta)
+    if huella.get('tamano') != st.st_size:
+        return False
+    if huella.get('mtime_ns') == st.st_mtime_ns:
+        return True
+    return huella.get('sha1') == _hash_archivo(ruta)
+
+
+def _cache_vigente(ruta, meta):
+    """Indica si los metadatos de la caché corresponden al archivo de origen actual."""
+    if meta is None or meta.get('version') != VERSION_CACHE:
+        return False
+    return _huella_vigente(ruta, meta.get('huella', {}))
+
+
+# ========== NORMALIZACIÓN DE TIPOS ==========
+def _normalizar_tipos(df):
+    """Prepara un DataFrame leído de Excel para guardarlo en Parquet.
+
+    Las columnas 'object' con tipos mezclados (p. ej. números y textos en la
+    misma columna) se convierten a texto, y las columnas de códigos se pasan a
+    categóricas.
+    """
+    df = df.copy()
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns:
+        if df[col].dtype == object:
+            no_nulos = df[col].dropna()
+            if not no_nulos.map(lambda v: isinstance(v, str)).all():
+                df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+# ========== LECTURA CON CACHÉ ==========
+def _rutas_cache(nombre_archivo):
+    base = os.path.join(DIRECTORIO_CACHE, os.path.splitext(nombre_archivo)[0])
+    return base + '.meta.json', base
+
+
+def _leer_meta(ruta_meta):
+    try:
+        with open(ruta_meta, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _escribir_atomico(ruta, escribir):
+    # Se escribe en un temporal y se renombra: varios workers pueden reconstruir
+    # la caché a la vez sin dejar archivos a medio escribir.
+    tmp = f'{ruta}.{os.getpid()}.tmp'
+    escribir(tmp)
+    os.replace(tmp, ruta)
+
+
+def _ruta_hoja(base, indice):
+    return f'{base}.{indice}.parquet'
+
+
+def construir_cache(nombre_archivo, sheet_name=0):
+    """Lee un libro de Excel y guarda sus hojas en Parquet junto con su huella."""
+    ruta = ruta_datos(nombre_archivo)
+    huella = huella_archivo(ruta)
+    hojas = pd.read_excel(ruta, sheet_name=sheet_name)
+    unica = not isinstance(hojas, dict)
+    if unica:
+        hojas = {sheet_name: hojas}
+
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    ruta_meta, base = _rutas_cache(nombre_archivo)
+    # Las hojas se guardan por posición para no depender de caracteres en su nombre.
+    nombres = []
+    for i, (nombre, df) in enumerate(hojas.items()):
+        df = _normalizar_tipos(df)
+        _escribir_atomico(_ruta_hoja(base, i), lambda tmp, df=df: df.to_parquet(tmp, index=False))
+        nombres.append(nombre)
+        hojas[nombre] = df
+
+    meta = {'version': VERSION_CACHE, 'archivo': nombre_archivo, 'huella': huella,
+            'sheet_name': sheet_name, 'hojas': nombres}
+
+    def escribir_meta(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+    _escribir_atomico(ruta_meta, escribir_meta)
+
+    return hojas[sheet_name] if unica else hojas
+
+
+def cargar_excel(nombre_archivo, sheet_name=0):
+    """Equivalente a ``pd.read_excel`` que usa la caché Parquet si está vigente.
+
+    ``sheet_name`` se interpreta igual que en pandas, salvo que solo se admite
+    una hoja o ``None`` (todas las hojas, devueltas en un diccionario).
+    """
+    ruta = ruta_datos(nombre_archivo)
+    if CACHE_DESACTIVADA:
+        return pd.read_excel(ruta, sheet_name=sheet_name)
+
+    ruta_meta, base = _rutas_cache(nombre_archivo)
+    meta = _leer_meta(ruta_meta)
+    if not _cache_vigente(ruta, meta) or meta.get('sheet_name') != sheet_name:
+        return construir_cache(nombre_archivo, sheet_name=sheet_name)
+
+    hojas = {nombre: pd.read_parquet(_ruta_hoja(base, i)) for i, nombre in enumerate(meta['hojas'])}
+    return hojas if sheet_name is None else hojas[sheet_name]
+
+
+def cargar_mortalidad():
+    """Registros de defunciones no fetales (Anexo 1)."""
+    return cargar_excel(ARCHIVO_MORTALIDAD, sheet_name=HOJA_MORTALIDAD)
+
+
+def cargar_codigos_muerte():
+    """Todas las hojas del catálogo de códigos CIE-10 (Anexo 2)."""
+    return cargar_excel(ARCHIVO_CODIGOS, sheet_name=None)
+
+
+def cargar_divipola():
+    """Codificación DIVIPOLA de departamentos y municipios (Anexo 3)."""
+    return cargar_excel(ARCHIVO_DIVIPOLA)
+
+
+def cargar_geojson():
+    """Polígonos de los departamentos para el mapa de coropletas."""
+    with open(ruta_datos(ARCHIVO_GEOJSON), encoding='utf-8') as f:
+        return json.load(f)
+
+
+# ========== GEOJSON SIMPLIFICADO ==========
+def _ruta_geojson_simplificado(nivel):
+    return f'{_rutas_cache(ARCHIVO_GEOJSON)[1]}.{nivel}.geojson'
+
+
+def _simplificar_geojson():
+    geojson = cargar_geojson()
+    return {nivel: geometria.serializar(geometria.simplificar(geojson, rejilla, tolerancia))
+            for nivel, (rejilla, tolerancia) in geometria.NIVELES.items()}
+
+
+def construir_geojson_simplificado():
+    """Guarda en la caché una variante simplificada del GeoJSON por cada nivel de ``geometria.NIVELES``."""
+    huella = huella_archivo(ruta_datos(ARCHIVO_GEOJSON))
+    variantes = _simplificar_geojson()
+
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    for nivel, cuerpo in variantes.items():
+        def escribir_variante(tmp, cuerpo=cuerpo):
+            with open(tmp, 'wb') as f:
+                f.write(cuerpo)
+        _escribir_atomico(_ruta_geojson_simplificado(nivel), escribir_variante)
+
+    # Los niveles se guardan en los metadatos: si cambian las tolerancias, se regenera la caché.
+    meta = {'version': VERSION_CACHE, 'archivo': ARCHIVO_GEOJSON, 'huella': huella,
+            'niveles': {nivel: list(parametros) for nivel, parametros in geometria.NIVELES.items()}}
+
+    def escribir_meta(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+    _escribir_atomico(_rutas_cache(ARCHIVO_GEOJSON)[0], escribir_meta)
+    return variantes
+
+
+def cargar_geojson_simplificado():
+    """Variantes simplificadas del GeoJSON por nivel, como bytes UTF-8 listos para enviar."""
+    ruta = ruta_datos(ARCHIVO_GEOJSON)
+    if CACHE_DESACTIVADA:
+        return _simplificar_geojson()
+
+    meta = _leer_meta(_rutas_cache(ARCHIVO_GEOJSON)[0])
+    niveles = {nivel: list(parametros) for nivel, parametros in geometria.NIVELES.items()}
+    if not _cache_vigente(ruta, meta) or meta.get('niveles') != niveles:
+        return construir_geojson_simplificado()
+    try:
+        variantes = {}
+        for nivel in geometria.NIVELES:
+            with open(_ruta_geojson_simplificado(nivel), 'rb') as f:
+                variantes[nivel] = f.read()
+        return variantes
+    except FileNotFoundError:
+        return construir_geojson_simplificado()
+
+
+# ========== CONJUNTO PREPROCESADO ==========
+def _codigo_texto(serie, ancho):
+    """Códigos como texto rellenado con ceros: 5001, 5001.0 y '5001' dan '05001' con ancho 5."""
+    # Se convierte cada valor distinto (unos cientos) y no cada fila.
+    categorias = serie.astype('category')
+    valores = pd.Series(categorias.cat.categories.astype(object))
+    texto = valores.astype(str).str.strip()
+    numeros = pd.to_numeric(valores, errors='coerce')
+    enteros = numeros.notna()
+    texto[enteros] = numeros[enteros].round().astype('int64').astype(str)
+    return categorias.map(dict(zip(valores, texto.str.zfill(ancho))), na_action='ignore').astype(object)
+
+
+def normalizar_codigos(df):
+    """Lleva ``COD_DEPARTAMENTO`` y ``COD_DANE`` a texto de ancho fijo, sin importar cómo vinieran.
+
+    Cada publicación del DANE (y cada lector: Excel, CSV) puede entregarlos
+    como enteros, decimales o texto; normalizados, se pueden unir con DIVIPOLA
+    y comparar entre años. Los faltantes se mantienen como faltantes.
+    """
+    for col, ancho in ANCHO_CODIGOS.items():
+        if col in df.columns:
+            df[col] = _codigo_texto(df[col], ancho)
+    return df
+
+
+def diccionario_divipola(divipola):
+    """Nombres de municipio y departamento por ``COD_DANE`` normalizado, para unirlos sin ``merge``."""
+    if divipola.empty or 'COD_DANE' not in divipola.columns:
+        return {col: {} for col in COLUMNAS_DIVIPOLA}
+    divipola = normalizar_codigos(divipola[['COD_DANE'] + COLUMNAS_DIVIPOLA].copy())
+    divipola = divipola.dropna(subset=['COD_DANE']).drop_duplicates('COD_DANE')
+    return {col: dict(zip(divipola['COD_DANE'], divipola[col])) for col in COLUMNAS_DIVIPOLA}
+
+
+def unir_divipola(mortalidad, diccionario):
+    """Agrega MUNICIPIO y DEPARTAMENTO buscando cada ``COD_DANE`` en el diccionario de DIVIPOLA.
+
+    La búsqueda se hace sobre las categorías de ``COD_DANE`` (unos cientos de
+    municipios) y no fila por fila.
+    """
+    codigos = mortalidad['COD_DANE'].astype('category')
+    for col in COLUMNAS_DIVIPOLA:
+        mortalidad[col] = codigos.map(diccionario[col], na_action='ignore')
+    return mortalidad
+
+
+def preprocesar_mortalidad(mortalidad, divipola):
+    """Normaliza los códigos y agrega los nombres de municipio y departamento.
+
+    Los códigos de departamento y municipio se rellenan a dos y cinco dígitos
+    y los nombres se toman de DIVIPOLA por ``COD_DANE``. Las columnas de texto
+    resultantes se devuelven como categóricas.
+    """
+    if mortalidad.empty:
+        return mortalidad
+    mortalidad = normalizar_codigos(mortalidad.copy())
+
+    # Nombres de municipios y departamentos desde DIVIPOLA.
+    if 'COD_DANE' in mortalidad.columns:
+        mortalidad = unir_divipola(mortalidad, diccionario_divipola(divipola))
+    else:
+        # Asegurar que las columnas existan aunque no se pueda hacer la unión.
+        for col in COLUMNAS_DIVIPOLA:
+            if col not in mortalidad.columns:
+                mortalidad[col] = None
+
+    for col in COLUMNAS_TEXTO_PREPROCESADAS:
+        if col in mortalidad.columns:
+            mortalidad[col] = mortalidad[col].astype('category')
+    return mortalidad
+
+
+def construir_preprocesado():
+    """Preprocesa el Anexo 1 y lo guarda como Arrow IPC sin comprimir (mapeable en memoria)."""
+    ruta_mortalidad = ruta_datos(ARCHIVO_MORTALIDAD)
+    ruta_divipola = ruta_datos(ARCHIVO_DIVIPOLA)
+    huellas = {ARCHIVO_MORTALIDAD: huella_archivo(ruta_mortalidad),
+               ARCHIVO_DIVIPOLA: huella_archivo(ruta_divipola)}
+    mortalidad = preprocesar_mortalidad(cargar_mortalidad(), cargar_divipola())
+
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    ruta_arrow = os.path.join(DIRECTORIO_CACHE, ARCHIVO_PREPROCESADO)
+    tabla = pa.Table.from_pandas(mortalidad, preserve_index=False)
+
+    def escribir_arrow(tmp):
+        with pa.OSFile(tmp, 'wb') as destino, pa.ipc.new_file(destino, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+    _escribir_atomico(ruta_arrow, escribir_arrow)
+
+    meta = {'version': VERSION_CACHE, 'huellas': huellas}
+
+    def escribir_meta(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+    _escribir_atomico(ruta_arrow + '.meta.json', escribir_meta)
+    return ruta_arrow
+
+
+def _preprocesado_vigente(ruta_arrow):
+    meta = _leer_meta(ruta_arrow + '.meta.json')
+    if meta is None or meta.get('version') != VERSION_CACHE or not os.path.exists(ruta_arrow):
+        return False
+    huellas = meta.get('huellas', {})
+    return all(_huella_vigente(ruta_datos(nombre), huellas.get(nombre, {}))
+               for nombre in (ARCHIVO_MORTALIDAD, ARCHIVO_DIVIPOLA))
+
+
+def mapear_preprocesado():
+    """DataFrame de solo lectura respaldado por el archivo Arrow mapeado en memoria.
+
+    Con ``split_blocks=True`` pyarrow entrega las columnas numéricas y los
+    códigos de las categóricas como vistas sobre el mapa, sin copiarlos.
+    """
+    ruta_arrow = os.path.join(DIRECTORIO_CACHE, ARCHIVO_PREPROCESADO)
+    if not _preprocesado_vigente(ruta_arrow):
+        construir_preprocesado()
+    tabla = pa.ipc.open_file(pa.memory_map(ruta_arrow, 'r')).read_all()
+    return tabla.to_pandas(split_blocks=True)
+
+
+def cargar_mortalidad_preprocesada():
+    """Conjunto de defunciones listo para las visualizaciones, según ``MODO_CARGA``."""
+    if MODO_CARGA == 'mmap' and not CACHE_DESACTIVADA:
+        return mapear_preprocesado()
+    return preprocesar_mortalidad(cargar_mortalidad(), cargar_divipola())
+
+
+# ========== ETAPA DE INGESTA ==========
+if __name__ == '__main__':
+    # Convierte (o revalida) todos los libros de Excel a la caché columnar.
+    for nombre, hoja in [(ARCHIVO_MORTALIDAD, HOJA_MORTALIDAD), (ARCHIVO_CODIGOS, None), (ARCHIVO_DIVIPOLA, 0)]:
+        try:
+            cargar_excel(nombre, sheet_name=hoja)
+            print(f"Caché lista: {nombre}")
+        except FileNotFoundError as e:
+            print(f"Omitido, no se encontró el archivo: {e.filename}")
+    try:
+        cargar_geojson_simplificado()
+        print(f"GeoJSON simplificado listo: {', '.join(geometria.NIVELES)}")
+    except FileNotFoundError as e:
+        print(f"GeoJSON simplificado omitido, no se encontró el archivo: {e.filename}")
+    try:
+        print(f"Conjunto preprocesado listo: {construir_preprocesado()}")
+    except FileNotFoundError as e:
+        print(f"Conjunto preprocesado omitido, no se encontró el archivo: {e.filename}")
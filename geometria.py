@@ -0,0 +1,221 @@
+"""Simplificación de los polígonos de departamentos para el mapa de coropletas.
+
+El GeoJSON original trae coordenadas con 15 decimales y decenas de
+propiedades censales que el mapa no usa. Aquí se generan variantes más
+livianas en tres pasos:
+
+1. Cuantización: cada coordenada se redondea a una rejilla fija (por
+   ejemplo 0,001° ≈ 110 m) y se eliminan los vértices repetidos.
+2. Simplificación que preserva la topología: las fronteras compartidas por
+   dos departamentos se parten en arcos entre los puntos de unión y cada
+   arco se simplifica una sola vez (Douglas-Peucker). Así ambos
+   departamentos usan exactamente los mismos vértices y no aparecen huecos
+   ni solapamientos entre ellos.
+3. Solo se conservan las propiedades que usa el dashboard.
+
+Cada nivel combina una rejilla y una tolerancia; la miniatura usa uno grueso
+y la vista principal uno más fino.
+"""
+import json
+
+import numpy as np
+
+# Nivel -> (tamaño de la rejilla, tolerancia de Douglas-Peucker), ambos en grados.
+# Colombia ocupa unos 17° de alto: en la miniatura (160 px) un píxel equivale a ~0,1° y en la
+# vista principal (~600 px) a ~0,03°, así que las tolerancias quedan por debajo de un píxel.
+NIVELES = {
+    'miniatura': (0.02, 0.1),
+    'principal': (0.002, 0.01),
+}
+PROPIEDADES = ['DPTO_CCDGO', 'DPTO_CNMBR']
+
+
+# ========== CUANTIZACIÓN ==========
+def _cuantizar_anillo(anillo, rejilla):
+    """Anillo en enteros de la rejilla, sin vértices consecutivos repetidos y cerrado."""
+    puntos = np.rint(np.asarray(anillo, dtype=float)[:, :2] / rejilla).astype(np.int64)
+    if len(puntos) == 0:
+        return []
+    distintos = np.r_[True, np.any(puntos[1:] != puntos[:-1], axis=1)]
+    puntos = [tuple(p) for p in puntos[distintos].tolist()]
+    if puntos[0] != puntos[-1]:
+        puntos.append(puntos[0])
+    return puntos
+
+
+def _poligonos(geometria):
+    """Lista de polígonos (cada uno, lista de anillos) de un Polygon o MultiPolygon."""
+    if geometria is None:
+        return []
+    if geometria['type'] == 'Polygon':
+        return [geometria['coordinates']]
+    if geometria['type'] == 'MultiPolygon':
+        return geometria['coordinates']
+    raise ValueError(f"Geometría no soportada: {geometria['type']}")
+
+
+# ========== DOUGLAS-PEUCKER ==========
+def douglas_peucker(puntos, tolerancia):
+    """Índices de los vértices de una polilínea que se conservan (siempre los extremos)."""
+    puntos = np.asarray(puntos, dtype=float)
+    n = len(puntos)
+    conservar = np.zeros(n, dtype=bool)
+    conservar[[0, n - 1]] = True
+    pendientes = [(0, n - 1)]
+    while pendientes:
+        inicio, fin = pendientes.pop()
+        if fin - inicio < 2:
+            continue
+        a, b = puntos[inicio], puntos[fin]
+        intermedios = puntos[inicio + 1:fin]
+        dx, dy = b - a
+        longitud = np.hypot(dx, dy)
+        if longitud == 0:
+            distancias = np.hypot(*(intermedios - a).T)
+        else:
+            distancias = np.abs(dx * (intermedios[:, 1] - a[1]) - dy * (intermedios[:, 0] - a[0])) / longitud
+        mayor = int(np.argmax(distancias))
+        if distancias[mayor] > tolerancia:
+            medio = inicio + 1 + mayor
+            conservar[medio] = True
+            pendientes += [(inicio, medio), (medio, fin)]
+    return np.flatnonzero(conservar)
+
+
+# ========== ARCOS Y PUNTOS DE UNIÓN ==========
+def _uniones(anillos):
+    """Vértices donde se unen tres o más fronteras (o donde una frontera compartida termina).
+
+    Un vértice interior de una frontera compartida tiene los mismos dos vecinos
+    en todos los anillos que lo contienen; si los vecinos difieren, es un punto
+    de unión y los arcos se cortan allí.
+    """
+    vecinos = {}
+    uniones = set()
+    for anillo in anillos:
+        abierto = anillo[:-1]
+        for i, punto in enumerate(abierto):
+            par = frozenset((abierto[i - 1], abierto[(i + 1) % len(abierto)]))
+            previo = vecinos.setdefault(punto, par)
+            if previo != par:
+                uniones.add(punto)
+    return uniones
+
+
+def _arcos(anillo, uniones):
+    """Divide un anillo cerrado en arcos que empiezan y terminan en puntos de unión."""
+    abierto = anillo[:-1]
+    cortes = [i for i, punto in enumerate(abierto) if punto in uniones]
+    if not cortes:
+        return None
+    # Se rota el anillo para que empiece en un punto de unión.
+    rotado = abierto[cortes[0]:] + abierto[:cortes[0]] + [abierto[cortes[0]]]
+    posiciones = [i - cortes[0] for i in cortes] + [len(abierto)]
+    return [rotado[a:b + 1] for a, b in zip(posiciones[:-1], posiciones[1:])]
+
+
+class _SimplificadorArcos:
+    """Simplifica cada arco una sola vez, sin importar en qué sentido lo recorra cada anillo."""
+
+    def __init__(self, tolerancia):
+        self.tolerancia = tolerancia
+        self._hechos = {}
+
+    def arco(self, puntos):
+        canonico = min(tuple(puntos), tuple(reversed(puntos)))
+        if canonico not in self._hechos:
+            indices = douglas_peucker(canonico, self.tolerancia)
+            self._hechos[canonico] = [canonico[i] for i in indices]
+        simplificado = self._hechos[canonico]
+        return simplificado if canonico == tuple(puntos) else simplificado[::-1]
+
+    def anillo_sin_uniones(self, anillo):
+        # Un anillo que no comparte fronteras (una isla, por ejemplo) se corta en su punto más
+        # lejano al inicio, para que Douglas-Peucker no trabaje con un segmento de longitud cero.
+        # Se empieza en el menor vértice para que un enclave y el hueco que deja se corten igual.
+        abierto = anillo[:-1]
+        inicio = abierto.index(min(abierto))
+        anillo = abierto[inicio:] + abierto[:inicio] + [abierto[inicio]]
+        puntos = np.asarray(anillo, dtype=float)
+        lejano = int(np.argmax(np.hypot(*(puntos - puntos[0]).T)))
+        if lejano == 0:
+            return anillo
+        return self.arco(anillo[:lejano + 1])[:-1] + self.arco(anillo[lejano:])
+
+
+def simplificar_anillos(anillos, tolerancia):
+    """Simplifica anillos cuantizados de forma consistente en sus fronteras compartidas."""
+    uniones = _uniones(anillos)
+    simplificador = _SimplificadorArcos(tolerancia)
+    resultado = []
+    for anillo in anillos:
+        arcos = _arcos(anillo, uniones)
+        if arcos is None:
+            resultado.append(simplificador.anillo_sin_uniones(anillo))
+            continue
+        nuevo = [arcos[0][0]]
+        for arco in arcos:
+            nuevo += simplificador.arco(arco)[1:]
+        resultado.append(nuevo)
+    return resultado
+
+
+# ========== COLECCIÓN COMPLETA ==========
+def simplificar(geojson, rejilla, tolerancia, propiedades=PROPIEDADES):
+    """FeatureCollection cuantizada y simplificada con solo las ``propiedades`` indicadas.
+
+    Los anillos que quedan con menos de tres vértices distintos se descartan,
+    salvo el exterior de un polígono, que se conserva solo cuantizado. Los
+    departamentos sin geometría (lista de coordenadas vacía) se mantienen
+    tal cual para que sigan apareciendo en la tabla del mapa.
+    """
+    tolerancia_rejilla = tolerancia / rejilla
+    # Se aplanan todos los anillos para encontrar las uniones entre departamentos distintos.
+    estructura, anillos = [], []
+    for feature in geojson['features']:
+        poligonos = []
+        for poligono in _poligonos(feature.get('geometry')):
+            indices = []
+            for anillo in poligono:
+                cuantizado = _cuantizar_anillo(anillo, rejilla)
+                if len(cuantizado) >= 4:
+                    indices.append(len(anillos))
+                    anillos.append(cuantizado)
+            if indices:
+                poligonos.append(indices)
+        estructura.append(poligonos)
+
+    simplificados = simplificar_anillos(anillos, tolerancia_rejilla)
+
+    def coordenadas(indice):
+        return [[round(x * rejilla, 6), round(y * rejilla, 6)] for x, y in simplificados[indice]]
+
+    features = []
+    for feature, poligonos in zip(geojson['features'], estructura):
+        nuevos = []
+        for indices in poligonos:
+            exterior, *huecos = indices
+            if len(simplificados[exterior]) < 4:
+                simplificados[exterior] = anillos[exterior]
+            nuevos.append([coordenadas(exterior)] + [coordenadas(i) for i in huecos if len(simplificados[i]) >= 4])
+        geometria = feature.get('geometry')
+        if not nuevos:
+            geometria = geometria and {'type': geometria['type'], 'coordinates': []}
+        elif geometria['type'] == 'Polygon' and len(nuevos) == 1:
+            geometria = {'type': 'Polygon', 'coordinates': nuevos[0]}
+        else:
+            geometria = {'type': 'MultiPolygon', 'coordinates': nuevos}
+        features.append({'type': 'Feature', 'geometry': geometria,
+                         'properties': {p: feature['properties'].get(p) for p in propiedades}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def vertices(geojson):
+    """Número total de vértices de una FeatureCollection."""
+    return sum(len(anillo) for feature in geojson['features']
+               for poligono in _poligonos(feature.get('geometry')) for anillo in poligono)
+
+
+def serializar(geojson):
+    """GeoJSON compacto en UTF-8 (sin espacios), tal como se envía al navegador."""
+    return json.dumps(geojson, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
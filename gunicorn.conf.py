@@ -0,0 +1,42 @@
+"""Configuración de Gunicorn para el despliegue (``gunicorn -c gunicorn.conf.py app:server``).
+
+La aplicación se carga una sola vez en el proceso master (``preload_app``) y
+los workers se crean por *fork*. Con el modo de carga ``mmap`` los datos
+quedan en un archivo Arrow mapeado en memoria, así que los workers comparten
+las mismas páginas en lugar de tener cada uno su copia de pandas.
+
+Cada worker deja sus métricas en ``MORTALIDAD_METRICAS_DIR`` (un directorio
+temporal por master) para que ``/metrics`` muestre la suma de todos.
+"""
+import os
+import shutil
+import tempfile
+
+import memoria
+
+# Debe definirse antes de que el master importe app.py.
+os.environ.setdefault('MORTALIDAD_MODO_CARGA', 'mmap')
+os.environ.setdefault('MORTALIDAD_METRICAS_DIR',
+                      os.path.join(tempfile.gettempdir(), f'mortalidad-metricas-{os.getpid()}'))
+
+preload_app = True
+
+
+def when_ready(server):
+    server.log.info("Memoria master: %s", memoria.formatear(memoria.reporte_memoria()))
+
+
+def post_worker_init(worker):
+    worker.log.info("Memoria worker: %s", memoria.formatear(memoria.reporte_memoria()))
+
+
+def child_exit(server, worker):
+    # Las métricas de un worker que termina dejan de sumarse en /metrics.
+    try:
+        os.remove(os.path.join(os.environ['MORTALIDAD_METRICAS_DIR'], f'{worker.pid}.json'))
+    except OSError:
+        pass
+
+
+def on_exit(server):
+    shutil.rmtree(os.environ['MORTALIDAD_METRICAS_DIR'], ignore_errors=True)
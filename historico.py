@@ -0,0 +1,167 @@
+"""Agregados de varios años que se actualizan por partición, sin volver a leer los registros.
+
+Cada partición que deja ``ingesta.py`` (un archivo de origen en un año) se
+resume una sola vez en un cubo de conteos (``agregados.CuboMortalidad``) que
+se guarda junto a ella. El cubo de todos los años es la suma de esos cubos y
+también se guarda. Al llegar un archivo nuevo solo se lee su partición y su
+cubo se suma al cubo guardado; si un archivo cambia o desaparece, el cubo
+total se vuelve a sumar a partir de los cubos por partición, que ya son
+agregados. En ningún caso se recorren de nuevo los registros de otros años.
+
+Sobre el cubo total se calculan las series de tiempo del dashboard: conteos
+mensuales, media móvil y variación interanual.
+
+Uso (``ingesta.py`` lo ejecuta al terminar)::
+
+    python historico.py
+"""
+import json
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import datos
+import ingesta
+from agregados import CuboMortalidad
+
+DIRECTORIO_AGREGADOS = os.path.join(datos.DIRECTORIO_CACHE, 'agregados')
+ARCHIVO_CUBO = 'cubo_total.arrow'
+ARCHIVO_MANIFIESTO = 'manifiesto.json'
+# Meses de la media móvil de la vista de tendencia.
+VENTANA_MOVIL = 12
+
+
+# ========== CUBOS POR PARTICIÓN ==========
+def _ruta_cubo(particion):
+    fuente, anio = particion.rsplit('/', 1)
+    return os.path.join(DIRECTORIO_AGREGADOS, f'anio={anio}', f'{fuente}.arrow')
+
+
+def _guardar_cubo(cubo, ruta):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    datos._escribir_atomico(ruta, cubo.guardar)
+
+
+def cubo_particion(particion):
+    """Cubo de una partición (``fuente/año``), leyendo solo su archivo Parquet."""
+    fuente, anio = particion.rsplit('/', 1)
+    return CuboMortalidad.desde_registros(pq.read_table(ingesta.ruta_particion(anio, fuente)).to_pandas())
+
+
+def particiones_ingeridas():
+    """Partición (``fuente/año``) -> huella, según el manifiesto de la ingesta.
+
+    La huella junta el SHA-1 del archivo de origen con el tamaño y la fecha de
+    modificación del Parquet de la partición: ``ingesta.py`` reescribe las
+    particiones también cuando cambia DIVIPOLA (los nombres de municipio van
+    en ellas) aunque el archivo de origen sea el mismo, y su cubo debe
+    recalcularse. Las particiones cuyo Parquet ya no existe se omiten.
+    """
+    ingeridas = {}
+    for fuente, info in ingesta.leer_manifiesto()['fuentes'].items():
+        for anio in info['anios']:
+            try:
+                st = os.stat(ingesta.ruta_particion(anio, fuente))
+            except FileNotFoundError:
+                continue
+            ingeridas[f'{fuente}/{anio}'] = {'origen': info['huella']['sha1'], 'tamano': st.st_size,
+                                             'mtime_ns': st.st_mtime_ns}
+    return ingeridas
+
+
+def _leer_manifiesto():
+    manifiesto = datos._leer_meta(os.path.join(DIRECTORIO_AGREGADOS, ARCHIVO_MANIFIESTO))
+    if manifiesto is None or manifiesto.get('version') != datos.VERSION_CACHE:
+        return {'version': datos.VERSION_CACHE, 'particiones': {}}
+    return manifiesto
+
+
+def _guardar_manifiesto(manifiesto):
+    def escribir(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+    datos._escribir_atomico(os.path.join(DIRECTORIO_AGREGADOS, ARCHIVO_MANIFIESTO), escribir)
+
+
+# ========== ACTUALIZACIÓN INCREMENTAL ==========
+def actualizar():
+    """Cubo de todos los años ingeridos, actualizado con las particiones nuevas o modificadas.
+
+    Devuelve ``None`` si no hay particiones (no se ha ejecutado ``ingesta.py``).
+    """
+    ingeridas = particiones_ingeridas()
+    manifiesto = _leer_manifiesto()
+    guardadas = manifiesto['particiones']
+    ruta_total = os.path.join(DIRECTORIO_AGREGADOS, ARCHIVO_CUBO)
+
+    nuevas = [p for p, huella in ingeridas.items() if guardadas.get(p) != huella]
+    # Particiones que ya estaban en el cubo total y cambiaron o ya no existen: hay que restarlas,
+    # así que el total se vuelve a sumar desde los cubos por partición.
+    obsoletas = [p for p, huella in guardadas.items() if ingeridas.get(p) != huella]
+    if not nuevas and not obsoletas:
+        return CuboMortalidad.cargar(ruta_total) if ingeridas and os.path.exists(ruta_total) else None
+
+    cubos_nuevos = []
+    for particion in nuevas:
+        cubo = cubo_particion(particion)
+        _guardar_cubo(cubo, _ruta_cubo(particion))
+        cubos_nuevos.append(cubo)
+    for particion in obsoletas:
+        if particion not in ingeridas and os.path.exists(_ruta_cubo(particion)):
+            os.remove(_ruta_cubo(particion))
+
+    if not ingeridas:
+        total = None
+    elif obsoletas or not os.path.exists(ruta_total):
+        total = CuboMortalidad.combinar([CuboMortalidad.cargar(_ruta_cubo(p)) for p in ingeridas])
+    else:
+        total = CuboMortalidad.combinar([CuboMortalidad.cargar(ruta_total)] + cubos_nuevos)
+
+    if total is not None:
+        _guardar_cubo(total, ruta_total)
+    elif os.path.exists(ruta_total):
+        os.remove(ruta_total)
+    _guardar_manifiesto({'version': datos.VERSION_CACHE, 'particiones': ingeridas})
+    return total
+
+
+# ========== SERIES DE TIEMPO ==========
+def serie_mensual(cubo, mascara=None, ventana=VENTANA_MOVIL):
+    """Defunciones por mes con su media móvil y la variación frente al mismo mes del año anterior.
+
+    Devuelve un DataFrame indexado por el primer día de cada mes con las
+    columnas ``Muertes``, ``Media_movil`` y ``Variacion_interanual`` (en %).
+    Los meses de los años presentes sin defunciones cuentan como 0; los de
+    años que no están cargados quedan vacíos, así que no hay media móvil ni
+    variación a través de ellos.
+    """
+    totales = cubo.totales(['AÑO', 'MES'], mascara=mascara, nombre='Muertes')
+    totales = totales[totales['MES'].between(1, 12)]
+    columnas = ['Muertes', 'Media_movil', 'Variacion_interanual']
+    if totales.empty:
+        return pd.DataFrame(columns=columnas, index=pd.DatetimeIndex([], name='FECHA'))
+
+    fechas = pd.to_datetime(pd.DataFrame({'year': totales['AÑO'].astype(int), 'month': totales['MES'].astype(int),
+                                          'day': 1}))
+    serie = pd.Series(totales['Muertes'].to_numpy(), index=pd.DatetimeIndex(fechas, name='FECHA'))
+    serie = serie.reindex(pd.date_range(serie.index.min().replace(month=1), serie.index.max().replace(month=12),
+                                        freq='MS', name='FECHA'))
+    cargados = serie.index.year.isin(totales['AÑO'].astype(int).unique())
+    serie[cargados] = serie[cargados].fillna(0)
+
+    anterior = serie.shift(12)
+    variacion = (serie / anterior - 1) * 100
+    resultado = pd.DataFrame({'Muertes': serie,
+                              'Media_movil': serie.rolling(ventana, min_periods=ventana).mean(),
+                              'Variacion_interanual': variacion.where(anterior > 0)})
+    return resultado[columnas]
+
+
+if __name__ == '__main__':
+    cubo = actualizar()
+    if cubo is None:
+        print("No hay particiones; ejecute primero 'python ingesta.py'.")
+    else:
+        anios = ', '.join(str(a) for a in cubo.categorias['AÑO'])
+        print(f"Cubo de varios años listo: {len(cubo)} celdas, {int(cubo.conteos.sum())} defunciones ({anios})")
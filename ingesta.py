@@ -0,0 +1,260 @@
+"""Ingesta por bloques de las publicaciones anuales de defunciones no fetales.
+
+``pd.read_excel`` carga la hoja completa en memoria antes de devolverla; con
+varios años (2015-2023, ~250 mil registros cada uno) el tiempo y el pico de
+memoria crecen con el número de archivos. Aquí cada archivo se recorre por
+bloques de filas (lector de solo lectura de openpyxl para Excel, ``chunksize``
+para CSV) y cada bloque se normaliza, se une con DIVIPOLA mediante un
+diccionario precalculado y se agrega como un *row group* a la partición
+Parquet de su año::
+
+    data/cache/mortalidad/anio=2019/NoFetal2019.parquet
+
+En memoria solo hay un bloque a la vez, así que el pico no depende del número
+de años. Un manifiesto guarda la huella de cada archivo de origen: al volver a
+ejecutar la ingesta solo se procesan los archivos nuevos o modificados.
+
+Uso::
+
+    python ingesta.py                      # Anexo 1 y los archivos de data/anual/
+    python ingesta.py data/anual/*.csv     # archivos concretos
+"""
+import argparse
+import glob
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+
+import datos
+
+DIRECTORIO_ANUAL = os.environ.get('MORTALIDAD_ANUAL', os.path.join(datos.DIRECTORIO_DATOS, 'anual'))
+DIRECTORIO_PARTICIONES = os.path.join(datos.DIRECTORIO_CACHE, 'mortalidad')
+ARCHIVO_MANIFIESTO = 'manifiesto.json'
+FILAS_POR_BLOQUE = int(os.environ.get('MORTALIDAD_FILAS_BLOQUE', 50_000))
+EXTENSIONES = ('.xlsx', '.csv')
+
+# Nombres de columna que cambian entre publicaciones.
+ALIAS_COLUMNAS = {'ANO': 'AÑO', 'ANIO': 'AÑO'}
+
+# Esquema fijo de las particiones: solo las columnas que usa el dashboard. Los textos se guardan
+# como diccionarios y se leen de vuelta como categóricas.
+_TEXTO = pa.dictionary(pa.int32(), pa.string())
+ESQUEMA = pa.schema([
+    ('AÑO', pa.int16()), ('MES', pa.int8()),
+    ('COD_DEPARTAMENTO', _TEXTO), ('COD_DANE', _TEXTO), ('MUNICIPIO', _TEXTO), ('DEPARTAMENTO', _TEXTO),
+    ('SEXO', pa.int8()), ('GRUPO_EDAD1', pa.int8()), ('COD_MUERTE', _TEXTO),
+])
+# Tipos de pandas (enteros con faltantes) de las columnas numéricas del esquema.
+TIPOS_ENTEROS = {'AÑO': 'Int16', 'MES': 'Int8', 'SEXO': 'Int8', 'GRUPO_EDAD1': 'Int8'}
+COLUMNAS_ORIGEN = ['AÑO', 'MES', 'COD_DEPARTAMENTO', 'COD_DANE', 'SEXO', 'GRUPO_EDAD1', 'COD_MUERTE']
+
+
+# ========== LECTURA POR BLOQUES ==========
+def _hoja_defunciones(nombres):
+    """La hoja de defunciones no fetales de un libro (o la primera, si no hay una con ese nombre)."""
+    return next((n for n in nombres if n.lower().startswith('no_fetales')), nombres[0])
+
+
+def bloques_excel(ruta, filas=FILAS_POR_BLOQUE, hoja=None):
+    """DataFrames de a lo sumo ``filas`` filas, leídos con el modo de solo lectura de openpyxl."""
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas_hoja = libro[hoja or _hoja_defunciones(libro.sheetnames)].iter_rows(values_only=True)
+        encabezado = [str(c).strip() if c is not None else '' for c in next(filas_hoja, ())]
+        bloque = []
+        for fila in filas_hoja:
+            if any(v is not None for v in fila):
+                bloque.append(fila)
+            if len(bloque) == filas:
+                yield pd.DataFrame.from_records(bloque, columns=encabezado)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame.from_records(bloque, columns=encabezado)
+    finally:
+        libro.close()
+
+
+def bloques_csv(ruta, filas=FILAS_POR_BLOQUE):
+    # Los códigos se leen como texto (categórico) para no perder ceros a la izquierda.
+    yield from pd.read_csv(ruta, chunksize=filas, dtype={'COD_DEPARTAMENTO': 'category', 'COD_DANE': 'category',
+                                                         'COD_MUERTE': 'category'})
+
+
+def bloques(ruta, filas=FILAS_POR_BLOQUE):
+    return bloques_csv(ruta, filas) if ruta.lower().endswith('.csv') else bloques_excel(ruta, filas)
+
+
+# ========== NORMALIZACIÓN DE CADA BLOQUE ==========
+def preparar_bloque(bloque, divipola):
+    """Bloque con las columnas de ``ESQUEMA``: códigos normalizados y nombres de DIVIPOLA.
+
+    ``divipola`` es el diccionario de ``datos.diccionario_divipola``. Las filas
+    sin año se descartan porque no se pueden asignar a ninguna partición.
+    """
+    bloque = bloque.rename(columns=lambda c: ALIAS_COLUMNAS.get(str(c).strip().upper(), str(c).strip()))
+    faltantes = [c for c in COLUMNAS_ORIGEN if c not in bloque.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el archivo de origen: {', '.join(faltantes)}")
+    bloque = datos.normalizar_codigos(bloque[COLUMNAS_ORIGEN].copy())
+    bloque = datos.unir_divipola(bloque, divipola)
+    for col in ESQUEMA.names:
+        if col in TIPOS_ENTEROS:
+            bloque[col] = pd.to_numeric(bloque[col], errors='coerce').astype(TIPOS_ENTEROS[col])
+        else:
+            bloque[col] = bloque[col].astype('category')
+    return bloque.dropna(subset=['AÑO'])[ESQUEMA.names]
+
+
+# ========== PARTICIONES Y MANIFIESTO ==========
+def ruta_particion(anio, fuente):
+    return os.path.join(DIRECTORIO_PARTICIONES, f'anio={anio}', f'{fuente}.parquet')
+
+
+def leer_manifiesto():
+    manifiesto = datos._leer_meta(os.path.join(DIRECTORIO_PARTICIONES, ARCHIVO_MANIFIESTO))
+    if manifiesto is None or manifiesto.get('version') != datos.VERSION_CACHE:
+        return {'version': datos.VERSION_CACHE, 'divipola': None, 'fuentes': {}}
+    return manifiesto
+
+
+def _guardar_manifiesto(manifiesto):
+    def escribir(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+    datos._escribir_atomico(os.path.join(DIRECTORIO_PARTICIONES, ARCHIVO_MANIFIESTO), escribir)
+
+
+def ingerir_archivo(ruta, divipola, filas=FILAS_POR_BLOQUE):
+    """Escribe las particiones por año de un archivo de origen y devuelve las filas de cada año.
+
+    Cada año tiene su propio ``ParquetWriter`` abierto mientras se recorre el
+    archivo; cada bloque se agrega como un row group. Los archivos se escriben
+    con un nombre temporal y se renombran al terminar, de modo que una
+    ingesta interrumpida no deja particiones a medias.
+    """
+    fuente = os.path.splitext(os.path.basename(ruta))[0]
+    escritores, filas_por_anio = {}, {}
+    try:
+        for bloque in bloques(ruta, filas):
+            bloque = preparar_bloque(bloque, divipola)
+            for anio, grupo in bloque.groupby('AÑO', observed=True):
+                anio = int(anio)
+                if anio not in escritores:
+                    destino = ruta_particion(anio, fuente)
+                    os.makedirs(os.path.dirname(destino), exist_ok=True)
+                    escritores[anio] = (pq.ParquetWriter(f'{destino}.{os.getpid()}.tmp', ESQUEMA), destino)
+                escritores[anio][0].write_table(pa.Table.from_pandas(grupo, schema=ESQUEMA, preserve_index=False))
+                filas_por_anio[anio] = filas_por_anio.get(anio, 0) + len(grupo)
+    except BaseException:
+        for escritor, destino in escritores.values():
+            escritor.close()
+            os.remove(f'{destino}.{os.getpid()}.tmp')
+        raise
+    for escritor, destino in escritores.values():
+        escritor.close()
+        os.replace(f'{destino}.{os.getpid()}.tmp', destino)
+    return filas_por_anio
+
+
+def ingerir(rutas, filas=FILAS_POR_BLOQUE, forzar=False):
+    """Ingiere los archivos nuevos o modificados de ``rutas`` y actualiza el manifiesto.
+
+    Si cambia DIVIPOLA se vuelven a ingerir todos, también las fuentes del
+    manifiesto que no están en ``rutas``, porque los nombres de municipio y
+    departamento quedan guardados en las particiones. La huella nueva de
+    DIVIPOLA se guarda solo al terminar, así una ingesta interrumpida se
+    retoma desde el principio. Devuelve el nombre de cada archivo procesado
+    con sus filas por año.
+    """
+    manifiesto = leer_manifiesto()
+    huella_divipola = datos.huella_archivo(datos.ruta_datos(datos.ARCHIVO_DIVIPOLA))
+    cambio_divipola = manifiesto['divipola'] is None or not datos._huella_vigente(
+        datos.ruta_datos(datos.ARCHIVO_DIVIPOLA), manifiesto['divipola'])
+    if cambio_divipola:
+        forzar = True
+        pedidas = {os.path.abspath(r) for r in rutas}
+        rutas = list(rutas) + [info['ruta'] for info in manifiesto['fuentes'].values()
+                               if info['ruta'] not in pedidas and os.path.exists(info['ruta'])]
+    divipola = None
+    procesados = {}
+    for ruta in rutas:
+        fuente = os.path.splitext(os.path.basename(ruta))[0]
+        previo = manifiesto['fuentes'].get(fuente)
+        if not forzar and previo is not None and datos._huella_vigente(ruta, previo['huella']):
+            continue
+        if divipola is None:
+            divipola = datos.diccionario_divipola(datos.cargar_divipola())
+        huella = datos.huella_archivo(ruta)
+        filas_por_anio = ingerir_archivo(ruta, divipola, filas)
+        # Particiones de una versión anterior del archivo que ya no tienen filas.
+        for anio in (previo or {}).get('anios', {}):
+            if int(anio) not in filas_por_anio and os.path.exists(ruta_particion(anio, fuente)):
+                os.remove(ruta_particion(anio, fuente))
+        manifiesto['fuentes'][fuente] = {'ruta': os.path.abspath(ruta), 'huella': huella,
+                                         'anios': {str(a): n for a, n in sorted(filas_por_anio.items())}}
+        os.makedirs(DIRECTORIO_PARTICIONES, exist_ok=True)
+        _guardar_manifiesto(manifiesto)
+        procesados[fuente] = filas_por_anio
+    if cambio_divipola:
+        manifiesto['divipola'] = huella_divipola
+        os.makedirs(DIRECTORIO_PARTICIONES, exist_ok=True)
+        _guardar_manifiesto(manifiesto)
+    return procesados
+
+
+# ========== LECTURA DE LAS PARTICIONES ==========
+def particiones(anios=None):
+    """Rutas de las particiones por año, según el manifiesto (solo los años pedidos, si se indican)."""
+    resultado = {}
+    for fuente, info in leer_manifiesto()['fuentes'].items():
+        for anio in info['anios']:
+            if anios is None or int(anio) in anios:
+                resultado.setdefault(int(anio), []).append(ruta_particion(anio, fuente))
+    return dict(sorted(resultado.items()))
+
+
+def leer_particiones(anios=None, columnas=None):
+    """DataFrame con los registros de los años pedidos (todos si ``anios`` es None)."""
+    rutas = [ruta for rutas_anio in particiones(anios).values() for ruta in rutas_anio]
+    if not rutas:
+        return ESQUEMA.empty_table().to_pandas()[columnas or ESQUEMA.names]
+    return pa.concat_tables(pq.read_table(ruta, columns=columnas) for ruta in rutas).to_pandas()
+
+
+def actualizar_fuentes():
+    """Vuelve a ingerir las fuentes del manifiesto cuya huella ya no coincide con el archivo.
+
+    Lo usa app.py al arrancar: un Anexo 1 ya ingerido que se reemplazó (o un
+    DIVIPOLA nuevo) se ingiere solo, igual que la caché Parquet se reconstruye
+    al llegar un Excel nuevo. Los archivos que nunca se ingirieron no se
+    agregan (eso lo decide quien ejecuta ``ingesta.py``). Devuelve lo mismo
+    que ``ingerir``.
+    """
+    rutas = [info['ruta'] for info in leer_manifiesto()['fuentes'].values() if os.path.exists(info['ruta'])]
+    return ingerir(rutas) if rutas else {}
+
+
+def fuentes_por_defecto():
+    """El Anexo 1 de la carpeta de datos y los archivos de ``DIRECTORIO_ANUAL``."""
+    rutas = [datos.ruta_datos(datos.ARCHIVO_MORTALIDAD)] if os.path.exists(datos.ruta_datos(datos.ARCHIVO_MORTALIDAD)) else []
+    rutas += sorted(r for r in glob.glob(os.path.join(DIRECTORIO_ANUAL, '*')) if r.lower().endswith(EXTENSIONES))
+    return rutas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingesta por bloques de los archivos anuales de defunciones.')
+    parser.add_argument('rutas', nargs='*', help='archivos .xlsx o .csv (por defecto, Anexo 1 y data/anual/)')
+    parser.add_argument('--filas', type=int, default=FILAS_POR_BLOQUE, help='filas por bloque')
+    parser.add_argument('--forzar', action='store_true', help='reingerir aunque el archivo no haya cambiado')
+    args = parser.parse_args()
+    for fuente, filas_por_anio in ingerir(args.rutas or fuentes_por_defecto(), args.filas, args.forzar).items():
+        print(f"{fuente}: " + ', '.join(f'{anio}={filas}' for anio, filas in sorted(filas_por_anio.items())))
+    print(f"Particiones en {DIRECTORIO_PARTICIONES}: {', '.join(map(str, particiones())) or 'ninguna'}")
+
+    # Los agregados de varios años se actualizan con las particiones nuevas.
+    import historico
+    historico.actualizar()
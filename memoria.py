@@ -0,0 +1,68 @@
+"""Reporte de memoria por proceso, para dimensionar cuántos workers caben en un nodo.
+
+Se leen los totales de ``/proc/<pid>/smaps_rollup`` (Linux):
+
+- ``rss_mb``: memoria residente, cuenta completas las páginas compartidas.
+- ``pss_mb``: memoria proporcional; las páginas compartidas se reparten entre
+  los procesos que las usan. La suma de PSS de todos los workers es el consumo
+  real del servicio.
+- ``uss_mb``: memoria privada del proceso; es lo que se libera al terminarlo y
+  lo que crece con cada worker adicional.
+"""
+import os
+
+_CAMPOS = {'Rss': 'rss_mb', 'Pss': 'pss_mb', 'Shared_Clean': 'compartida_mb', 'Shared_Dirty': 'compartida_mb',
+           'Private_Clean': 'uss_mb', 'Private_Dirty': 'uss_mb'}
+
+
+def reporte_memoria(pid=None):
+    """Diccionario con RSS, PSS, USS y memoria compartida (MB) de un proceso.
+
+    Devuelve un diccionario vacío si el sistema no expone ``smaps_rollup``.
+    """
+    pid = os.getpid() if pid is None else pid
+    reporte = {'pid': pid}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            lineas = f.readlines()
+    except OSError:
+        return {}
+    for linea in lineas:
+        partes = linea.split()
+        campo = partes[0].rstrip(':') if partes else ''
+        if campo in _CAMPOS and len(partes) >= 2:
+            clave = _CAMPOS[campo]
+            reporte[clave] = reporte.get(clave, 0.0) + int(partes[1]) / 1024
+    return {k: round(v, 1) if isinstance(v, float) else v for k, v in reporte.items()}
+
+
+def pico_rss(pid=None):
+    """RSS máximo (MB) que ha alcanzado el proceso desde que arrancó (``VmHWM``), o None."""
+    pid = os.getpid() if pid is None else pid
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for linea in f:
+                if linea.startswith('VmHWM:'):
+                    return round(int(linea.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def procesos_hijos(pid):
+    """PIDs de los procesos hijos directos (p. ej. los workers de un master de Gunicorn)."""
+    hijos = []
+    for tarea in os.listdir(f'/proc/{pid}/task'):
+        try:
+            with open(f'/proc/{pid}/task/{tarea}/children') as f:
+                hijos.extend(int(p) for p in f.read().split())
+        except OSError:
+            continue
+    return hijos
+
+
+def formatear(reporte):
+    """Texto de una línea para los logs."""
+    if not reporte:
+        return 'sin datos de memoria'
+    return ' '.join(f'{k}={v}' for k, v in reporte.items())
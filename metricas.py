@@ -0,0 +1,413 @@
+"""Métricas de rendimiento del dashboard en formato de texto de Prometheus (``/metrics``).
+
+Se registran sin dependencias externas:
+
+- la duración de cada etapa del arranque (carga, preprocesamiento, figuras);
+- histogramas de latencia y de bytes de respuesta por ruta de Flask;
+- histogramas de latencia por callback de Dash (``display_page`` por vista);
+- el tiempo de construir y serializar cada entrada de las cachés de figuras
+  y de la API, y sus aciertos, fallos y tamaño;
+- la memoria RSS, PSS y USS del proceso (``memoria.py``).
+
+Con Gunicorn cada worker tiene sus propias métricas. Si se define
+``MORTALIDAD_METRICAS_DIR`` (``gunicorn.conf.py`` lo hace), cada proceso deja
+una instantánea JSON en ese directorio cada pocos segundos y ``/metrics`` las
+suma, de modo que el scrape ve el servicio completo sin importar qué worker
+responda. Los contadores y los histogramas se suman; las duraciones del
+arranque, que los workers heredan del master, se toman una vez.
+
+Perfilado opcional: con ``MORTALIDAD_PERFIL=cprofile`` (o ``pyinstrument``; si
+no está instalado se avisa al arrancar y se usa cProfile) cada petición se perfila y las que superan
+``MORTALIDAD_PERFIL_UMBRAL_MS`` se guardan en ``MORTALIDAD_PERFIL_DIR``.
+"""
+import bisect
+import cProfile
+import functools
+import importlib.util
+import json
+import os
+import re
+import threading
+import time
+
+from flask import Response, g, request
+
+import datos
+import memoria
+
+DIRECTORIO_INSTANTANEAS = os.environ.get('MORTALIDAD_METRICAS_DIR', '')
+# Segundos mínimos entre dos instantáneas de un mismo proceso.
+INTERVALO_INSTANTANEA = float(os.environ.get('MORTALIDAD_METRICAS_INTERVALO', 5))
+MODO_PERFIL = os.environ.get('MORTALIDAD_PERFIL', '')
+UMBRAL_PERFIL_MS = float(os.environ.get('MORTALIDAD_PERFIL_UMBRAL_MS', 500))
+DIRECTORIO_PERFILES = os.environ.get('MORTALIDAD_PERFIL_DIR', os.path.join(datos.DIRECTORIO_CACHE, 'perfiles'))
+
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+TIPO_CONTENIDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# ========== REGISTRO ==========
+class Metrica:
+    """Contador o medidor con etiquetas; ``valores`` asocia cada tupla de etiquetas con su valor."""
+
+    def __init__(self, nombre, ayuda, tipo, etiquetas=(), agregacion='suma'):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.tipo = tipo
+        self.etiquetas = tuple(etiquetas)
+        # Cómo se combinan los valores de varios procesos: 'suma' o 'max'.
+        self.agregacion = agregacion
+        self.valores = {}
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas):
+        return tuple(str(etiquetas[e]) for e in self.etiquetas)
+
+    def incrementar(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self.valores[clave] = self.valores.get(clave, 0) + cantidad
+
+    def fijar(self, valor, **etiquetas):
+        with self._lock:
+            self.valores[self._clave(etiquetas)] = valor
+
+    def instantanea(self):
+        with self._lock:
+            return [[list(clave), valor] for clave, valor in self.valores.items()]
+
+
+class Histograma(Metrica):
+    """Histograma acumulativo; el valor de cada tupla de etiquetas es ``[conteos por límite..., suma]``."""
+
+    def __init__(self, nombre, ayuda, etiquetas=(), limites=LIMITES_SEGUNDOS):
+        super().__init__(nombre, ayuda, 'histogram', etiquetas)
+        self.limites = tuple(limites)
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        # El último casillero es +Inf: bisect devuelve len(limites) si el valor los supera todos.
+        casillero = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            estado = self.valores.get(clave)
+            if estado is None:
+                estado = self.valores[clave] = [0] * (len(self.limites) + 1) + [0.0]
+            estado[casillero] += 1
+            estado[-1] += valor
+
+    def instantanea(self):
+        with self._lock:
+            return [[list(clave), list(estado)] for clave, estado in self.valores.items()]
+
+
+class Registro:
+    """Conjunto de métricas y funciones que actualizan algunas justo antes de exportarlas."""
+
+    def __init__(self):
+        self.metricas = {}
+        self._colectores = []
+
+    def _agregar(self, metrica):
+        return self.metricas.setdefault(metrica.nombre, metrica)
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Metrica(nombre, ayuda, 'counter', etiquetas))
+
+    def medidor(self, nombre, ayuda, etiquetas=(), agregacion='suma'):
+        return self._agregar(Metrica(nombre, ayuda, 'gauge', etiquetas, agregacion))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), limites=LIMITES_SEGUNDOS):
+        return self._agregar(Histograma(nombre, ayuda, etiquetas, limites))
+
+    def colector(self, funcion):
+        self._colectores.append(funcion)
+        return funcion
+
+    def instantanea(self):
+        for funcion in self._colectores:
+            funcion()
+        return {nombre: {'tipo': m.tipo, 'ayuda': m.ayuda, 'etiquetas': list(m.etiquetas),
+                         'agregacion': m.agregacion, 'limites': list(getattr(m, 'limites', [])),
+                         'valores': m.instantanea()}
+                for nombre, m in self.metricas.items()}
+
+
+REGISTRO = Registro()
+
+ARRANQUE = REGISTRO.medidor('mortalidad_arranque_segundos', 'Duración de cada etapa del arranque de app.py',
+                            ['etapa'], agregacion='max')
+PETICIONES = REGISTRO.histograma('mortalidad_peticion_segundos', 'Latencia de las peticiones HTTP por ruta',
+                                 ['ruta', 'metodo', 'estado'])
+BYTES_RESPUESTA = REGISTRO.histograma('mortalidad_respuesta_bytes', 'Bytes del cuerpo de cada respuesta por ruta',
+                                      ['ruta', 'codificacion'], limites=LIMITES_BYTES)
+CALLBACKS = REGISTRO.histograma('mortalidad_callback_segundos', 'Latencia de los callbacks de Dash',
+                                ['callback', 'vista'])
+CONSTRUCCION_CACHE = REGISTRO.histograma('mortalidad_cache_construccion_segundos',
+                                         'Tiempo de construir y serializar una entrada que no estaba en caché',
+                                         ['cache'])
+CACHE_CONSULTAS = REGISTRO.contador('mortalidad_cache_consultas_total', 'Consultas a cada caché por resultado',
+                                    ['cache', 'resultado'])
+CACHE_DESCARTES = REGISTRO.contador('mortalidad_cache_descartes_total', 'Entradas descartadas por capacidad (LRU)',
+                                    ['cache'])
+CACHE_ENTRADAS = REGISTRO.medidor('mortalidad_cache_entradas', 'Entradas guardadas en cada caché', ['cache'])
+CACHE_BYTES = REGISTRO.medidor('mortalidad_cache_bytes', 'Bytes guardados en cada caché', ['cache', 'codificacion'])
+MEMORIA = REGISTRO.medidor('mortalidad_memoria_mb', 'Memoria del proceso según /proc/<pid>/smaps_rollup',
+                           ['tipo', 'pid'])
+
+
+@REGISTRO.colector
+def _medir_memoria():
+    reporte = memoria.reporte_memoria()
+    for tipo in ('rss_mb', 'pss_mb', 'uss_mb'):
+        if tipo in reporte:
+            MEMORIA.fijar(reporte[tipo], tipo=tipo[:-3], pid=reporte['pid'])
+
+
+def registrar_cache(cache):
+    """Exporta los contadores y el tamaño de una ``cache_figuras.CacheFiguras`` (etiqueta ``cache.nombre``)."""
+    @REGISTRO.colector
+    def _medir_cache():
+        estadisticas = cache.estadisticas()
+        CACHE_CONSULTAS.fijar(estadisticas['aciertos'], cache=cache.nombre, resultado='acierto')
+        CACHE_CONSULTAS.fijar(estadisticas['fallos'], cache=cache.nombre, resultado='fallo')
+        CACHE_DESCARTES.fijar(estadisticas['descartes'], cache=cache.nombre)
+        CACHE_ENTRADAS.fijar(estadisticas['entradas'], cache=cache.nombre)
+        CACHE_BYTES.fijar(estadisticas['bytes_json'], cache=cache.nombre, codificacion='identidad')
+        CACHE_BYTES.fijar(estadisticas['bytes_gzip'], cache=cache.nombre, codificacion='gzip')
+
+
+# ========== ARRANQUE Y CALLBACKS ==========
+class EtapasArranque:
+    """Cronómetro del arranque: ``terminar(etapa)`` registra el tiempo desde la etapa anterior."""
+
+    def __init__(self):
+        self._inicio = self._anterior = time.perf_counter()
+
+    def terminar(self, etapa):
+        ahora = time.perf_counter()
+        ARRANQUE.fijar(round(ahora - self._anterior, 6), etapa=etapa)
+        self._anterior = ahora
+
+    def total(self):
+        ARRANQUE.fijar(round(time.perf_counter() - self._inicio, 6), etapa='total')
+
+
+def cronometrado(nombre, vista=None):
+    """Decorador que observa la latencia de un callback; ``vista(*args)`` da la etiqueta de vista."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                CALLBACKS.observar(time.perf_counter() - inicio, callback=nombre,
+                                   vista=vista(*args) if vista is not None else '')
+        return envoltura
+    return decorador
+
+
+# ========== INSTANTÁNEAS DE VARIOS PROCESOS ==========
+_ultima_instantanea = 0.0
+
+
+def guardar_instantanea(forzar=False):
+    """Escribe la instantánea de este proceso en ``DIRECTORIO_INSTANTANEAS`` (como mucho cada ``INTERVALO_INSTANTANEA`` s)."""
+    global _ultima_instantanea
+    ahora = time.monotonic()
+    if not DIRECTORIO_INSTANTANEAS or (not forzar and ahora - _ultima_instantanea < INTERVALO_INSTANTANEA):
+        return
+    _ultima_instantanea = ahora
+    os.makedirs(DIRECTORIO_INSTANTANEAS, exist_ok=True)
+
+    def escribir(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(REGISTRO.instantanea(), f)
+    datos._escribir_atomico(os.path.join(DIRECTORIO_INSTANTANEAS, f'{os.getpid()}.json'), escribir)
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _instantaneas():
+    """Instantáneas de todos los procesos vivos (o solo la propia si no hay directorio)."""
+    if not DIRECTORIO_INSTANTANEAS:
+        return [REGISTRO.instantanea()]
+    guardar_instantanea(forzar=True)
+    instantaneas = []
+    for archivo in os.listdir(DIRECTORIO_INSTANTANEAS):
+        nombre, extension = os.path.splitext(archivo)
+        if extension != '.json' or not nombre.isdigit():
+            continue
+        ruta = os.path.join(DIRECTORIO_INSTANTANEAS, archivo)
+        if not _proceso_vivo(int(nombre)):
+            # Un worker que terminó (o se reinició): sus métricas ya no están en ningún proceso.
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                instantaneas.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return instantaneas
+
+
+def combinar(instantaneas):
+    """Suma (o máximo, según la métrica) de las instantáneas de varios procesos."""
+    combinadas = {}
+    for instantanea in instantaneas:
+        for nombre, metrica in instantanea.items():
+            destino = combinadas.setdefault(nombre, dict(metrica, valores={}))
+            for etiquetas, valor in metrica['valores']:
+                clave = tuple(etiquetas)
+                actual = destino['valores'].get(clave)
+                if actual is None:
+                    destino['valores'][clave] = valor
+                elif metrica['tipo'] == 'histogram':
+                    destino['valores'][clave] = [a + b for a, b in zip(actual, valor)]
+                elif metrica['agregacion'] == 'max':
+                    destino['valores'][clave] = max(actual, valor)
+                else:
+                    destino['valores'][clave] = actual + valor
+    return combinadas
+
+
+# ========== EXPOSICIÓN EN FORMATO PROMETHEUS ==========
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres, valores, extra=()):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in list(zip(nombres, valores)) + list(extra)]
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exponer(metricas):
+    """Texto de exposición de Prometheus (versión 0.0.4) de las métricas combinadas."""
+    lineas = []
+    for nombre, metrica in sorted(metricas.items()):
+        if not metrica['valores']:
+            continue
+        lineas.append(f"# HELP {nombre} {metrica['ayuda']}")
+        lineas.append(f"# TYPE {nombre} {metrica['tipo']}")
+        for clave, valor in sorted(metrica['valores'].items()):
+            if metrica['tipo'] != 'histogram':
+                lineas.append(f"{nombre}{_etiquetas(metrica['etiquetas'], clave)} {_numero(valor)}")
+                continue
+            acumulado = 0
+            for limite, conteo in zip(list(metrica['limites']) + ['+Inf'], valor[:-1]):
+                acumulado += conteo
+                extra = [('le', limite if limite == '+Inf' else _numero(float(limite)))]
+                lineas.append(f"{nombre}_bucket{_etiquetas(metrica['etiquetas'], clave, extra)} {acumulado}")
+            lineas.append(f"{nombre}_sum{_etiquetas(metrica['etiquetas'], clave)} {_numero(float(valor[-1]))}")
+            lineas.append(f"{nombre}_count{_etiquetas(metrica['etiquetas'], clave)} {acumulado}")
+    return '\n'.join(lineas) + '\n'
+
+
+# ========== INSTRUMENTACIÓN DE FLASK ==========
+def _ruta(respuesta, rutas_detalladas):
+    """Etiqueta de ruta: la regla de Flask, o la ruta concreta si la regla está en ``rutas_detalladas``.
+
+    Las reglas (``/figuras/<vista>.json``) mantienen acotado el número de
+    series; solo se detallan las rutas cuyos valores posibles están acotados
+    y que respondieron bien (las URL inválidas no crean series nuevas).
+    """
+    regla = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+    if regla in rutas_detalladas and respuesta.status_code < 400:
+        return request.path
+    return regla
+
+
+def _iniciar_perfil():
+    if MODO_PERFIL == 'pyinstrument':
+        import pyinstrument
+        perfil = pyinstrument.Profiler()
+        perfil.start()
+        return perfil
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+    except ValueError:  # Ya hay otro perfilador activo (p. ej. en otro hilo con Python >= 3.12).
+        return None
+    return perfil
+
+
+def _detener_perfil(perfil):
+    if MODO_PERFIL == 'pyinstrument':
+        perfil.stop()
+    else:
+        perfil.disable()
+
+
+def _guardar_perfil(perfil, duracion_ms):
+    os.makedirs(DIRECTORIO_PERFILES, exist_ok=True)
+    nombre = re.sub(r'[^A-Za-z0-9_.-]+', '_', request.path.strip('/')) or 'inicio'
+    base = os.path.join(DIRECTORIO_PERFILES, f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}-{nombre}-{duracion_ms:.0f}ms')
+    _detener_perfil(perfil)
+    if MODO_PERFIL == 'pyinstrument':
+        with open(base + '.html', 'w', encoding='utf-8') as f:
+            f.write(perfil.output_html())
+    else:
+        perfil.dump_stats(base + '.prof')
+
+
+def instrumentar(server, rutas_detalladas=(), ruta_metricas='/metrics'):
+    """Mide cada petición del servidor Flask y agrega la ruta ``/metrics``."""
+    global MODO_PERFIL
+    rutas_detalladas = set(rutas_detalladas)
+    if MODO_PERFIL and MODO_PERFIL not in ('cprofile', 'pyinstrument'):
+        raise ValueError(f"MORTALIDAD_PERFIL debe ser 'cprofile' o 'pyinstrument', no {MODO_PERFIL!r}")
+    # Se comprueba al arrancar: si faltara, el import en before_request haría fallar cada petición.
+    if MODO_PERFIL == 'pyinstrument' and importlib.util.find_spec('pyinstrument') is None:
+        print("Advertencia: MORTALIDAD_PERFIL=pyinstrument pero pyinstrument no está instalado. Se usa cProfile.")
+        MODO_PERFIL = 'cprofile'
+
+    @server.before_request
+    def _iniciar():
+        g.inicio_peticion = time.perf_counter()
+        g.perfil = _iniciar_perfil() if MODO_PERFIL and request.path != ruta_metricas else None
+
+    @server.after_request
+    def _registrar(respuesta):
+        inicio = g.pop('inicio_peticion', None)
+        if inicio is None:
+            return respuesta
+        duracion = time.perf_counter() - inicio
+        ruta = _ruta(respuesta, rutas_detalladas)
+        PETICIONES.observar(duracion, ruta=ruta, metodo=request.method, estado=respuesta.status_code)
+        if respuesta.content_length is not None:
+            BYTES_RESPUESTA.observar(respuesta.content_length, ruta=ruta,
+                                     codificacion=respuesta.headers.get('Content-Encoding', 'identidad'))
+        perfil = g.pop('perfil', None)
+        if perfil is not None and duracion * 1000 >= UMBRAL_PERFIL_MS:
+            _guardar_perfil(perfil, duracion * 1000)
+        elif perfil is not None:
+            _detener_perfil(perfil)
+        guardar_instantanea()
+        return respuesta
+
+    @server.teardown_request
+    def _terminar(_error):
+        # Si la vista lanzó una excepción no pasó por after_request: el perfilador sigue activo.
+        perfil = g.pop('perfil', None)
+        if perfil is not None:
+            _detener_perfil(perfil)
+
+    @server.route(ruta_metricas)
+    def servir_metricas():
+        return Response(exponer(combinar(_instantaneas())), content_type=TIPO_CONTENIDO)
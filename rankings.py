@@ -0,0 +1,117 @@
+"""Rankings de municipios (los K con más y con menos defunciones) sobre las celdas del cubo.
+
+Los totales por municipio se obtienen con un ``bincount`` sobre las celdas
+seleccionadas, indexado por la posición de cada municipio en un universo fijo
+(los municipios de DIVIPOLA más los que aparezcan en los datos). Así los
+municipios sin defunciones existen con total 0 y los municipios que comparten
+nombre (hay decenas en DIVIPOLA) no se suman entre sí.
+
+De esos totales (unos mil valores) se eligen los K primeros con
+``np.argpartition``, en tiempo lineal, y solo esos K se ordenan. Los empates en
+el puesto K se resuelven por nombre, de modo que el resultado no depende del
+orden de las celdas; cada fila informa su puesto (con empates, "1, 2, 2, 4") y
+con cuántos municipios más comparte el total. Los totales sin filtros se
+calculan una sola vez.
+
+Con un filtro de departamento, el universo se limita a los municipios de esos
+departamentos (los dos primeros dígitos del código DANE): un municipio de otro
+departamento no cuenta como "sin defunciones" ni entra en el ranking.
+"""
+import numpy as np
+import pandas as pd
+
+import datos
+
+
+class RankingMunicipios:
+    """Totales por municipio de un ``CuboMortalidad`` y selección de los K mayores o menores.
+
+    ``seleccion`` restringe las celdas que se cuentan (por ejemplo, los
+    homicidios); ``divipola`` agrega al universo los municipios sin defunciones.
+    """
+
+    def __init__(self, cubo, divipola=None, seleccion=None):
+        codigos_cubo = cubo.categorias['COD_DANE']
+        nombres = datos.diccionario_divipola(divipola if divipola is not None else pd.DataFrame())
+        self.codigos = pd.Index(sorted(set(codigos_cubo.astype(str)) | set(nombres['MUNICIPIO'])))
+        # Departamento de cada municipio del universo: el código DANE empieza por el del departamento.
+        self.departamentos = self.codigos.str[:2].to_numpy()
+
+        traduccion = np.append(self.codigos.get_indexer(codigos_cubo.astype(str)), -1)
+        self._municipio_celda = traduccion[cubo.codigos['COD_DANE']]
+        self._conteos = cubo.conteos
+        self._validas = self._municipio_celda >= 0
+        if seleccion is not None:
+            self._validas &= seleccion
+
+        # Nombres: los de DIVIPOLA y, para los códigos que no estén, los que trae el cubo.
+        for atributo in ('MUNICIPIO', 'DEPARTAMENTO'):
+            if atributo in cubo.codigos:
+                celdas = np.flatnonzero((self._municipio_celda >= 0) & (cubo.codigos[atributo] >= 0))
+                # Basta una celda por municipio.
+                celdas = celdas[np.unique(self._municipio_celda[celdas], return_index=True)[1]]
+                del_cubo = dict(zip(self.codigos[self._municipio_celda[celdas]],
+                                    cubo.categorias[atributo].take(cubo.codigos[atributo][celdas])))
+                nombres[atributo] = {**del_cubo, **nombres[atributo]}
+        municipios = pd.Series([nombres['MUNICIPIO'].get(c, c) for c in self.codigos])
+        departamentos = pd.Series([nombres['DEPARTAMENTO'].get(c, '') for c in self.codigos])
+        # Los nombres repetidos se distinguen por el departamento.
+        repetidos = municipios.duplicated(keep=False) & (departamentos != '')
+        self.etiquetas = np.where(repetidos, municipios + ' (' + departamentos + ')', municipios).astype(object)
+        self._orden_etiquetas = np.argsort(np.argsort(self.etiquetas, kind='stable'), kind='stable')
+        self._totales = self._sumar(self._validas)
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def _sumar(self, validas):
+        return np.bincount(self._municipio_celda[validas], weights=self._conteos[validas],
+                           minlength=len(self.codigos)).astype(np.int64)
+
+    def totales(self, mascara=None):
+        """Defunciones de cada municipio del universo con las celdas de ``mascara`` (None = todas)."""
+        return self._totales if mascara is None else self._sumar(self._validas & mascara)
+
+    def universo(self, departamentos=None):
+        """Municipios que cuentan en el ranking: los de ``departamentos`` (todos si no se indican)."""
+        if not departamentos:
+            return np.ones(len(self.codigos), dtype=bool)
+        return np.isin(self.departamentos, [str(d).zfill(2) for d in departamentos])
+
+    def sin_defunciones(self, mascara=None, departamentos=None):
+        """Número de municipios del universo (de ``departamentos``, si se indican) con total 0."""
+        return int(np.count_nonzero((self.totales(mascara) == 0) & self.universo(departamentos)))
+
+    def _seleccionar(self, clave, candidatos, k):
+        """Los ``k`` candidatos con menor ``clave``; los empates en el último puesto se deciden por nombre."""
+        if len(candidatos) > k:
+            limite = clave[candidatos[np.argpartition(clave[candidatos], k - 1)[k - 1]]]
+            mejores = candidatos[clave[candidatos] < limite]
+            empatados = candidatos[clave[candidatos] == limite]
+            empatados = empatados[np.argsort(self._orden_etiquetas[empatados])[:k - len(mejores)]]
+            candidatos = np.concatenate([mejores, empatados])
+        return candidatos[np.lexsort((self._orden_etiquetas[candidatos], clave[candidatos]))]
+
+    def _ranking(self, k, mascara, minimo, descendente, nombre, departamentos):
+        totales = self.totales(mascara)
+        clave = -totales if descendente else totales
+        candidatos = np.flatnonzero((totales >= minimo) & self.universo(departamentos))
+        elegidos = self._seleccionar(clave, candidatos, k) if k > 0 else candidatos[:0]
+        # Puesto = 1 + candidatos con mejor total; los que tienen mejor total son todos elegidos.
+        valores_elegidos = clave[elegidos]
+        posicion = 1 + np.searchsorted(valores_elegidos, valores_elegidos, side='left')
+        empates = (clave[candidatos][:, None] == valores_elegidos[None, :]).sum(axis=0) - 1
+        return pd.DataFrame({'COD_DANE': self.codigos[elegidos], 'MUNICIPIO': self.etiquetas[elegidos],
+                             nombre: totales[elegidos], 'POSICION': posicion, 'EMPATES': empates})
+
+    def mayores(self, k, mascara=None, minimo=1, nombre='Total', departamentos=None):
+        """Los ``k`` municipios con más defunciones (con al menos ``minimo``)."""
+        return self._ranking(k, mascara, minimo, True, nombre, departamentos)
+
+    def menores(self, k, mascara=None, minimo=0, nombre='Total', departamentos=None):
+        """Los ``k`` municipios con menos defunciones; con ``minimo=0`` entran los que no tienen ninguna.
+
+        ``departamentos`` debe ser el filtro de departamento que dio ``mascara``,
+        para no contar como sin defunciones los municipios de otros departamentos.
+        """
+        return self._ranking(k, mascara, minimo, False, nombre, departamentos)
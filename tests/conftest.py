@@ -0,0 +1,65 @@
+"""Datos pequeños para las pruebas: registros con las columnas del Anexo 1 y un DIVIPOLA de juguete."""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# COD_DANE -> (municipio, departamento). Dos departamentos con un municipio homónimo (ALBANIA).
+MUNICIPIOS = {
+    '05001': ('MEDELLÍN', 'ANTIOQUIA'),
+    '05002': ('ABEJORRAL', 'ANTIOQUIA'),
+    '05004': ('ABRIAQUÍ', 'ANTIOQUIA'),
+    '18029': ('ALBANIA', 'CAQUETÁ'),
+    '44035': ('ALBANIA', 'LA GUAJIRA'),
+    '91001': ('LETICIA', 'AMAZONAS'),
+    '91263': ('EL ENCANTO', 'AMAZONAS'),
+}
+
+
+@pytest.fixture
+def divipola():
+    return pd.DataFrame({'COD_DANE': [int(c) for c in MUNICIPIOS],
+                         'COD_DEPARTAMENTO': [int(c[:2]) for c in MUNICIPIOS],
+                         'MUNICIPIO': [m for m, _ in MUNICIPIOS.values()],
+                         'DEPARTAMENTO': [d for _, d in MUNICIPIOS.values()]})
+
+
+def registros(filas):
+    """DataFrame preprocesado a partir de tuplas (año, COD_DANE, mes, sexo, grupo de edad, causa)."""
+    df = pd.DataFrame(filas, columns=['AÑO', 'COD_DANE', 'MES', 'SEXO', 'GRUPO_EDAD1', 'COD_MUERTE'])
+    df['COD_DEPARTAMENTO'] = df['COD_DANE'].str[:2]
+    df['MUNICIPIO'] = df['COD_DANE'].map(lambda c: MUNICIPIOS[c][0])
+    df['DEPARTAMENTO'] = df['COD_DANE'].map(lambda c: MUNICIPIOS[c][1])
+    return df
+
+
+@pytest.fixture
+def carpetas(tmp_path, monkeypatch, divipola):
+    """Carpeta de datos (con DIVIPOLA en Excel), caché, particiones y agregados dentro de ``tmp_path``."""
+    import datos
+    import historico
+    import ingesta
+
+    carpeta_datos, cache = tmp_path / 'datos', tmp_path / 'cache'
+    carpeta_datos.mkdir()
+    monkeypatch.setattr(datos, 'DIRECTORIO_DATOS', str(carpeta_datos))
+    monkeypatch.setattr(datos, 'DIRECTORIO_CACHE', str(cache))
+    monkeypatch.setattr(ingesta, 'DIRECTORIO_PARTICIONES', str(cache / 'mortalidad'))
+    monkeypatch.setattr(historico, 'DIRECTORIO_AGREGADOS', str(cache / 'agregados'))
+    escribir_divipola(divipola)
+    return tmp_path
+
+
+def escribir_divipola(divipola):
+    import datos
+    divipola.to_excel(datos.ruta_datos(datos.ARCHIVO_DIVIPOLA), index=False)
+
+
+def escribir_origen(ruta, filas):
+    """Archivo de origen en CSV con las columnas del Anexo 1 (códigos numéricos, como los publica el DANE)."""
+    df = registros(filas)[['AÑO', 'COD_DEPARTAMENTO', 'COD_DANE', 'MES', 'SEXO', 'GRUPO_EDAD1', 'COD_MUERTE']]
+    df.astype({'COD_DEPARTAMENTO': int, 'COD_DANE': int}).to_csv(ruta, index=False)
+    return str(ruta)
@@ -0,0 +1,95 @@
+import json
+
+import pyarrow as pa
+import pytest
+from flask import Flask
+
+import api
+from agregados import CuboMortalidad
+from consultas import IndiceFiltros
+from conftest import registros
+
+FILAS = [(2019, '05001', 1, 1, 10, 'I219')] * 3 + [
+    (2019, '05001', 3, 2, 10, 'I219'), (2019, '18029', 3, 2, 12, 'X954'), (2020, '44035', 5, 1, 20, 'C509'),
+]
+
+
+@pytest.fixture
+def cliente():
+    cubo = CuboMortalidad.desde_registros(registros(FILAS))
+    servidor = Flask(__name__)
+    servidor.register_blueprint(api.ApiAgregados(cubo, IndiceFiltros(cubo)).blueprint())
+    return servidor.test_client()
+
+
+def datos_json(respuesta):
+    assert respuesta.status_code == 200, respuesta.data
+    return json.loads(respuesta.data)['datos']
+
+
+def test_total_y_dimensiones(cliente):
+    assert datos_json(cliente.get('/api/aggregates')) == {'total': [6]}
+    assert datos_json(cliente.get('/api/aggregates?dim=anio,sexo')) == {
+        'anio': [2019, 2019, 2020], 'sexo': [1, 2, 1], 'total': [3, 2, 1]}
+
+
+def test_parametros_repetidos_se_suman(cliente):
+    separados = datos_json(cliente.get('/api/aggregates?dim=mes&mes=1&mes=3'))
+    assert separados == datos_json(cliente.get('/api/aggregates?dim=mes&mes=1,3'))
+    assert separados == {'mes': [1, 3], 'total': [3, 2]}
+    assert datos_json(cliente.get('/api/aggregates?dim=mes&dim=sexo&mes=3'))['sexo'] == [2]
+
+
+def test_municipio_lleva_el_nombre(cliente):
+    assert datos_json(cliente.get('/api/aggregates?dim=municipio')) == {
+        'municipio': ['05001', '18029', '44035'], 'nombre_municipio': ['MEDELLÍN', 'ALBANIA', 'ALBANIA'],
+        'total': [4, 1, 1]}
+    tabla = pa.ipc.open_stream(cliente.get('/api/aggregates?dim=municipio&formato=arrow').data).read_all()
+    assert tabla.column('nombre_municipio').to_pylist() == ['MEDELLÍN', 'ALBANIA', 'ALBANIA']
+
+
+def test_etag_y_304(cliente):
+    respuesta = cliente.get('/api/aggregates?dim=mes', headers={'Accept-Encoding': 'gzip'})
+    assert respuesta.headers['Content-Encoding'] == 'gzip'
+    etag = respuesta.headers['ETag']
+    assert cliente.get('/api/aggregates?dim=mes', headers={'If-None-Match': etag}).status_code == 304
+    # La misma consulta escrita de otra forma da el mismo ETag.
+    assert cliente.get('/api/aggregates?mes=&dim=mes').headers['ETag'] == etag
+    assert cliente.get('/api/aggregates?dim=sexo').headers['ETag'] != etag
+
+
+@pytest.mark.parametrize('consulta', ['dim=color', 'sexo=x', 'desconocido=1', 'formato=csv', 'causa=X95'])
+def test_consultas_invalidas_dan_400(cliente, consulta):
+    respuesta = cliente.get(f'/api/aggregates?{consulta}')
+    assert respuesta.status_code == 400
+    assert 'error' in json.loads(respuesta.data)
+
+
+def test_lote_json_y_arrow(cliente):
+    consultas = [{'dim': 'mes', 'sexo': [1]}, {'dim': 'anio'}]
+    respuesta = cliente.post('/api/aggregates', json={'consultas': consultas})
+    resultados = json.loads(respuesta.data)['resultados']
+    assert [r['datos'] for r in resultados] == [{'mes': [1, 5], 'total': [3, 1]}, {'anio': [2019, 2020], 'total': [5, 1]}]
+
+    tabla = pa.ipc.open_stream(cliente.post('/api/aggregates', json={'formato': 'arrow', 'consultas': consultas}).data).read_all()
+    assert tabla.column('consulta').to_pylist() == [0, 0, 1, 1]
+    assert tabla.column('total').to_pylist() == [3, 1, 5, 1]
+
+
+@pytest.mark.parametrize('cuerpo', [{'consultas': 'mes'}, {'consultas': [1]}, {'consultas': [{'dim': 'color'}]},
+                                    {'consultas': [{}] * (api.MAX_CONSULTAS_LOTE + 1)}, {'formato': 'csv', 'consultas': []}])
+def test_lote_invalido_da_400(cliente, cuerpo):
+    assert cliente.post('/api/aggregates', json=cuerpo).status_code == 400
+
+
+def test_lote_no_desplaza_la_cache_de_get():
+    cubo = CuboMortalidad.desde_registros(registros(FILAS))
+    agregados = api.ApiAgregados(cubo, IndiceFiltros(cubo), capacidad=2)
+    servidor = Flask(__name__)
+    servidor.register_blueprint(agregados.blueprint())
+    cliente = servidor.test_client()
+    guardada = cliente.get('/api/aggregates?dim=mes').data
+    consultas = [{'dim': 'mes'}] + [{'dim': d} for d in ('anio', 'sexo', 'edad', 'departamento')]
+    resultados = json.loads(cliente.post('/api/aggregates', json={'consultas': consultas}).data)['resultados']
+    assert resultados[0] == json.loads(guardada)
+    assert [clave for clave in agregados.respuestas._entradas] == [('json', agregados.normalizar({'dim': 'mes'}))]
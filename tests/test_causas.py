@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import causas
+
+# Capítulo, grupo y código de cada fila del catálogo (el Anexo 2 trae una fila por código de cuatro caracteres).
+CATALOGO = [(9, 'I21', 'I219'), (20, 'X84', 'X840'), (20, 'X85', 'X850'), (20, 'X95', 'X950'), (20, 'X95', 'X954'),
+            (20, 'Y09', 'Y090'), (20, 'Y10', 'Y100')]
+
+
+@pytest.fixture
+def indice():
+    """Índice construido desde una hoja como la del Anexo 2: filas de título antes del encabezado."""
+    filas = [['Catálogo de causas', None, None, None, None, None], [None] * 6, list(causas.COLUMNAS_CATALOGO)]
+    filas += [[capitulo, f'Capítulo {capitulo}', grupo, f'Grupo {grupo}', codigo, f'Código {codigo}']
+              for capitulo, grupo, codigo in reversed(CATALOGO)]
+    return causas.IndiceCausas.desde_anexo({causas.HOJA_CATALOGO: pd.DataFrame(filas)})
+
+
+def test_rango_de_agresiones(indice):
+    codigos = ['X840', 'X850', 'X954', 'Y090', 'Y100', 'I219']
+    seleccion = indice.seleccion(indice.ids_grupo(codigos), *causas.AGRESIONES)
+    assert seleccion.tolist() == [False, True, True, True, False, False]
+    assert list(indice.grupos[slice(*indice.rango(*causas.AGRESIONES))]) == ['X85', 'X95', 'Y09']
+
+
+def test_codigos_fuera_del_catalogo_usan_su_grupo(indice):
+    codigos = ['X959', 'Y099', 'Z999', 'X954']
+    grupos = indice.ids_grupo(codigos)
+    assert indice.ids_codigo(codigos).tolist() == [-1, -1, -1, indice.ids_codigo(['X954'])[0]]
+    assert [indice.grupos[g] if g >= 0 else None for g in grupos] == ['X95', 'Y09', None, 'X95']
+    assert indice.seleccion(grupos, *causas.HOMICIDIOS_ARMA_FUEGO).tolist() == [True, False, False, True]
+    assert indice.ids_capitulo(codigos).tolist() == [20, 20, -1, 20]
+    assert list(indice.describir(codigos)) == ['Grupo X95', 'Grupo Y09', '', 'Código X954']
+
+
+def test_catalogo_sin_encabezado_da_error():
+    with pytest.raises(ValueError):
+        causas.IndiceCausas.desde_anexo({causas.HOJA_CATALOGO: pd.DataFrame(np.zeros((2, 6)))})
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from agregados import CuboMortalidad
+from consultas import IndiceFiltros
+from conftest import registros
+
+FILAS = [(2019, '05001', 1, 1, 10, 'I219')] * 3 + [
+    (2019, '05001', 1, 2, 10, 'I219'), (2019, '05002', 2, 1, 12, 'C509'), (2020, '44035', 2, 1, 12, 'X954'),
+    (2020, '44035', 3, 2, 20, 'X954'), (2020, '91001', 4, 1, 8, 'J189'), (2019, '18029', 5, 1, 20, 'J189'),
+]
+
+
+def test_filtrar_dos_dimensiones_coincide_con_groupby():
+    df = registros(FILAS)
+    cubo = CuboMortalidad.desde_registros(df)
+    mascara = IndiceFiltros(cubo).filtrar({'COD_DEPARTAMENTO': ['05', '44'], 'SEXO': [1], 'MES': None})
+
+    esperado = (df[df['COD_DEPARTAMENTO'].isin(['05', '44']) & (df['SEXO'] == 1)]
+                .groupby(['COD_DANE', 'MES']).size().rename('Total').reset_index())
+    obtenido = cubo.totales(['COD_DANE', 'MES'], mascara=mascara)
+    pd.testing.assert_frame_equal(obtenido.astype({'COD_DANE': str, 'MES': int}),
+                                  esperado.astype({'COD_DANE': str, 'MES': int}), check_dtype=False)
+
+
+def test_sin_filtros_activos_y_valores_desconocidos():
+    cubo = CuboMortalidad.desde_registros(registros(FILAS))
+    indice = IndiceFiltros(cubo)
+    assert indice.filtrar({'SEXO': [], 'AÑO': None}) is None
+    assert not indice.filtrar({'COD_DEPARTAMENTO': ['99']}).any()
+    assert indice.filtrar({'AÑO': [2020, 2031]}).sum() == (cubo.codigos['AÑO'] == 1).sum()
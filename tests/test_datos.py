@@ -0,0 +1,27 @@
+import os
+
+import datos
+from conftest import escribir_divipola
+
+
+def test_cache_parquet_se_reconstruye_si_cambia_el_archivo(carpetas, divipola, monkeypatch):
+    construcciones = []
+    construir = datos.construir_cache
+    monkeypatch.setattr(datos, 'construir_cache', lambda *a, **k: construcciones.append(a) or construir(*a, **k))
+    ruta = datos.ruta_datos(datos.ARCHIVO_DIVIPOLA)
+
+    assert 'MEDELLÍN' in set(datos.cargar_excel(datos.ARCHIVO_DIVIPOLA)['MUNICIPIO'])
+    assert 'MEDELLÍN' in set(datos.cargar_excel(datos.ARCHIVO_DIVIPOLA)['MUNICIPIO'])
+    assert len(construcciones) == 1
+
+    # Solo cambia la fecha de modificación: el hash coincide y se sigue usando la caché.
+    os.utime(ruta, ns=(os.stat(ruta).st_atime_ns, os.stat(ruta).st_mtime_ns + 10**9))
+    datos.cargar_excel(datos.ARCHIVO_DIVIPOLA)
+    assert len(construcciones) == 1
+
+    escribir_divipola(divipola.replace({'MUNICIPIO': {'MEDELLÍN': 'NUEVO'}}))
+    municipios = set(datos.cargar_excel(datos.ARCHIVO_DIVIPOLA)['MUNICIPIO'])
+    assert len(construcciones) == 2
+    assert 'NUEVO' in municipios and 'MEDELLÍN' not in municipios
+    meta = datos._leer_meta(datos._rutas_cache(datos.ARCHIVO_DIVIPOLA)[0])
+    assert meta['huella'] == datos.huella_archivo(ruta)
@@ -0,0 +1,37 @@
+import numpy as np
+
+import geometria
+
+# Frontera compartida de x = 1: pequeñas ondulaciones (menores que la tolerancia) y un saliente en y = 0,5.
+Y = np.linspace(0, 1, 41)
+FRONTERA = [(round(1 + (0.2 if y == 0.5 else 0.001 * np.sin(40 * y)), 6), round(y, 6)) for y in Y]
+
+
+def departamento(codigo, anillo):
+    return {'type': 'Feature', 'properties': {'DPTO_CCDGO': codigo, 'DPTO_CNMBR': f'Departamento {codigo}', 'AREA': 1},
+            'geometry': {'type': 'Polygon', 'coordinates': [[list(p) for p in anillo]]}}
+
+
+def coleccion():
+    oeste = [(0, 0)] + FRONTERA + [(0, 1), (0, 0)]
+    este = [(2, 0), (2, 1)] + FRONTERA[::-1] + [(2, 0)]
+    return {'type': 'FeatureCollection', 'features': [departamento('05', oeste), departamento('91', este)]}
+
+
+def en_frontera(feature):
+    return {tuple(p) for p in feature['geometry']['coordinates'][0] if 0.5 < p[0] < 1.5}
+
+
+def test_frontera_compartida_igual_en_ambos_departamentos():
+    oeste, este = geometria.simplificar(coleccion(), rejilla=0.0001, tolerancia=0.01)['features']
+    assert en_frontera(oeste) == en_frontera(este)
+    # Las ondulaciones se quitan, el saliente se conserva y el anillo sigue cerrado.
+    assert (1.2, 0.5) in en_frontera(oeste)
+    assert len(en_frontera(oeste)) < len(FRONTERA) / 4
+    assert oeste['geometry']['coordinates'][0][0] == oeste['geometry']['coordinates'][0][-1]
+    assert oeste['properties'] == {'DPTO_CCDGO': '05', 'DPTO_CNMBR': 'Departamento 05'}
+
+
+def test_douglas_peucker_conserva_extremos_y_vertices_lejanos():
+    puntos = [(0, 0), (1, 0.501), (2, 1), (3, 0.499), (4, 0)]
+    assert geometria.douglas_peucker(puntos, 0.01).tolist() == [0, 2, 4]
@@ -0,0 +1,113 @@
+import pandas as pd
+
+import historico
+import ingesta
+from agregados import CuboMortalidad
+from conftest import escribir_divipola, escribir_origen, registros
+
+
+def totales_por_anio(cubo):
+    return dict(zip(cubo.totales(['AÑO'])['AÑO'].astype(int), cubo.totales(['AÑO'])['Total']))
+
+
+def test_combinar_suma_celdas_y_une_categorias():
+    a = CuboMortalidad.desde_registros(registros([(2019, '05001', 1, 1, 10, 'I219')] * 2))
+    b = CuboMortalidad.desde_registros(registros([(2019, '05001', 1, 1, 10, 'I219'), (2020, '91001', 2, 2, 8, 'X954')]))
+    total = CuboMortalidad.combinar([a, b])
+    assert len(total) == 2
+    assert totales_por_anio(total) == {2019: 3, 2020: 1}
+    por_municipio = total.totales(['COD_DANE', 'MUNICIPIO'])
+    assert list(por_municipio['MUNICIPIO']) == ['MEDELLÍN', 'LETICIA']
+    assert list(por_municipio['Total']) == [3, 1]
+
+
+def test_totales_omite_faltantes_y_respeta_mascara():
+    df = registros([(2019, '05001', 1, 1, 10, 'I219'), (2019, '05002', 2, 2, 12, 'C509'),
+                    (2019, '05002', 2, 1, 12, 'C509')])
+    df.loc[2, 'SEXO'] = None
+    cubo = CuboMortalidad.desde_registros(df)
+    assert list(cubo.totales(['SEXO'])['Total']) == [1, 1]
+    mes_2 = cubo.mascara_categorias('MES', cubo.categorias['MES'] == 2)
+    assert cubo.totales(['COD_DANE'], mascara=mes_2).to_dict('list') == {'COD_DANE': ['05002'], 'Total': [2]}
+
+
+def test_guardar_y_cargar(tmp_path):
+    cubo = CuboMortalidad.desde_registros(registros([(2019, '05001', 1, 1, 10, 'I219')] * 2))
+    cubo.guardar(str(tmp_path / 'cubo.arrow'))
+    cargado = CuboMortalidad.cargar(str(tmp_path / 'cubo.arrow'))
+    pd.testing.assert_frame_equal(cargado.totales(['COD_DANE', 'MES']), cubo.totales(['COD_DANE', 'MES']))
+
+
+def test_huella_cambia_con_los_conteos():
+    filas = [(2019, '05001', 1, 1, 10, 'I219'), (2019, '91001', 2, 2, 8, 'X954')]
+    cubo = CuboMortalidad.desde_registros(registros(filas))
+    assert cubo.huella() == CuboMortalidad.desde_registros(registros(filas)).huella()
+    assert cubo.huella() != CuboMortalidad.desde_registros(registros(filas + filas[:1])).huella()
+
+
+def test_actualizar_agrega_modifica_y_quita_particiones(carpetas):
+    rutas = [escribir_origen(carpetas / 'a.csv', [(2019, '05001', 1, 1, 10, 'I219')] * 2
+                             + [(2020, '05001', 1, 1, 10, 'I219')]),
+             escribir_origen(carpetas / 'b.csv', [(2021, '91001', 3, 2, 8, 'X954')])]
+    ingesta.ingerir(rutas[:1])
+    assert totales_por_anio(historico.actualizar()) == {2019: 2, 2020: 1}
+
+    # Archivo nuevo: su cubo se suma al total.
+    ingesta.ingerir(rutas)
+    assert totales_por_anio(historico.actualizar()) == {2019: 2, 2020: 1, 2021: 1}
+
+    # El archivo cambia y ya no trae 2020: esa partición se quita del total.
+    escribir_origen(carpetas / 'a.csv', [(2019, '05002', 1, 1, 10, 'I219')] * 5)
+    ingesta.ingerir(rutas)
+    cubo = historico.actualizar()
+    assert totales_por_anio(cubo) == {2019: 5, 2021: 1}
+    assert set(cubo.totales(['COD_DANE'])['COD_DANE']) == {'05002', '91001'}
+
+    # Sin cambios se carga el total guardado.
+    assert totales_por_anio(historico.actualizar()) == {2019: 5, 2021: 1}
+
+
+def test_cambio_de_divipola_reconstruye_los_cubos(carpetas, divipola):
+    ruta = escribir_origen(carpetas / 'a.csv', [(2019, '05001', 1, 1, 10, 'I219')])
+    ingesta.ingerir([ruta])
+    assert 'MEDELLÍN' in set(historico.actualizar().categorias['MUNICIPIO'])
+
+    escribir_divipola(divipola.replace({'MUNICIPIO': {'MEDELLÍN': 'MEDELLÍN (RENOMBRADO)'}}))
+    assert ingesta.ingerir([ruta])  # El archivo de origen no cambió, pero DIVIPOLA sí.
+    cubo = historico.actualizar()
+    assert set(cubo.categorias['MUNICIPIO']) == {'MEDELLÍN (RENOMBRADO)'}
+    assert set(CuboMortalidad.cargar(historico._ruta_cubo('a/2019')).categorias['MUNICIPIO']) == {'MEDELLÍN (RENOMBRADO)'}
+
+
+def test_cambio_de_divipola_reingiere_todas_las_fuentes(carpetas, divipola):
+    a = escribir_origen(carpetas / 'a.csv', [(2019, '05001', 1, 1, 10, 'I219')])
+    b = escribir_origen(carpetas / 'b.csv', [(2020, '05001', 1, 1, 10, 'I219')])
+    ingesta.ingerir([a, b])
+    historico.actualizar()
+
+    escribir_divipola(divipola.replace({'MUNICIPIO': {'MEDELLÍN': 'NUEVO'}}))
+    # Solo se pide b, pero a también guarda el nombre anterior en su partición.
+    assert set(ingesta.ingerir([b])) == {'a', 'b'}
+    assert ingesta.actualizar_fuentes() == {}
+    por_anio = historico.actualizar().totales(['AÑO', 'MUNICIPIO'])
+    assert por_anio.to_dict('list') == {'AÑO': [2019, 2020], 'MUNICIPIO': ['NUEVO', 'NUEVO'], 'Total': [1, 1]}
+
+
+def test_anexo_reemplazado_se_vuelve_a_ingerir(carpetas):
+    import datos
+
+    def escribir_anexo(filas):
+        ruta = datos.ruta_datos(datos.ARCHIVO_MORTALIDAD)
+        registros(filas).drop(columns=['MUNICIPIO', 'DEPARTAMENTO']).to_excel(
+            ruta, sheet_name=datos.HOJA_MORTALIDAD, index=False)
+        return ruta
+
+    assert ingesta.actualizar_fuentes() == {}  # Sin particiones no se ingiere nada al arrancar.
+    ingesta.ingerir([escribir_anexo([(2019, '05001', 1, 1, 10, 'I219')])])
+    assert totales_por_anio(historico.actualizar()) == {2019: 1}
+    assert ingesta.actualizar_fuentes() == {}
+
+    escribir_anexo([(2019, '05001', 1, 1, 10, 'I219')] * 4)
+    fuente = datos.ARCHIVO_MORTALIDAD.rsplit('.', 1)[0]
+    assert ingesta.actualizar_fuentes() == {fuente: {2019: 4}}
+    assert totales_por_anio(historico.actualizar()) == {2019: 4}
@@ -0,0 +1,17 @@
+from flask import Flask
+
+import metricas
+
+
+def test_perfil_sin_pyinstrument_usa_cprofile(monkeypatch, tmp_path):
+    monkeypatch.setattr(metricas, 'MODO_PERFIL', 'pyinstrument')
+    monkeypatch.setattr(metricas, 'DIRECTORIO_PERFILES', str(tmp_path))
+    monkeypatch.setattr(metricas, 'UMBRAL_PERFIL_MS', 0)
+    monkeypatch.setattr(metricas.importlib.util, 'find_spec', lambda nombre: None)
+    server = Flask(__name__)
+    server.add_url_rule('/hola', 'hola', lambda: 'hola')
+    metricas.instrumentar(server)
+
+    assert metricas.MODO_PERFIL == 'cprofile'
+    assert server.test_client().get('/hola').status_code == 200
+    assert [p.suffix for p in tmp_path.iterdir()] == ['.prof']
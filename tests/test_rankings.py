@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from agregados import CuboMortalidad
+from consultas import IndiceFiltros
+from conftest import MUNICIPIOS, registros
+from rankings import RankingMunicipios
+
+# Medellín 3, Albania (La Guajira) 2; Abejorral, Albania (Caquetá) y Leticia 1; Abriaquí y El Encanto 0.
+FILAS = [(2019, '05001', 1, 1, 10, 'I219')] * 3 + [
+    (2019, '44035', 2, 2, 12, 'X954'), (2019, '44035', 3, 1, 12, 'X954'),
+    (2019, '05002', 4, 1, 20, 'C509'), (2019, '18029', 5, 2, 20, 'J189'), (2019, '91001', 6, 1, 8, 'X954'),
+]
+
+
+@pytest.fixture
+def cubo():
+    return CuboMortalidad.desde_registros(registros(FILAS))
+
+
+@pytest.fixture
+def ranking(cubo, divipola):
+    return RankingMunicipios(cubo, divipola)
+
+
+def test_universo_incluye_municipios_sin_defunciones(ranking):
+    assert len(ranking) == len(MUNICIPIOS)
+    assert ranking.sin_defunciones() == 2
+    menores = ranking.menores(2)
+    assert list(menores['MUNICIPIO']) == ['ABRIAQUÍ', 'EL ENCANTO']
+    assert list(menores['Total']) == [0, 0]
+
+
+@pytest.mark.parametrize('departamentos', [['91'], ['05'], ['18', '44'], ['05', '91']])
+def test_sin_defunciones_con_filtro_de_departamento(cubo, ranking, departamentos):
+    mascara = IndiceFiltros(cubo).filtrar({'COD_DEPARTAMENTO': departamentos})
+    en_departamentos = sum(c[:2] in departamentos for c in MUNICIPIOS)
+    sin_defunciones = ranking.sin_defunciones(mascara, departamentos)
+    assert sin_defunciones <= en_departamentos
+    esperados = sum(c[:2] in departamentos for c in ('05004', '91263'))
+    assert sin_defunciones == esperados
+    menores = ranking.menores(10, mascara, departamentos=departamentos)
+    assert all(c[:2] in departamentos for c in menores['COD_DANE'])
+
+
+def test_amazonas_no_cuenta_municipios_de_otros_departamentos(cubo, ranking):
+    mascara = IndiceFiltros(cubo).filtrar({'COD_DEPARTAMENTO': ['91']})
+    assert ranking.sin_defunciones(mascara, ['91']) == 1
+    assert list(ranking.menores(10, mascara, departamentos=[91])['MUNICIPIO']) == ['EL ENCANTO', 'LETICIA']
+
+
+def test_homonimos_no_se_suman(ranking):
+    mayores = ranking.mayores(2)
+    assert list(mayores['MUNICIPIO']) == ['MEDELLÍN', 'ALBANIA (LA GUAJIRA)']
+    assert list(mayores['Total']) == [3, 2]
+
+
+def test_empates_se_deciden_por_nombre(ranking):
+    menores = ranking.menores(2, minimo=1)
+    assert list(menores['MUNICIPIO']) == ['ABEJORRAL', 'ALBANIA (CAQUETÁ)']
+    assert list(menores['POSICION']) == [1, 1]
+    # Leticia también tiene 1 y queda fuera: cada uno empata con otros dos.
+    assert list(menores['EMPATES']) == [2, 2]
+    completo = ranking.menores(5, minimo=1)
+    assert list(completo['POSICION']) == [1, 1, 1, 4, 5]
+
+
+def test_seleccion_y_mascara(cubo, divipola):
+    homicidios = cubo.mascara_categorias('COD_MUERTE', cubo.categorias['COD_MUERTE'].str.startswith('X95'))
+    ranking = RankingMunicipios(cubo, divipola, seleccion=homicidios)
+    assert list(ranking.mayores(5, nombre='Homicidios')['Homicidios']) == [2, 1]
+    mes_6 = IndiceFiltros(cubo).filtrar({'MES': [6]})
+    assert list(ranking.mayores(5, mes_6)['MUNICIPIO']) == ['LETICIA']
+    assert np.array_equal(ranking.totales(), ranking.totales(np.ones(len(cubo), dtype=bool)))